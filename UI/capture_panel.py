@@ -1,5 +1,6 @@
 import bpy
 from ..core.props_access import get_ui_props
+from ..core.capture_progress import progress
 
 class ORBITSNAP_PT_Panel(bpy.types.Panel):
     bl_label = "Orbit Snap"
@@ -24,12 +25,67 @@ class ORBITSNAP_PT_Panel(bpy.types.Panel):
         row = layout.row(align=True)
         row.label(text="quality")
         row.prop(props, "quality", text="")
+        row = layout.row(align=True)
+        row.label(text="Also Export")
+        row.prop(props, "derived_qualities", text="")
+        row = layout.row()
+        row.prop(props, "thumbnail")
+        sub = row.row()
+        sub.enabled = props.thumbnail
+        sub.prop(props, "thumbnail_width")
+
+        # 保存形式
+        row = layout.row(align=True)
+        row.prop(props, "image_format", text="")
+        if props.image_format == 'png':
+            row.prop(props, "png_compress_level")
+        elif props.image_format == 'webp':
+            row.prop(props, "webp_lossless", toggle=True)
+        if props.image_format == 'jpeg' or (props.image_format == 'webp' and not props.webp_lossless):
+            row.prop(props, "image_quality")
+        if props.image_format != 'jpeg':
+            row.prop(props, "use_alpha", toggle=True)
+
+        # 撮影方法
+        row = layout.row(align=True)
+        row.label(text="Render")
+        row.prop(props, "render_mode", text="")
+        if props.render_mode == 'cycles':
+            col = layout.column(align=True)
+            row = col.row(align=True)
+            row.prop(props, "cycles_time_budget")
+            row.prop(props, "cycles_max_samples")
+            row = col.row(align=True)
+            row.prop(props, "cycles_adaptive_threshold")
+            row.prop(props, "cycles_denoise", toggle=True)
+            row = col.row(align=True)
+            row.label(text="Preview")
+            row.prop(props, "cycles_preview_scale", expand=True)
 
         # 焦点距離とマージン
         layout.prop(props, "focal_length")
         layout.prop(props, "margin_scale")
+
+        row = layout.row(align=True)
+        row.label(text="Framing")
+        row.prop(props, "framing_mode", text="")
+        row.prop(props, "framing_cache", toggle=True)
+        sub = row.row(align=True)
+        sub.enabled = props.framing_cache
+        sub.prop(props, "persist_framing_cache", text="", icon="FILE_BLEND")
+
+        row = layout.row(align=True)
+        row.label(text="Targets")
+        row.prop(props, "capture_targets", text="")
         layout.separator()
 
+        # 撮影角度の決め方(被覆率で選ぶ場合もグリッドは比較用に使う)
+        layout.prop(props, "view_planning")
+        if props.view_planning == 'coverage':
+            row_p = layout.row(align=True)
+            row_p.prop(props, "target_coverage")
+            row_p.prop(props, "plan_candidates")
+
         # 周囲をどの角度で撮影するか
         row = layout.row(align=True)
         row.label(text="Orbit Step")
@@ -71,9 +127,46 @@ class ORBITSNAP_PT_Panel(bpy.types.Panel):
 
         layout.separator()
         layout.prop(props, "open_folder_after_capture")
+        layout.prop(props, "use_pipeline")
+        layout.prop(props, "incremental")
+        layout.prop(props, "session_index")
+        layout.prop(props, "similarity_index")
+        row6 = layout.row(align=True)
+        row6.prop(props, "use_image_store")
+        row6.operator("orbitsnap.store_gc", text="", icon="TRASH")
+        row7 = layout.row()
+        row7.prop(props, "contact_sheet")
+        sub = row7.row()
+        sub.enabled = props.contact_sheet
+        sub.prop(props, "contact_sheet_cell_width")
+        row8 = layout.row()
+        row8.prop(props, "turntable_format")
+        sub = row8.row()
+        sub.enabled = props.turntable_format != 'none'
+        sub.prop(props, "turntable_fps")
+        layout.prop(props, "save_stills")
+        layout.prop(props, "offscreen")
+        layout.prop(props, "use_modal")
+        row5 = layout.row()
+        row5.enabled = props.use_modal
+        row5.prop(props, "shots_per_tick")
+        row9 = layout.row()
+        row9.prop(props, "profile")
+        sub = row9.row()
+        sub.enabled = props.profile
+        sub.prop(props, "profile_memory")
 
         layout.separator()
-        layout.operator("orbitsnap.run_capture", text="Shot Orbit Snap", icon="RENDER_STILL")
+        if progress.running:
+            # 撮影中は進捗と残り時間を表示する
+            remaining = progress.remaining_seconds()
+            eta = "--:--" if remaining is None else f"{int(remaining) // 60:02d}:{int(remaining) % 60:02d}"
+            layout.progress(factor=progress.factor, type='BAR', text=f"{progress.done}/{progress.total}  残り {eta}")
+            layout.label(text="Escで中止", icon="CANCEL")
+        elif props.use_modal:
+            layout.operator("orbitsnap.run_capture_modal", text="Shot Orbit Snap", icon="RENDER_STILL")
+        else:
+            layout.operator("orbitsnap.run_capture", text="Shot Orbit Snap", icon="RENDER_STILL")
 
 def register():
     bpy.utils.register_class(ORBITSNAP_PT_Panel)
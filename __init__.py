@@ -3,9 +3,12 @@ import os
 # モジュールをインポート
 from .properties import property_group
 from .operators import run_capture
+from .operators import store_gc
 from .UI import capture_panel
 from .core import prop_sync
 from .core import props_access
+from .object import geometry_updates
+from .core.auto_camera import CameraRig
 
 #ルートパスの定義
 addon_dir = os.path.dirname(__file__)
@@ -13,6 +16,7 @@ addon_dir = os.path.dirname(__file__)
 modules = [
     property_group,
     run_capture,
+    store_gc,
     capture_panel,
 ]
 
@@ -28,6 +32,8 @@ def register():
     # Before saving, sync WM -> Scene so values persist even without running
     if prop_sync.on_save_pre not in bpy.app.handlers.save_pre:
         bpy.app.handlers.save_pre.append(prop_sync.on_save_pre)
+    # 凸包のキャッシュが使えるかを depsgraph の更新から判断する
+    geometry_updates.register()
     # Also run once for current session
     try:
         prop_sync.on_load_post(None)
@@ -42,6 +48,14 @@ def unregister():
     if prop_sync.on_save_pre in bpy.app.handlers.save_pre:
         bpy.app.handlers.save_pre.remove(prop_sync.on_save_pre)
     props_access.unregister_pointer_properties()
+    geometry_updates.unregister()
+
+    # 使い回していた撮影用のカメラをデータごと削除する
+    try:
+        CameraRig.purge()
+    except (AttributeError, RuntimeError) as e:
+        # 終了時などデータにアクセスできない場合は何もしない
+        print(f"OrbitSnap: 撮影用カメラを削除できませんでした: {e}")
 
 if __name__ == "__main__":
     register()
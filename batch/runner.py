@@ -0,0 +1,399 @@
+"""OrbitSnap のバッチ撮影ランナー
+
+ジョブ定義(マニフェスト)に書かれた .blend ファイルを､複数の Blender プロセス
+(blender -b)で並列に撮影する｡Blender を含まない通常の Python で実行する｡
+
+    python batch/runner.py manifest.json --workers 4 --report report.json
+
+"display" を "xvfb" にすると､-b を付けずに仮想ディスプレイ(xvfb-run)の中で Blender を
+起動する｡3Dビューがあるのでオフスクリーン撮影でメモリに直接読み込める
+(-b ではウィンドウがないため､1枚ずつファイルに書き出す)｡
+
+マニフェストの例:
+
+    {
+        "blender": "blender",
+        "workers": 4,
+        "timeout": 600,
+        "retries": 1,
+        "software_gl": true,
+        "display": "background",
+        "output_dir": "snapshots",
+        "settings": {"quality": "low", "orbit_step": 45, "elevation_angles": [0, 30]},
+        "jobs": [
+            {"file": "assets/chair.blend", "objects": ["Chair"]},
+            {"file": "assets/kit.blend", "collections": ["Props"], "settings": {"quality": "high"}}
+        ]
+    }
+
+相対パスはマニフェストのあるフォルダを基準にする｡
+
+"shards" を 2 以上にすると(ジョブごとにも指定できる)､1つの .blend の撮影を shards 個の Blender で
+分担する｡最初の Blender で画角だけを計算し､撮影角度の一覧を分けて各 Blender に渡すので､
+すべてのショットが同じカメラ位置・同じ番号で1つのセッションフォルダに保存される｡
+一覧画像・アニメーション・類似度の索引・差分撮影・画像ストアのような､セッション全体の画像が必要な出力は
+分担撮影では書き出さない｡セッションの索引はランナーがまとめて記録する｡
+"""
+import argparse
+import datetime
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+# ワーカーが標準出力に書き出す結果行の接頭辞
+RESULT_PREFIX = "ORBITSNAP_RESULT "
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker.py")
+
+DEFAULTS = {
+    "blender": "blender",
+    "workers": max(1, (os.cpu_count() or 2) // 2),
+    "timeout": 600,
+    "retries": 1,
+    "software_gl": True,
+    "display": "background",
+    "shards": 1,
+}
+
+# 分担撮影で無効にする設定(セッション全体の画像が必要な出力や､ほかのプロセスと同じファイルに書き込む記録)
+SHARD_DISABLED = {
+    "contact_sheet": False,
+    "turntable_format": "none",
+    "similarity_index": False,
+    "incremental": False,
+    "use_image_store": False,
+    "session_index": False,
+}
+
+SESSION_DB_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "core", "session_db.py")
+
+# 仮想ディスプレイで起動する場合の画面サイズ
+XVFB_SCREEN = "1920x1080x24"
+
+
+@dataclass
+class JobResult:
+    """1ジョブの実行結果
+
+    Attributes:
+        file: 撮影した .blend ファイル
+        status: 'ok' / 'failed' / 'timeout'
+        attempts: 実行回数(リトライを含む)
+        seconds: 最後の実行にかかった時間
+        shots: 撮影枚数
+        save_dir: 保存先フォルダ
+        error: 失敗時のエラー内容
+        extra: ワーカーが返したその他の情報(撮影時間など)
+    """
+    file: str
+    status: str = "failed"
+    attempts: int = 0
+    seconds: float = 0.0
+    shots: int = 0
+    save_dir: Optional[str] = None
+    error: Optional[str] = None
+    extra: dict = field(default_factory=dict)
+
+
+def load_manifest(path: str) -> dict:
+    """マニフェストを読み込み､相対パスを絶対パスにする"""
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    for key, value in DEFAULTS.items():
+        manifest.setdefault(key, value)
+    manifest["output_dir"] = os.path.join(base_dir, manifest.get("output_dir", "snapshots"))
+
+    jobs = manifest.get("jobs")
+    if not jobs:
+        raise ValueError("マニフェストに jobs がありません")
+    if manifest["display"] not in ("background", "xvfb"):
+        raise ValueError(f"display は background か xvfb を指定してください: {manifest['display']}")
+    for job in jobs:
+        if "file" not in job:
+            raise ValueError(f"file が指定されていないジョブがあります: {job}")
+        job["file"] = os.path.join(base_dir, job["file"])
+        if "output_dir" in job:
+            job["output_dir"] = os.path.join(base_dir, job["output_dir"])
+    return manifest
+
+
+def build_worker_job(manifest: dict, job: dict) -> dict:
+    """ワーカーに渡すジョブ定義(共通設定とジョブごとの設定をマージしたもの)"""
+    blend_stem = os.path.splitext(os.path.basename(job["file"]))[0]
+    settings = dict(manifest.get("settings", {}))
+    settings.update(job.get("settings", {}))
+    settings["directory"] = job.get("output_dir") or os.path.join(manifest["output_dir"], blend_stem)
+
+    worker_job = {key: value for key, value in job.items() if key not in ("settings", "output_dir")}
+    worker_job["settings"] = settings
+    return worker_job
+
+
+def build_command(manifest: dict, blend_file: str, job_path: str) -> list[str]:
+    if manifest["display"] == "xvfb":
+        command = ["xvfb-run", "-a", "-s", f"-screen 0 {XVFB_SCREEN}", manifest["blender"], blend_file]
+    else:
+        command = [manifest["blender"], "-b", blend_file]
+    command += ["--factory-startup", "--python-exit-code", "1"]
+    if manifest["software_gl"]:
+        command += ["--gpu-backend", "opengl"]
+    command += ["--python", WORKER_SCRIPT, "--", job_path]
+    return command
+
+
+def build_env(manifest: dict) -> dict:
+    env = dict(os.environ)
+    if manifest["software_gl"]:
+        # GPUのないLinuxでもMesaのソフトウェアOpenGL(llvmpipe)で描画する
+        env["LIBGL_ALWAYS_SOFTWARE"] = "1"
+        env.setdefault("GALLIUM_DRIVER", "llvmpipe")
+    return env
+
+
+def parse_result(stdout: str) -> Optional[dict]:
+    for line in reversed(stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    return None
+
+
+def _tail(text: str, lines: int = 20) -> str:
+    return "\n".join((text or "").strip().splitlines()[-lines:])
+
+
+def run_job(manifest: dict, job: dict) -> JobResult:
+    """1ジョブを実行する｡shards が 2 以上の場合は分担して撮影する"""
+    worker_job = build_worker_job(manifest, job)
+    timeout = job.get("timeout", manifest["timeout"])
+    if job.get("shards", manifest["shards"]) > 1:
+        return run_sharded_job(manifest, job["file"], worker_job, timeout, job.get("shards", manifest["shards"]))
+    return run_worker(manifest, job["file"], worker_job, timeout)
+
+
+def run_worker(manifest: dict, blend_file: str, worker_job: dict, timeout: float) -> JobResult:
+    """Blender を1つ起動してワーカーを実行する｡失敗やタイムアウトの場合は retries 回までやり直す"""
+    result = JobResult(file=blend_file)
+    env = build_env(manifest)
+
+    with tempfile.TemporaryDirectory(prefix="orbitsnap_job_") as tmp_dir:
+        job_path = os.path.join(tmp_dir, "job.json")
+        with open(job_path, "w", encoding="utf-8") as f:
+            json.dump(worker_job, f)
+        command = build_command(manifest, blend_file, job_path)
+
+        for attempt in range(1, manifest["retries"] + 2):
+            result.attempts = attempt
+            start = time.perf_counter()
+            try:
+                proc = subprocess.run(command, env=env, capture_output=True, text=True, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                result.status = "timeout"
+                result.error = f"{timeout}秒以内に終わりませんでした"
+                result.seconds = time.perf_counter() - start
+                continue
+            except OSError as e:
+                # Blender が起動できない場合はリトライしても同じなので打ち切る
+                result.status = "failed"
+                result.error = str(e)
+                break
+            result.seconds = time.perf_counter() - start
+
+            payload = parse_result(proc.stdout)
+            if proc.returncode == 0 and payload is not None:
+                result.status = "ok"
+                result.error = None
+                result.shots = payload.get("shots", 0)
+                result.save_dir = payload.get("save_dir")
+                result.extra = {k: v for k, v in payload.items() if k not in ("shots", "save_dir")}
+                break
+
+            result.status = "failed"
+            result.error = _tail(proc.stderr) or _tail(proc.stdout) or f"exit code {proc.returncode}"
+
+    return result
+
+
+def split_shots(plan: list[dict], shards: int) -> list[list[list]]:
+    """画角の計算結果の撮影角度を shards 個に分ける
+
+    ショットは [対象の番号, ファイル名の番号, 仰角, 水平角]｡番号は1つの Blender で撮影した場合と同じ｡
+    仰角ごとに描画の重さが偏らないように､撮影順に1つずつ順番に割り振る｡
+    """
+    shots = [[target_index, number, x_angle, z_angle]
+             for target_index, target in enumerate(plan)
+             for number, (x_angle, z_angle) in enumerate(target["shot_angle_list"])]
+    return [part for part in (shots[i::shards] for i in range(shards)) if part]
+
+
+def merge_encode_stats(results: list[JobResult]) -> dict:
+    """各 Blender の保存形式ごとのバイト数とエンコード時間を合計する"""
+    merged = {}
+    for result in results:
+        for name, values in result.extra.get("encode", {}).items():
+            total = merged.setdefault(name, {})
+            for key, value in values.items():
+                if isinstance(value, (int, float)):
+                    total[key] = total.get(key, 0) + value
+    return merged
+
+
+def record_session(root_dir: str, session_dir: str, blend_file: str, plan_payload: dict,
+                   shard_results: list[JobResult], seconds: float):
+    """分担撮影したショットを1つのセッションとして保存フォルダの索引に書き込む"""
+    spec = importlib.util.spec_from_file_location("orbitsnap_session_db", SESSION_DB_SCRIPT)
+    session_db = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(session_db)
+
+    session = plan_payload["session"]
+    with session_db.SessionIndex(root_dir) as index:
+        session_id = index.begin_session(
+            session_dir, blend_file, datetime.datetime.fromisoformat(plan_payload["datetime"]),
+            focal_length=session["focal_length"], image_format=session["image_format"], settings=session["settings"])
+        shot_count = 0
+        for target_index, target in enumerate(plan_payload["plan"]):
+            rows = [row for result in shard_results for row in result.extra.get("records", {}).get(str(target_index), [])]
+            rows.sort(key=lambda row: (row["shot_index"], row["variant"]))
+            index.add_target(session_id, target["name"], target["objects"], rows)
+            shot_count += sum(row["variant"] == "" for row in rows)
+        index.finish_session(session_id, datetime.datetime.now(), shot_count, seconds)
+
+
+def run_sharded_job(manifest: dict, blend_file: str, worker_job: dict, timeout: float, shards: int) -> JobResult:
+    """1つの .blend の撮影を shards 個の Blender で分担する
+
+    最初に1つの Blender で画角だけを計算し､撮影角度を分けて shards 個の Blender で同時に撮影する｡
+    セッションフォルダの日時と画角はすべての Blender で同じ値を使う｡
+    """
+    start = time.perf_counter()
+    plan_result = run_worker(manifest, blend_file, dict(worker_job, mode="plan"), timeout)
+    if plan_result.status != "ok":
+        plan_result.error = f"画角を計算できませんでした: {plan_result.error}"
+        return plan_result
+    plan_payload = plan_result.extra
+    parts = split_shots(plan_payload["plan"], shards)
+
+    # 画角の計算時の設定(省略した値も既定値で入っている)から､分担撮影で書き出さない出力を調べる
+    requested = plan_payload["session"]["settings"]
+    disabled = [key for key, value in SHARD_DISABLED.items() if key != "session_index" and requested.get(key) != value]
+    settings = dict(worker_job["settings"])
+    settings.update(SHARD_DISABLED)
+    settings["datetime"] = plan_payload["datetime"]
+    shard_job = dict(worker_job, mode="shard", plan=plan_payload["plan"], settings=settings)
+
+    with ThreadPoolExecutor(max_workers=len(parts)) as executor:
+        shard_results = list(executor.map(
+            lambda part: run_worker(manifest, blend_file, dict(shard_job, shots=part), timeout), parts))
+
+    result = JobResult(file=blend_file, status="ok", seconds=time.perf_counter() - start)
+    result.attempts = max([plan_result.attempts] + [r.attempts for r in shard_results])
+    result.shots = sum(r.shots for r in shard_results)
+    result.save_dir = next((r.save_dir for r in shard_results if r.save_dir), None)
+    result.extra = {
+        "shards": len(parts),
+        "plan_seconds": plan_result.seconds,
+        "shard_seconds": [r.seconds for r in shard_results],
+        "shard_shots": [r.shots for r in shard_results],
+        "disabled": disabled,
+        "encode": merge_encode_stats(shard_results),
+    }
+    budgets = [r.extra["render_budget"] for r in shard_results if "render_budget" in r.extra]
+    if budgets:
+        result.extra["render_budget"] = {
+            "budget": budgets[0]["budget"],
+            "shots": sum(b["shots"] for b in budgets),
+            "seconds": sum(b["seconds"] for b in budgets),
+            "max_seconds": max(b["max_seconds"] for b in budgets),
+            "over_budget": sum(b["over_budget"] for b in budgets),
+        }
+    if len(plan_payload["plan"]) > 1:
+        result.extra["targets"] = [target["name"] for target in plan_payload["plan"]]
+
+    failed = [r for r in shard_results if r.status != "ok"]
+    if failed:
+        result.status = failed[0].status
+        result.error = "\n".join(f"shard {shard_results.index(r)}: {r.error}" for r in failed)
+        return result
+
+    # 索引は各 Blender では書き込まず､撮影が揃ってから1つのセッションとして記録する
+    if requested.get("session_index") and result.save_dir:
+        try:
+            record_session(worker_job["settings"]["directory"], result.save_dir, blend_file,
+                           plan_payload, shard_results, result.seconds)
+        except Exception as e:
+            # 撮影は済んでいるので失敗にはしない
+            result.extra["index_error"] = str(e)
+    return result
+
+
+def run_all(manifest: dict, workers: int, on_done=None) -> list[JobResult]:
+    """全ジョブを workers 個の Blender プロセスで並列に実行する"""
+    jobs = manifest["jobs"]
+    results = [None] * len(jobs)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_job, manifest, job): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = future.result()
+            if on_done:
+                on_done(results[i])
+    return results
+
+
+def format_summary(results: list[JobResult], elapsed: float) -> str:
+    ok = sum(r.status == "ok" for r in results)
+    shots = sum(r.shots for r in results)
+    lines = [f"{'status':<8} {'tries':>5} {'sec':>8} {'shots':>6}  file"]
+    for r in results:
+        lines.append(f"{r.status:<8} {r.attempts:>5} {r.seconds:>8.1f} {r.shots:>6}  {r.file}")
+        if r.error:
+            lines.extend("    " + line for line in r.error.splitlines()[-3:])
+    lines.append(f"{ok}/{len(results)} jobs ok, {shots} shots, {elapsed:.1f}s")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest", help="ジョブ定義のJSONファイル")
+    parser.add_argument("--workers", type=int, help="同時に起動する Blender の数")
+    parser.add_argument("--blender", help="Blender の実行ファイル")
+    parser.add_argument("--timeout", type=float, help="1ジョブあたりのタイムアウト(秒)")
+    parser.add_argument("--retries", type=int, help="失敗したジョブをやり直す回数")
+    parser.add_argument("--shards", type=int, help="1ジョブの撮影を分担する Blender の数")
+    parser.add_argument("--no-software-gl", action="store_true", help="ソフトウェアOpenGLを強制しない")
+    parser.add_argument("--xvfb", action="store_true", help="-b の代わりに仮想ディスプレイで Blender を起動する")
+    parser.add_argument("--report", help="結果を書き出すJSONファイル")
+    args = parser.parse_args(argv)
+
+    manifest = load_manifest(args.manifest)
+    for key in ("workers", "blender", "timeout", "retries", "shards"):
+        if getattr(args, key) is not None:
+            manifest[key] = getattr(args, key)
+    if args.no_software_gl:
+        manifest["software_gl"] = False
+    if args.xvfb:
+        manifest["display"] = "xvfb"
+
+    start = time.perf_counter()
+    results = run_all(manifest, manifest["workers"],
+                      on_done=lambda r: print(f"[{r.status}] {r.file}", flush=True))
+    elapsed = time.perf_counter() - start
+
+    print(format_summary(results, elapsed))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"elapsed": elapsed, "jobs": [asdict(r) for r in results]}, f, ensure_ascii=False, indent=2)
+
+    return 0 if all(r.status == "ok" for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
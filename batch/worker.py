@@ -0,0 +1,191 @@
+"""バッチ撮影のワーカー｡blender -b の中で1ジョブを撮影する
+
+    blender -b asset.blend --python batch/worker.py -- job.json
+
+ジョブ定義は runner.py が作成する｡結果は RESULT_PREFIX を付けて標準出力に1行で書き出す｡
+"""
+import importlib
+import json
+import os
+import sys
+import time
+from dataclasses import asdict
+
+import bpy
+
+# バッチ撮影での設定の標準値(ジョブの settings で上書きできる)
+# パネルの標準値は既存の撮影方法のままだが､ヘッドレスでは画面の操作がないので
+# 3Dビューがあればオフスクリーンで撮影し､保存は撮影と並行して行う
+BATCH_DEFAULTS = {
+    "offscreen": True,
+    "use_pipeline": True,
+}
+
+
+def load_addon():
+    """このファイルを含むアドオンをパッケージとして読み込む(登録はしない)"""
+    addon_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parent_dir = os.path.dirname(addon_dir)
+    if parent_dir not in sys.path:
+        sys.path.insert(0, parent_dir)
+    return importlib.import_module(os.path.basename(addon_dir))
+
+
+def resolve_targets(job: dict) -> list:
+    """撮影対象のオブジェクト｡指定がなければシーン内の表示されているジオメトリ全て"""
+    GEOMETRY_TYPES = importlib.import_module(f"{load_addon().__name__}.object.fingerprint").GEOMETRY_TYPES
+    targets = []
+    for name in job.get("objects", []):
+        obj = bpy.data.objects.get(name)
+        if obj is None:
+            raise ValueError(f"オブジェクトが見つかりません: {name}")
+        targets.append(obj)
+    for name in job.get("collections", []):
+        collection = bpy.data.collections.get(name)
+        if collection is None:
+            raise ValueError(f"コレクションが見つかりません: {name}")
+        targets.extend(obj for obj in collection.all_objects if obj.type in GEOMETRY_TYPES)
+
+    if not job.get("objects") and not job.get("collections"):
+        targets = [obj for obj in bpy.context.scene.objects if obj.type in GEOMETRY_TYPES and obj.visible_get()]
+
+    # 順序を保ったまま重複を除く
+    targets = list(dict.fromkeys(targets))
+    if not targets:
+        raise ValueError("撮影対象のオブジェクトがありません")
+    return targets
+
+
+def run_job(job: dict) -> dict:
+    """ジョブを実行する
+
+    job["mode"] が "plan" の場合は画角だけを計算して返す｡"shard" の場合は job["plan"] の画角を使い､
+    job["shots"] の [対象の番号, ファイル名の番号, 仰角, 水平角] だけを撮影する(runner.py の分担撮影)｡
+    """
+    addon = load_addon()
+    package = addon.__name__
+    OrbitSnapManager = importlib.import_module(f"{package}.core.capture_manager").OrbitSnapManager
+    CaptureSettings = importlib.import_module(f"{package}.properties.capture_settings").CaptureSettings
+    Watermark = importlib.import_module(f"{package}.core.watermark").Watermark
+    ShotWriter = importlib.import_module(f"{package}.core.shot_writer").ShotWriter
+    DerivativeChain = importlib.import_module(f"{package}.core.derivatives").DerivativeChain
+    ImageEncoder = importlib.import_module(f"{package}.core.encoders").ImageEncoder
+    CapturePipeline = importlib.import_module(f"{package}.core.capture_pipeline").CapturePipeline
+
+    if job.get("engine"):
+        bpy.context.scene.render.engine = job["engine"]
+
+    mode = job.get("mode", "session")
+    settings = CaptureSettings.from_dict({**BATCH_DEFAULTS, **job["settings"]})
+    os.makedirs(settings.directory, exist_ok=True)
+    targets = resolve_targets(job)
+
+    start = time.perf_counter()
+    manager = OrbitSnapManager(None, targets, settings)
+
+    if mode == "plan":
+        manager.frame_targets()
+        return {
+            "shots": 0,
+            "seconds": time.perf_counter() - start,
+            "datetime": settings.datetime.isoformat(),
+            "plan": manager.framing_plan(),
+            "session": {
+                "focal_length": settings.focal_length,
+                "image_format": settings.image_format,
+                "settings": json.loads(json.dumps(asdict(settings), default=str)),
+            },
+        }
+
+    if mode == "shard":
+        shot_plan = [tuple(item) for item in job["shots"]]
+    records = {} # 対象の番号 -> 索引に記録する行(分担撮影では親プロセスがまとめて記録する)
+
+    pipeline = None
+    try:
+        manager.prepare(framing=job.get("plan"))
+        if mode != "shard":
+            shot_plan = [(target_index, None, x_angle, z_angle) for target_index, x_angle, z_angle in manager.shot_plan]
+        store = manager.image_store
+        sinks = manager.sinks
+        stats = manager.encode_stats
+        profiler = manager.profiler
+
+        def make_writer():
+            return ShotWriter(Watermark(settings=settings), store, sinks, settings.save_stills,
+                              DerivativeChain(settings), ImageEncoder(settings, stats), manager.shot_records, profiler)
+
+        def take_records():
+            if mode == "shard" and manager.target_index is not None:
+                records.setdefault(manager.target_index, []).extend(manager.shot_records.take())
+
+        if settings.use_pipeline:
+            pipeline = CapturePipeline(make_writer)
+        writer = make_writer()
+        for target_index, number, x_angle, z_angle in shot_plan:
+            if target_index != manager.target_index:
+                # 次の対象に移る前に､前の対象のショットをすべて書き出す
+                if pipeline:
+                    with profiler.span("drain"):
+                        pipeline.drain()
+                    pipeline.raise_if_failed()
+                take_records()
+                with profiler.span("begin_target", target=target_index):
+                    manager.begin_target(target_index)
+            with profiler.span("shot", x=x_angle, z=z_angle):
+                shot = manager.capture(x_angle, z_angle, number)
+                if pipeline:
+                    with profiler.span("submit"):
+                        pipeline.submit(shot)
+                else:
+                    writer.write(shot)
+        if pipeline:
+            with profiler.span("drain"):
+                pipeline.drain()
+            pipeline.raise_if_failed()
+        take_records()
+    finally:
+        if pipeline:
+            pipeline.close()
+        manager.cleanup()
+
+    result = {
+        "shots": manager.shot_count,
+        "save_dir": manager.session_dir,
+        "seconds": time.perf_counter() - start,
+        "objects": [obj.name for obj in targets],
+        "encode": manager.encode_stats.as_dict(),
+    }
+    if mode == "shard":
+        result["records"] = {str(index): rows for index, rows in records.items()}
+    if len(manager.targets) > 1:
+        result["targets"] = [target.name for target in manager.targets]
+    if manager.profiler:
+        result["profile"] = manager.profiler.as_dict()
+    if manager.cycles is not None:
+        result["render_budget"] = manager.cycles.budget.as_dict()
+    if manager.view_plan is not None:
+        result["coverage"] = manager.view_plan.coverage
+        result["grid_coverage"] = manager.view_plan.grid_coverage
+    return result
+
+
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    if not argv:
+        raise SystemExit("ジョブ定義のJSONファイルを指定してください")
+    with open(argv[0], encoding="utf-8") as f:
+        job = json.load(f)
+
+    result = run_job(job)
+
+    runner = importlib.import_module(f"{load_addon().__name__}.batch.runner")
+    print(runner.RESULT_PREFIX + json.dumps(result, ensure_ascii=False), flush=True)
+
+    # 仮想ディスプレイで起動した場合はウィンドウが開いたままになるので閉じる
+    if not bpy.app.background:
+        bpy.ops.wm.quit_blender()
+
+
+if __name__ == "__main__":
+    main()
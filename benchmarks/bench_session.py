@@ -0,0 +1,77 @@
+"""合成シーンで撮影セッションを最後まで実行し､時間を計測する
+
+ヘッドレスの Blender の中で実行する(run_benchmarks.py の --blender から呼ばれる)｡
+
+    blender -b --factory-startup --python benchmarks/bench_session.py -- --objects 20 --out /tmp/orbitsnap_bench
+
+格子状に並べた立方体を撮影対象にして batch/worker.py と同じ手順で撮影する｡
+結果は runner.RESULT_PREFIX を付けて標準出力に1行で書き出す｡
+"""
+import argparse
+import importlib
+import json
+import math
+import os
+import sys
+
+import bpy
+
+
+def load_addon():
+    addon_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parent_dir = os.path.dirname(addon_dir)
+    if parent_dir not in sys.path:
+        sys.path.insert(0, parent_dir)
+    return importlib.import_module(os.path.basename(addon_dir))
+
+
+def build_scene(count: int) -> list[str]:
+    """count 個の立方体を格子状に並べ､オブジェクト名のリストを返す"""
+    verts = [(x, y, z) for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)]
+    faces = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+    mesh = bpy.data.meshes.new("BenchCube")
+    mesh.from_pydata(verts, [], faces)
+
+    side = math.ceil(math.sqrt(count))
+    names = []
+    for i in range(count):
+        obj = bpy.data.objects.new(f"BenchCube.{i:04d}", mesh)
+        obj.location = ((i % side) * 3.0, (i // side) * 3.0, 0.0)
+        obj.rotation_euler = (0.0, 0.0, i * 0.3)
+        bpy.context.scene.collection.objects.link(obj)
+        names.append(obj.name)
+    return names
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--objects", type=int, default=20, help="撮影対象の立方体の数")
+    parser.add_argument("--quality", default="middle", choices=("high", "middle", "low"))
+    parser.add_argument("--orbit-step", type=int, default=30, help="水平回転の分割角度")
+    parser.add_argument("--format", default="png", choices=("png", "jpeg", "webp"))
+    parser.add_argument("--out", required=True, help="撮影画像の保存先")
+    args = parser.parse_args(argv)
+
+    package = load_addon().__name__
+    worker = importlib.import_module(f"{package}.batch.worker")
+    runner = importlib.import_module(f"{package}.batch.runner")
+
+    job = {
+        "objects": build_scene(args.objects),
+        "settings": {
+            "directory": args.out,
+            "quality": args.quality,
+            "orbit_step": args.orbit_step,
+            "elevation_angles": [0, 30, 60, -30],
+            "image_format": args.format,
+        },
+    }
+    result = worker.run_job(job)
+    result["params"] = {"objects": args.objects, "quality": args.quality,
+                        "orbit_step": args.orbit_step, "format": args.format}
+    result.pop("objects", None)
+    print(runner.RESULT_PREFIX + json.dumps(result, ensure_ascii=False), flush=True)
+
+
+if __name__ == "__main__":
+    main(sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else [])
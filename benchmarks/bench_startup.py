@@ -0,0 +1,120 @@
+"""アドオンの読み込みと登録(register)にかかる時間を計測する
+
+Blender の中で実行すると､Blender の起動時にアドオンが追加する時間を計測する｡
+
+    blender -b --factory-startup --python benchmarks/bench_startup.py -- --json startup.json
+
+通常の Python で実行すると bpy_stub を使い､新しいインタプリタで読み込みと登録を --runs 回繰り返す
+(Blender 本体の起動時間は含まない)｡
+
+    python benchmarks/bench_startup.py --runs 20 --json startup.json
+
+どちらも登録までに読み込まれた重いモジュール(Pillow / numpy / 撮影処理)を表示する｡
+変更の前後で比較する場合は､それぞれのリビジョンで実行した結果を比べる｡
+"""
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+IN_BLENDER = bpy is not None
+
+# 撮影するまで読み込まなくてよいモジュール(パッケージ内のものはパッケージ名を除いた名前)
+HEAVY_MODULES = ("PIL", "numpy", "core.watermark", "core.framing", "core.capture_manager", "core.shot_writer")
+
+
+def load_package():
+    """アドオンを読み込む関数と､そのパッケージ名"""
+    if IN_BLENDER:
+        addon_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        parent_dir = os.path.dirname(addon_dir)
+        if parent_dir not in sys.path:
+            sys.path.insert(0, parent_dir)
+        name = os.path.basename(addon_dir)
+        return (lambda: importlib.import_module(name)), name
+
+    import bpy_stub
+    bpy_stub.install()
+    return bpy_stub.load_package, bpy_stub.PACKAGE_NAME
+
+
+def measure_once() -> dict:
+    """このプロセスでアドオンを読み込んで登録し､時間と新たに読み込まれたモジュールを返す"""
+    load, package = load_package()
+    before = set(sys.modules)
+
+    start = time.perf_counter()
+    addon = load()
+    imported = time.perf_counter()
+    addon.register()
+    registered = time.perf_counter()
+
+    loaded = set(sys.modules) - before
+    heavy = []
+    for name in HEAVY_MODULES:
+        full_name = name if name in ("PIL", "numpy") else f"{package}.{name}"
+        if full_name in loaded:
+            heavy.append(name)
+
+    addon.unregister()
+    return {
+        "import_ms": (imported - start) * 1000,
+        "register_ms": (registered - imported) * 1000,
+        "total_ms": (registered - start) * 1000,
+        "modules": len(loaded),
+        "heavy_modules": heavy,
+    }
+
+
+def measure_fresh(runs: int) -> dict:
+    """新しいインタプリタで runs 回計測して中央値をとる(読み込み済みのモジュールの影響を除く)"""
+    samples = []
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"],
+                                   capture_output=True, text=True, check=True,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+        samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    result = {key: statistics.median(sample[key] for sample in samples)
+              for key in ("import_ms", "register_ms", "total_ms")}
+    result["min_total_ms"] = min(sample["total_ms"] for sample in samples)
+    result["modules"] = samples[-1]["modules"]
+    result["heavy_modules"] = samples[-1]["heavy_modules"]
+    result["runs"] = runs
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="計測の回数(通常の Python で実行する場合)")
+    parser.add_argument("--json", help="結果を書き出すJSONファイル")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(measure_once()))
+        return
+
+    result = measure_once() if IN_BLENDER else measure_fresh(args.runs)
+    result["environment"] = "blender" if IN_BLENDER else "bpy_stub"
+
+    print(f"import   {result['import_ms']:8.1f} ms")
+    print(f"register {result['register_ms']:8.1f} ms")
+    print(f"total    {result['total_ms']:8.1f} ms ({result['modules']} modules)")
+    print(f"heavy    {', '.join(result['heavy_modules']) or '-'}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else None)
@@ -0,0 +1,106 @@
+"""Watermark の1ショットあたりのコストを計測するマイクロベンチマーク
+
+QUALITY_PRESETS ごとに､従来の全面レイヤー合成(before)と
+テキスト範囲のみの合成(after)を比較する｡
+
+    python benchmarks/bench_watermark.py --font path/to/NotoSansJP-Regular.ttf
+"""
+import argparse
+import datetime
+import importlib
+import os
+import time
+
+import bpy_stub
+
+RESOLUTIONS = {
+    "high": (1920, 1080),
+    "middle": (1280, 720),
+    "low": (854, 480),
+}
+
+
+def legacy_compose(watermark, img, orbit_angle, elevation_angle):
+    """変更前の Watermark.draw と同じ処理(読み込み・保存を除く)"""
+    from PIL import Image, ImageDraw
+
+    text = watermark.generate_text(orbit_angle, elevation_angle)
+    txt_layer = Image.new("RGBA", img.size, (255, 255, 255, 0))
+    draw = ImageDraw.Draw(txt_layer)
+    draw.multiline_text((watermark.x, watermark.y), text, font=watermark.font, fill=watermark.fill_color,
+                        stroke_width=watermark.stroke_width, stroke_fill=watermark.outline_color)
+    return Image.alpha_composite(img, txt_layer)
+
+
+def make_settings(quality: str):
+    capture_settings = importlib.import_module(f"{bpy_stub.PACKAGE_NAME}.properties.capture_settings")
+    # 情報の大きさは解像度に合わせて縮小されるので､画質の解像度にする
+    resolution_x, resolution_y = capture_settings.QUALITY_RESOLUTIONS[quality]
+    return capture_settings.CaptureSettings(
+        datetime=datetime.datetime(2025, 1, 1, 12, 0, 0),
+        directory="",
+        quality=quality,
+        resolution_x=resolution_x,
+        resolution_y=resolution_y,
+        w_datetime=True,
+        w_filename=True,
+        w_focal_length=True,
+        w_orbit_angle=True,
+        w_elevation_angle=True,
+        w_note=True,
+        note="progress check",
+    )
+
+
+def bench(func, shots):
+    start = time.perf_counter()
+    for i in range(shots):
+        func(i)
+    return (time.perf_counter() - start) / shots
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--font", help="TrueTypeフォントのパス(省略時はアドオン同梱のフォント)")
+    parser.add_argument("--shots", type=int, default=84, help="1プリセットあたりのショット数")
+    args = parser.parse_args()
+
+    bpy_stub.load_package()
+    from PIL import Image, ImageChops
+
+    watermark_module = importlib.import_module(f"{bpy_stub.PACKAGE_NAME}.core.watermark")
+    if args.font:
+        watermark_module.get_font_path = lambda: os.path.abspath(args.font)
+
+    angles = [(x, z) for x in (0, 30, 45, 60, -30, -45, -60) for z in range(0, 360, 30)]
+
+    print(f"{'quality':<8} {'size':>10} {'before ms':>10} {'after ms':>10} {'speedup':>8} {'max diff':>9}")
+    for quality in watermark_module.Watermark.QUALITY_PRESETS:
+        watermark = watermark_module.Watermark(make_settings(quality))
+        base = Image.new("RGBA", RESOLUTIONS[quality], (80, 90, 100, 255))
+
+        def before(i):
+            x, z = angles[i % len(angles)]
+            legacy_compose(watermark, base, z, x)
+
+        def after(i):
+            x, z = angles[i % len(angles)]
+            watermark.compose(base.copy(), z, x)
+
+        # ウォームアップ(静的な行の描画はセッションで1回だけなので計測から除く)
+        before(0)
+        after(0)
+
+        before_sec = bench(before, args.shots)
+        after_sec = bench(after, args.shots)
+
+        diff = ImageChops.difference(legacy_compose(watermark, base, 90, 30), watermark.compose(base.copy(), 90, 30))
+        max_diff = max(high for _, high in diff.getextrema())
+
+        size = "x".join(str(v) for v in base.size)
+        print(f"{quality:<8} {size:>10} {before_sec * 1000:>10.3f} {after_sec * 1000:>10.3f} "
+              f"{before_sec / after_sec:>7.1f}x {max_diff:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Blender の外で OrbitSnap を読み込むための最小限の bpy スタブ
+
+ベンチマーク用｡登録処理や描画は行わず､モジュールの読み込みに必要な名前だけを用意する｡
+mathutils の Vector と Matrix は画角の計算に使う演算だけを numpy で実装する｡
+起動時間の計測に影響しないように､numpy は Vector と Matrix を使うときに読み込む｡
+"""
+import importlib.util
+import os
+import sys
+import types
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = "orbitsnap"
+
+
+class _Struct:
+    pass
+
+
+def _prop(*_args, **_kwargs):
+    return None
+
+
+def _persistent(func):
+    return func
+
+
+def _numpy():
+    import numpy
+    return numpy
+
+
+class Vector:
+    """mathutils.Vector の代わり(要素の参照と加減算のみ)"""
+
+    def __init__(self, values=(0.0, 0.0, 0.0)):
+        np = _numpy()
+        self._co = np.array(tuple(values), dtype=np.float64)
+
+    def __array__(self, dtype=None, copy=None):
+        return self._co if dtype is None else self._co.astype(dtype)
+
+    def __len__(self):
+        return len(self._co)
+
+    def __iter__(self):
+        return iter(self._co.tolist())
+
+    def __getitem__(self, index):
+        return float(self._co[index])
+
+    def __add__(self, other):
+        return Vector(self._co + _numpy().asarray(other, dtype=float))
+
+    def __sub__(self, other):
+        return Vector(self._co - _numpy().asarray(other, dtype=float))
+
+    def __repr__(self):
+        return f"Vector({tuple(self)})"
+
+    x = property(lambda self: self[0])
+    y = property(lambda self: self[1])
+    z = property(lambda self: self[2])
+
+    def copy(self):
+        return Vector(self._co)
+
+
+class Matrix:
+    """mathutils.Matrix の代わり(4x4 の積と点の変換のみ)"""
+
+    def __init__(self, rows=None):
+        np = _numpy()
+        self._m = np.identity(4) if rows is None else np.array([tuple(row) for row in rows], dtype=np.float64)
+
+    def __array__(self, dtype=None, copy=None):
+        return self._m if dtype is None else self._m.astype(dtype)
+
+    def __iter__(self):
+        return iter(self._m.tolist())
+
+    def __matmul__(self, other):
+        if isinstance(other, Matrix):
+            return Matrix(self._m @ other._m)
+        # mathutils と同様に 3次元のベクトルは点として変換する
+        co = _numpy().asarray(other, dtype=float)
+        if len(co) == 3 and len(self._m) == 4:
+            return Vector(self._m[:3, :3] @ co + self._m[:3, 3])
+        return Vector(self._m @ co)
+
+    @classmethod
+    def Translation(cls, offset):
+        m = _numpy().identity(4)
+        m[:3, 3] = tuple(offset)
+        return cls(m)
+
+    @classmethod
+    def Diagonal(cls, values):
+        return cls(_numpy().diag(tuple(values)))
+
+    @classmethod
+    def Rotation(cls, angle, size, axis):
+        np = _numpy()
+        c, s = np.cos(angle), np.sin(angle)
+        i, j = {"X": (1, 2), "Y": (2, 0), "Z": (0, 1)}[axis]
+        m = np.identity(size)
+        m[i, i], m[i, j], m[j, i], m[j, j] = c, -s, s, c
+        return cls(m)
+
+
+def install(blend_filepath: str = "/tmp/orbitsnap_bench.blend"):
+    """bpy / bmesh / gpu / mathutils のスタブを sys.modules に登録する"""
+    if "bpy" in sys.modules:
+        return sys.modules["bpy"]
+
+    bpy = types.ModuleType("bpy")
+
+    bpy.types = types.ModuleType("bpy.types")
+    for name in ("PropertyGroup", "Operator", "Panel", "Scene", "WindowManager"):
+        setattr(bpy.types, name, type(name, (), {}))
+
+    bpy.props = types.ModuleType("bpy.props")
+    for name in ("IntProperty", "FloatProperty", "BoolProperty", "EnumProperty", "StringProperty", "PointerProperty"):
+        setattr(bpy.props, name, _prop)
+
+    bpy.app = types.ModuleType("bpy.app")
+    bpy.app.background = True
+    bpy.app.handlers = types.ModuleType("bpy.app.handlers")
+    bpy.app.handlers.persistent = _persistent
+    for name in ("load_post", "save_pre", "depsgraph_update_post", "frame_change_post", "undo_post", "redo_post"):
+        setattr(bpy.app.handlers, name, [])
+
+    bpy.path = types.ModuleType("bpy.path")
+    bpy.path.basename = os.path.basename
+    bpy.path.abspath = lambda path: path
+
+    bpy.data = _Struct()
+    bpy.data.filepath = blend_filepath
+
+    bpy.utils = types.ModuleType("bpy.utils")
+    bpy.utils.register_class = lambda cls: None
+    bpy.utils.unregister_class = lambda cls: None
+
+    bpy.context = _Struct()
+    bpy.ops = _Struct()
+
+    sys.modules["bpy"] = bpy
+    sys.modules["bpy.types"] = bpy.types
+    sys.modules["bpy.props"] = bpy.props
+    sys.modules["bpy.app"] = bpy.app
+    sys.modules["bpy.app.handlers"] = bpy.app.handlers
+    sys.modules["bpy.path"] = bpy.path
+    sys.modules["bpy.utils"] = bpy.utils
+
+    for name in ("bmesh", "gpu", "mathutils"):
+        sys.modules.setdefault(name, types.ModuleType(name))
+    mathutils = sys.modules["mathutils"]
+    mathutils.__dict__.setdefault("Vector", Vector)
+    mathutils.__dict__.setdefault("Matrix", Matrix)
+    for name in ("Quaternion", "Euler"):
+        if not hasattr(mathutils, name):
+            setattr(mathutils, name, type(name, (), {}))
+    bvhtree = sys.modules.setdefault("mathutils.bvhtree", types.ModuleType("mathutils.bvhtree"))
+    if not hasattr(bvhtree, "BVHTree"):
+        bvhtree.BVHTree = type("BVHTree", (), {})
+    mathutils.bvhtree = bvhtree
+
+    return bpy
+
+
+def load_package():
+    """リポジトリを orbitsnap パッケージとして読み込む"""
+    install()
+    if PACKAGE_NAME in sys.modules:
+        return sys.modules[PACKAGE_NAME]
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE_NAME, os.path.join(REPO_ROOT, "__init__.py"), submodule_search_locations=[REPO_ROOT])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE_NAME] = package
+    spec.loader.exec_module(package)
+    return package
@@ -0,0 +1,144 @@
+"""画角の計算(core/framing.solve_view_distances)を確認する
+
+Blender は不要で､bpy_stub を使って通常の Python で実行する｡
+
+    python benchmarks/check_framing.py --cases 200
+
+・perspective=False の結果が､以前の calc_capture_info のループ(直交射影の幅から逆算)と一致すること
+・perspective=True の距離にカメラを置くと､凸包の頂点(箱の角と点群)がすべて画角に収まり､
+  いちばん外側の頂点がちょうど画面の端に来ること
+を乱数で作った箱と点群で確認する｡一致しないケースがあれば終了コード 1 で終わる｡
+"""
+import argparse
+import importlib
+import math
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+
+import bpy_stub
+
+# 撮影角度(仰角 -60〜60､水平 15°刻み)
+SHOT_ANGLES = [[x, z] for x in (-60, -45, -30, 0, 30, 45, 60) for z in range(0, 360, 15)]
+
+
+def legacy_distance(corners, center, direction, sensor_width, sensor_height, focal_length, margin_scale) -> float:
+    """以前の calc_capture_info の1視点分(get_bbox_size_in_camera_view と calculate_required_distance)
+
+    以前のコードは角度から方向を求める式が AutoCamera と違っていたので､方向は同じものを渡す｡
+    """
+    forward = direction / np.linalg.norm(direction)
+    right = np.cross((0.0, 0.0, 1.0), forward)
+    right /= np.linalg.norm(right)
+    up = np.cross(forward, right)
+    up /= np.linalg.norm(up)
+
+    cam_pos = center + forward * 10
+    xs = [float(np.dot(corner - cam_pos, right)) for corner in corners]
+    ys = [float(np.dot(corner - cam_pos, up)) for corner in corners]
+    width = max(xs) - min(xs)
+    height = max(ys) - min(ys)
+
+    fov_x = 2 * math.atan(sensor_width / (2 * focal_length))
+    fov_y = 2 * math.atan(sensor_height / (2 * focal_length))
+    dist_x = (width / 2) / math.tan(fov_x / 2)
+    dist_y = (height / 2) / math.tan(fov_y / 2)
+    return max(dist_x, dist_y) * margin_scale
+
+
+def frame_extent(corners, center, x_angle, z_angle, distance, mathutils) -> float:
+    """AutoCamera と同じ位置・向きにカメラを置いたときの､頂点の画面上の位置の最大値(tan 単位で x, y)"""
+    rot_x = mathutils.Matrix.Rotation(math.radians(-x_angle), 4, 'X')
+    rot_z = mathutils.Matrix.Rotation(math.radians(z_angle), 4, 'Z')
+    offset = np.asarray(rot_z @ rot_x @ mathutils.Vector((0, -distance, 0)))
+    camera = center + offset
+
+    # to_track_quat('-Z', 'Y') と同じ向き(ロールはワールドZ軸基準)
+    forward = -offset / np.linalg.norm(offset)
+    right = np.cross(forward, (0.0, 0.0, 1.0))
+    if np.linalg.norm(right) < 1e-9:
+        right = np.array((1.0, 0.0, 0.0))
+    right /= np.linalg.norm(right)
+    up = np.cross(right, forward)
+
+    relative = corners - camera
+    depth = relative @ forward
+    if np.any(depth <= 0):
+        return math.inf, math.inf
+    return float(np.max(np.abs(relative @ right) / depth)), float(np.max(np.abs(relative @ up) / depth))
+
+
+def random_box(rng, corner_provider):
+    """回転・拡大・移動した箱の8頂点(ObjectCornerProvider でワールド座標にする)"""
+    Matrix = sys.modules["mathutils"].Matrix
+    size = rng.uniform(0.1, 5.0, 3)
+    bound_box = [(x, y, z) for x in (-size[0], size[0]) for y in (-size[1], size[1]) for z in (-size[2], size[2])]
+    matrix = (Matrix.Translation(rng.uniform(-10, 10, 3))
+              @ Matrix.Rotation(rng.uniform(0, math.tau), 4, 'Z')
+              @ Matrix.Rotation(rng.uniform(0, math.tau), 4, 'X')
+              @ Matrix.Diagonal((*rng.uniform(0.2, 3.0, 3), 1.0)))
+    obj = SimpleNamespace(type='MESH', bound_box=bound_box, matrix_world=matrix)
+    return np.asarray([tuple(v) for v in corner_provider.get_corners(obj)], dtype=np.float64)
+
+
+def random_cloud(rng):
+    """凸包の頂点の代わりの点群(すべての点が収まれば凸包の頂点も収まる)"""
+    points = rng.normal(size=(rng.integers(4, 400), 3)) * rng.uniform(0.1, 5.0, 3)
+    return points + rng.uniform(-10, 10, 3)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=100, help="箱と点群それぞれのケース数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    package = bpy_stub.load_package().__name__
+    framing = importlib.import_module(f"{package}.core.framing")
+    corner_provider = importlib.import_module(f"{package}.object.corner_provider").ObjectCornerProvider()
+    mathutils = sys.modules["mathutils"]
+
+    rng = np.random.default_rng(args.seed)
+    directions = framing.view_directions(SHOT_ANGLES)
+    failures = 0
+    worst_legacy = worst_fit = 0.0
+
+    for case in range(args.cases * 2):
+        corners = random_box(rng, corner_provider) if case % 2 == 0 else random_cloud(rng)
+        center = framing.aabb_center(corners)
+        resolution = (1920, 1080) if rng.random() < 0.5 else (1080, 1920)
+        sensor_width, sensor_height = framing.effective_sensor_size(36.0, *resolution)
+        focal_length = float(rng.uniform(28, 150))
+        margin_scale = float(rng.uniform(1.0, 1.5))
+        solver_args = (corners, center, directions, sensor_width, sensor_height, focal_length, margin_scale)
+
+        # 直交射影の見積もりは以前のループと一致する
+        ortho, _ = framing.solve_view_distances(*solver_args, perspective=False)
+        legacy = np.array([legacy_distance(corners, center, d, sensor_width, sensor_height, focal_length, margin_scale)
+                           for d in directions])
+        error = float(np.max(np.abs(ortho - legacy) / np.maximum(legacy, 1e-9)))
+        worst_legacy = max(worst_legacy, error)
+        if error > 1e-9:
+            failures += 1
+            print(f"case {case}: perspective=False differs from the legacy loop by {error:.3g}")
+
+        # 透視投影の距離では全頂点が収まり､いちばん外側の頂点が画面の端に来る
+        distances, _ = framing.solve_view_distances(*solver_args)
+        limit_x = sensor_width / (2 * focal_length) / margin_scale
+        limit_y = sensor_height / (2 * focal_length) / margin_scale
+        for (x_angle, z_angle), distance in zip(SHOT_ANGLES, distances):
+            extent_x, extent_y = frame_extent(corners, center, x_angle, z_angle, distance, mathutils)
+            fill = max(extent_x / limit_x, extent_y / limit_y)
+            worst_fit = max(worst_fit, abs(fill - 1.0))
+            if abs(fill - 1.0) > 1e-9:
+                failures += 1
+                print(f"case {case} x{x_angle:+03d} z{z_angle:03d}: frame fill {fill:.12f} (expected 1)")
+
+    print(f"{args.cases * 2} cases x {len(SHOT_ANGLES)} angles: "
+          f"legacy max rel. error {worst_legacy:.2e}, frame fill max error {worst_fit:.2e}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""撮影用カメラの準備と後片付けを繰り返し､データブロックが残らないことを確認する
+
+Blender の中で実行する｡
+
+    blender -b --factory-startup --python benchmarks/check_rig_leaks.py -- --runs 100
+
+撮影のたびに増えるデータブロックがあれば終了コード 1 で終わる｡
+"""
+import argparse
+import datetime
+import importlib
+import os
+import sys
+import time
+
+import bpy
+
+
+def load_addon():
+    addon_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parent_dir = os.path.dirname(addon_dir)
+    if parent_dir not in sys.path:
+        sys.path.insert(0, parent_dir)
+    return importlib.import_module(os.path.basename(addon_dir))
+
+
+def datablock_totals() -> dict:
+    return {
+        "objects": len(bpy.data.objects),
+        "cameras": len(bpy.data.cameras),
+        "collections": len(bpy.data.collections),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    package = load_addon().__name__
+    auto_camera = importlib.import_module(f"{package}.core.auto_camera")
+    CaptureSettings = importlib.import_module(f"{package}.properties.capture_settings").CaptureSettings
+    AutoCamera, CameraRig = auto_camera.AutoCamera, auto_camera.CameraRig
+
+    settings = CaptureSettings.from_dict({"directory": bpy.app.tempdir, "datetime": datetime.datetime.now()})
+    scene_camera = bpy.context.scene.camera
+
+    # 1回目でリグが作られるので､その後の数を基準にする
+    baseline = None
+    start = time.perf_counter()
+    for run in range(args.runs):
+        camera = AutoCamera(bpy.context.scene.cursor.location.copy(), 10.0, settings)
+        camera.create_camera_and_empty()
+        for x_angle, z_angle in settings.shot_angle_list:
+            camera.place_camera(x_angle, z_angle)
+        camera.release()
+        if baseline is None:
+            baseline = (datablock_totals(), CameraRig.datablock_count())
+    elapsed = time.perf_counter() - start
+
+    totals, rig_count = datablock_totals(), CameraRig.datablock_count()
+    print(f"{args.runs} runs in {elapsed:.2f}s, rig datablocks: {rig_count}, totals: {totals}")
+    leaked = totals != baseline[0] or rig_count != baseline[1]
+    if leaked:
+        print(f"LEAK: after first run {baseline}, after {args.runs} runs {(totals, rig_count)}")
+    if bpy.context.scene.camera != scene_camera:
+        print("scene camera was not restored")
+        leaked = True
+
+    CameraRig.purge()
+    if CameraRig.datablock_count() != 0:
+        print(f"purge left {CameraRig.datablock_count()} datablocks")
+        leaked = True
+
+    return 1 if leaked else 0
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    sys.exit(main(argv))
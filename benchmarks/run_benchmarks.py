@@ -0,0 +1,286 @@
+"""画角の計算・情報の書き込み・エンコードのベンチマークを実行して結果をJSONに書き出す
+
+Blender は不要で､bpy_stub を使って通常の Python で実行する｡
+合成したシーン(オブジェクト数)･撮影角度の密度･QUALITY_PRESETS ごとに計測する｡
+--blender を指定した場合は､ヘッドレスの Blender で撮影セッションを最後まで実行する時間も計測する｡
+
+    python benchmarks/run_benchmarks.py --font path/to/NotoSansJP-Regular.ttf --json results.json
+    python benchmarks/run_benchmarks.py --baseline results-0.1.3.json --json results.json
+    python benchmarks/run_benchmarks.py --blender /path/to/blender --json results.json
+
+--baseline を指定すると前回の結果と中央値を比較し､--tolerance を超えて遅くなった
+ケースがあれば終了コード 1 で終わる｡
+"""
+import argparse
+import datetime
+import importlib
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+import numpy as np
+
+import bpy_stub
+
+SESSION_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_session.py")
+
+# 合成シーンのオブジェクト数
+SCENE_SIZES = (10, 100, 1000)
+# 撮影角度の分割(度)｡仰角は ±(90 - 分割) の範囲
+ANGLE_STEPS = (30, 15, 5)
+
+
+def module(name: str):
+    return importlib.import_module(f"{bpy_stub.PACKAGE_NAME}.{name}")
+
+
+def measure(func, number: int, repeat: int) -> dict:
+    """func を number 回ずつ repeat 回実行し､1回あたりの時間(ms)を返す"""
+    func()  # ウォームアップ(フォントの読み込みなど初回だけの処理を除く)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number * 1000)
+    return {"min_ms": min(samples), "median_ms": statistics.median(samples), "number": number, "repeat": repeat}
+
+
+def make_settings(directory: str, **values):
+    CaptureSettings = module("properties.capture_settings").CaptureSettings
+    values.setdefault("datetime", datetime.datetime(2025, 1, 1, 12, 0, 0))
+    return CaptureSettings.from_dict({"directory": directory, **values})
+
+
+def make_scene(count: int, seed: int = 0) -> list:
+    """ランダムに配置・回転・拡大したメッシュ(バウンディングボックスは ±1 の立方体)"""
+    Matrix = sys.modules["mathutils"].Matrix
+    rng = np.random.default_rng(seed)
+    bound_box = [(x, y, z) for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)]
+
+    objects = []
+    for i in range(count):
+        angles = rng.uniform(0, 2 * np.pi, 3)
+        matrix = (Matrix.Translation(rng.uniform(-20, 20, 3))
+                  @ Matrix.Rotation(angles[2], 4, 'Z') @ Matrix.Rotation(angles[1], 4, 'Y')
+                  @ Matrix.Rotation(angles[0], 4, 'X') @ Matrix.Diagonal((*rng.uniform(0.2, 3, 3), 1)))
+        objects.append(types.SimpleNamespace(
+            name=f"Bench.{i:04d}", type='MESH', empty_display_type='PLAIN',
+            bound_box=bound_box, matrix_world=matrix))
+    return objects
+
+
+def angle_grid(step: int) -> list[list[int]]:
+    elevations = range(-90 + step, 90, step)
+    return [[x, z] for x in elevations for z in range(0, 360, step)]
+
+
+def bench_framing(directory: str, quick: bool) -> list[dict]:
+    OrbitSnapManager = module("core.capture_manager").OrbitSnapManager
+    results = []
+    for count in SCENE_SIZES:
+        objects = make_scene(count)
+        for step in ANGLE_STEPS:
+            # 2回目以降が画角のキャッシュから返らないように､キャッシュを使わずに計算を計測する
+            settings = make_settings(directory, shot_angle_list=angle_grid(step), framing_cache=False)
+            manager = OrbitSnapManager(None, objects, settings)
+            params = {"objects": count, "angles": len(settings.shot_angle_list)}
+            if step == ANGLE_STEPS[0]:
+                # 頂点の取得は撮影角度によらないので1回だけ計測する
+                timing = measure(lambda: manager.get_scene_corners(objects), *_runs(count, quick))
+                results.append({"name": "get_corners", "params": {"objects": count}, **timing})
+            timing = measure(lambda: manager.calc_capture_info(objects), *_runs(count, quick))
+            results.append({"name": "calc_capture_info", "params": params, **timing})
+
+            # キャッシュにある場合(形状と設定が前回と同じ撮影)
+            cached = make_settings(directory, shot_angle_list=settings.shot_angle_list, framing_cache=True,
+                                   persist_framing_cache=False)
+            timing = measure(lambda: manager.calc_capture_info(objects, cached), *_runs(count, quick))
+            results.append({"name": "calc_capture_info (cached)", "params": params, **timing})
+    return results
+
+
+def _runs(count: int, quick: bool) -> tuple[int, int]:
+    number = max(1, 1000 // count)
+    return (max(1, number // 10), 3) if quick else (number, 7)
+
+
+def bench_watermark(directory: str, quick: bool) -> list[dict]:
+    from PIL import Image
+
+    Watermark = module("core.watermark").Watermark
+    QUALITY_RESOLUTIONS = module("properties.capture_settings").QUALITY_RESOLUTIONS
+    number, repeat = (5, 3) if quick else (20, 7)
+
+    results = []
+    for quality in Watermark.QUALITY_PRESETS:
+        settings = make_settings(directory, quality=quality, w_datetime=True, w_filename=True,
+                                 w_focal_length=True, w_orbit_angle=True, w_elevation_angle=True,
+                                 w_note=True, note="progress check")
+        watermark = Watermark(settings)
+        base = Image.new("RGBA", QUALITY_RESOLUTIONS[quality], (80, 90, 100, 255))
+        filepath = os.path.join(directory, f"watermark_{quality}.png")
+        base.save(filepath, compress_level=1)
+
+        params = {"quality": quality, "size": list(base.size)}
+        timing = measure(lambda: watermark.compose(base.copy(), 90, 30), number, repeat)
+        results.append({"name": "Watermark.compose", "params": params, **timing})
+        # draw はファイルの読み込みと保存を含む(書き込みを重ねても大きさは変わらない)
+        timing = measure(lambda: watermark.draw(filepath, 90, 30), max(1, number // 4), repeat)
+        results.append({"name": "Watermark.draw", "params": params, **timing})
+    return results
+
+
+def bench_encoders(directory: str, quick: bool) -> list[dict]:
+    from PIL import Image
+
+    ImageEncoder = module("core.encoders").ImageEncoder
+    QUALITY_RESOLUTIONS = module("properties.capture_settings").QUALITY_RESOLUTIONS
+    number, repeat = (2, 3) if quick else (5, 5)
+
+    # ビューポートの撮影画像に近い､なだらかな階調とノイズの画像
+    width, height = QUALITY_RESOLUTIONS["high"]
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(40, 200, width, dtype=np.float64)[None, :, None]
+    pixels = np.clip(gradient + rng.normal(0, 6, (height, width, 3)), 0, 255).astype(np.uint8)
+    img = Image.fromarray(pixels, "RGB").convert("RGBA")
+
+    results = []
+    variants = [
+        {"image_format": "png", "png_compress_level": 1},
+        {"image_format": "png", "png_compress_level": 6},
+        {"image_format": "jpeg", "image_quality": 90},
+        {"image_format": "webp", "image_quality": 90},
+        {"image_format": "webp", "webp_lossless": True},
+    ]
+    for values in variants:
+        encoder = ImageEncoder(make_settings(directory, **values))
+        filepath = os.path.join(directory, f"encode{encoder.ext}")
+        timing = measure(lambda: encoder.save(img, filepath), number, repeat)
+        params = {"format": encoder.label, "size": [width, height], "bytes": os.path.getsize(filepath)}
+        results.append({"name": "ImageEncoder.save", "params": params, **timing})
+    return results
+
+
+def bench_session(blender: str, objects: int, directory: str) -> dict:
+    """ヘッドレスの Blender で撮影セッションを最後まで実行する"""
+    RESULT_PREFIX = module("batch.runner").RESULT_PREFIX
+    command = [blender, "-b", "--factory-startup", "--python-exit-code", "1",
+               "--python", SESSION_SCRIPT, "--", "--objects", str(objects), "--out", directory]
+    completed = subprocess.run(command, capture_output=True, text=True, encoding="utf-8", errors="replace")
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            result = json.loads(line[len(RESULT_PREFIX):])
+            seconds, shots = result["seconds"], max(1, result["shots"])
+            return {"name": "session", "params": result["params"], "min_ms": seconds * 1000,
+                    "median_ms": seconds * 1000, "per_shot_ms": seconds * 1000 / shots,
+                    "shots": result["shots"], "encode": result.get("encode", {})}
+    tail = (completed.stderr or completed.stdout).strip().splitlines()[-5:]
+    raise RuntimeError(f"Blender での計測に失敗しました(終了コード {completed.returncode}): " + " / ".join(tail))
+
+
+def environment() -> dict:
+    import PIL
+
+    manifest = os.path.join(bpy_stub.REPO_ROOT, "blender_manifest.toml")
+    with open(manifest, encoding="utf-8") as f:
+        match = re.search(r'^version\s*=\s*"([^"]+)"', f.read(), re.MULTILINE)
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=bpy_stub.REPO_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "version": match.group(1) if match else None,
+        "commit": commit,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pillow": PIL.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def case_key(result: dict) -> str:
+    return result["name"] + " " + json.dumps(result["params"], sort_keys=True)
+
+
+def compare(results: list[dict], baseline: dict, tolerance: float) -> list[str]:
+    """前回の結果と中央値を比較し､遅くなったケースの説明を返す"""
+    previous = {case_key(result): result for result in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        before = previous.get(case_key(result))
+        if before is None or before["median_ms"] <= 0:
+            continue
+        ratio = result["median_ms"] / before["median_ms"]
+        result["baseline_ratio"] = ratio
+        if ratio > 1 + tolerance:
+            regressions.append(f"{case_key(result)}: {before['median_ms']:.3f} -> {result['median_ms']:.3f} ms "
+                               f"({ratio:.2f}x)")
+    return regressions
+
+
+def print_table(results: list[dict]):
+    print(f"{'benchmark':<26} {'params':<48} {'min ms':>10} {'median ms':>10} {'vs base':>8}")
+    for result in results:
+        params = ", ".join(f"{k}={v}" for k, v in result["params"].items() if k != "bytes")
+        ratio = result.get("baseline_ratio")
+        ratio = f"{ratio:.2f}x" if ratio is not None else ""
+        print(f"{result['name']:<26} {params:<48.48} {result['min_ms']:>10.3f} {result['median_ms']:>10.3f} "
+              f"{ratio:>8}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--font", help="TrueTypeフォントのパス(省略時はアドオン同梱のフォント)")
+    parser.add_argument("--json", help="結果を書き出すJSONファイル")
+    parser.add_argument("--baseline", help="比較する前回の結果(JSON)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="遅くなったとみなす中央値の増加率")
+    parser.add_argument("--quick", action="store_true", help="繰り返し回数を減らして短時間で実行する")
+    parser.add_argument("--only", choices=("framing", "watermark", "encode"), action="append",
+                        help="実行するベンチマーク(複数指定可｡省略時はすべて)")
+    parser.add_argument("--blender", help="撮影セッション全体も計測する場合の Blender の実行ファイル")
+    parser.add_argument("--session-objects", type=int, default=20, help="撮影セッションの対象の数")
+    args = parser.parse_args()
+
+    bpy_stub.load_package()
+    if args.font:
+        module("core.watermark").get_font_path = lambda: os.path.abspath(args.font)
+
+    suites = {"framing": bench_framing, "watermark": bench_watermark, "encode": bench_encoders}
+    results = []
+    with tempfile.TemporaryDirectory(prefix="orbitsnap_bench_") as directory:
+        for name in args.only or suites:
+            results.extend(suites[name](directory, args.quick))
+        if args.blender:
+            results.append(bench_session(args.blender, args.session_objects, os.path.join(directory, "session")))
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "results": results}, f, ensure_ascii=False, indent=2)
+
+    if regressions:
+        print(f"\n{len(regressions)} 件のケースが {args.tolerance:.0%} 以上遅くなりました:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,10 +3,126 @@ import mathutils
 import math
 from ..properties.capture_settings import CaptureSettings
 
-class AutoCamera:
-    """カメラとターゲット用エンプティを作成し、移動させるクラス"""
+
+class CameraRig:
+    """撮影用のカメラとエンプティを使い回すためのクラス
+
+    カメラ・エンプティ・カメラデータは一度だけ作り､専用のコレクションに入れておく｡
+    撮影していない間はコレクションをビューレイヤーから除外して隠す｡
+    シーン全体を探さずに済むよう直接参照で持ち､アンドゥやファイルの読み込みで
+    参照が無効になった場合だけコレクション名から探し直す｡
+    """
 
     CUSTOM_KEY = "orbitSnapObject" #掃除用のカスタムプロパティ
+    COLLECTION_NAME = "OrbitSnapRig"
+    CAMERA_NAME = "OrbitSnapCamera"
+    CAMERA_DATA_NAME = "OrbitSnapCameraData"
+    EMPTY_NAME = "OrbitSnapEmpty"
+
+    _collection = None
+    _camera = None
+    _empty = None
+
+    @staticmethod
+    def _alive(id_block) -> bool:
+        if id_block is None:
+            return False
+        try:
+            id_block.name
+        except ReferenceError:
+            return False
+        return True
+
+    @classmethod
+    def acquire(cls, scene, view_layer):
+        """リグを用意してシーンで使える状態にする
+
+        Returns:
+            (camera_obj, empty_obj)
+        """
+        if not (cls._alive(cls._collection) and cls._alive(cls._camera) and cls._alive(cls._empty)):
+            cls._find_or_create()
+
+        # 別のシーンで撮影する場合もあるので､シーンごとにリンクする
+        if cls._collection.name not in scene.collection.children:
+            scene.collection.children.link(cls._collection)
+
+        layer_collection = view_layer.layer_collection.children.get(cls._collection.name)
+        if layer_collection is not None:
+            layer_collection.exclude = False
+        return cls._camera, cls._empty
+
+    @classmethod
+    def release(cls, view_layer):
+        """撮影後にリグを隠す(ビューレイヤーから除外する)"""
+        if not cls._alive(cls._collection):
+            return
+        layer_collection = view_layer.layer_collection.children.get(cls._collection.name)
+        if layer_collection is not None:
+            layer_collection.exclude = True
+
+    @classmethod
+    def purge(cls):
+        """リグをカメラデータも含めてすべて削除する(アドオンの登録解除時)
+
+        以前のバージョンが残したオブジェクトや､ユーザーのいないカメラデータも削除する｡
+        """
+        objects = [obj for obj in bpy.data.objects if obj.get(cls.CUSTOM_KEY)]
+        cameras = {obj.data for obj in objects if obj.type == 'CAMERA'}
+        for obj in objects:
+            bpy.data.objects.remove(obj, do_unlink=True)
+
+        cameras.update(cam for cam in bpy.data.cameras
+                       if cam.name.startswith(cls.CAMERA_DATA_NAME) and cam.users == 0)
+        for cam in cameras:
+            if cam.users == 0:
+                bpy.data.cameras.remove(cam)
+
+        collection = bpy.data.collections.get(cls.COLLECTION_NAME)
+        if collection is not None:
+            bpy.data.collections.remove(collection)
+
+        cls._collection = None
+        cls._camera = None
+        cls._empty = None
+
+    @classmethod
+    def datablock_count(cls) -> int:
+        """OrbitSnap が作ったデータブロックの数(撮影を繰り返しても増えないことの確認用)"""
+        prefix = "OrbitSnap"
+        return (sum(obj.name.startswith(prefix) for obj in bpy.data.objects)
+                + sum(cam.name.startswith(prefix) for cam in bpy.data.cameras)
+                + sum(col.name.startswith(prefix) for col in bpy.data.collections))
+
+    @classmethod
+    def _find_or_create(cls):
+        collection = bpy.data.collections.get(cls.COLLECTION_NAME)
+        if collection is None:
+            collection = bpy.data.collections.new(cls.COLLECTION_NAME)
+            collection.hide_select = True
+        cls._collection = collection
+
+        cls._camera = next((obj for obj in collection.objects
+                            if obj.type == 'CAMERA' and obj.get(cls.CUSTOM_KEY)), None)
+        if cls._camera is None:
+            cam_data = bpy.data.cameras.new(cls.CAMERA_DATA_NAME)
+            cls._camera = bpy.data.objects.new(cls.CAMERA_NAME, cam_data)
+            cls._camera[cls.CUSTOM_KEY] = True
+            collection.objects.link(cls._camera)
+
+        cls._empty = next((obj for obj in collection.objects
+                           if obj.type == 'EMPTY' and obj.get(cls.CUSTOM_KEY)), None)
+        if cls._empty is None:
+            cls._empty = bpy.data.objects.new(cls.EMPTY_NAME, None)
+            cls._empty[cls.CUSTOM_KEY] = True
+            cls._empty.hide_viewport = True
+            collection.objects.link(cls._empty)
+
+
+class AutoCamera:
+    """撮影用のカメラとターゲット用エンプティを配置し、移動させるクラス"""
+
+    CUSTOM_KEY = CameraRig.CUSTOM_KEY
 
     def __init__(self, center_point: mathutils.Vector, distance: float, settings: CaptureSettings):
         self.center_point = center_point
@@ -14,31 +130,54 @@ class AutoCamera:
         self.settings = settings
         self.camera_obj = None
         self.empty_obj = None
+        self.previous_camera = None # 撮影前のシーンのカメラ
+        self.previous_resolution = None # 撮影前のシーンの解像度
+        self.previous_image_settings = None # 撮影前のシーンの出力形式
 
     def create_camera_and_empty(self):
-        """カメラとエンプティを作成してシーンにリンクする"""
-        self.empty_obj = bpy.data.objects.new("OrbitSnapEmpty", None)
-        bpy.context.collection.objects.link(self.empty_obj)
+        """使い回しのカメラとエンプティを用意してシーンで使える状態にする"""
+        scene = bpy.context.scene
+        self.camera_obj, self.empty_obj = CameraRig.acquire(scene, bpy.context.view_layer)
         self.empty_obj.location = self.center_point
-        self.empty_obj[AutoCamera.CUSTOM_KEY] = True
-
-        cam_data = bpy.data.cameras.new("OrbitSnapCameraData")
-        self.camera_obj = bpy.data.objects.new("OrbitSnapCamera", cam_data)
-        bpy.context.collection.objects.link(self.camera_obj)
 
         # 焦点距離とセンサー幅を設定する
         self.camera_obj.data.lens = self.settings.focal_length
         self.camera_obj.data.sensor_width = self.settings.sensor_width
         self.camera_obj.data.type = 'PERSP'
 
-        bpy.context.scene.camera = self.camera_obj
-        self.camera_obj[AutoCamera.CUSTOM_KEY] = True
+        self.previous_camera = scene.camera
+        scene.camera = self.camera_obj
 
-        bpy.context.scene.render.resolution_x = self.settings.resolution_x
-        bpy.context.scene.render.resolution_y = self.settings.resolution_y
-        bpy.context.scene.render.resolution_percentage = 100
+        # ファイルに書き出して撮影する場合に使う解像度｡撮影後に元に戻す
+        render = scene.render
+        self.previous_resolution = (render.resolution_x, render.resolution_y, render.resolution_percentage)
+        render.resolution_x = self.settings.resolution_x
+        render.resolution_y = self.settings.resolution_y
+        render.resolution_percentage = 100
 
+        # 書き出したファイルはすぐに読み込むので､圧縮しないPNGにする
+        image_settings = render.image_settings
+        self.previous_image_settings = (image_settings.file_format, image_settings.color_mode, image_settings.compression)
+        image_settings.file_format = 'PNG'
+        image_settings.color_mode = 'RGBA'
+        image_settings.compression = 0
 
+    def release(self):
+        """シーンのカメラと解像度･出力形式を元に戻し､リグを隠す(削除はしない)"""
+        scene = bpy.context.scene
+        if self.camera_obj is not None and scene.camera == self.camera_obj:
+            scene.camera = self.previous_camera if CameraRig._alive(self.previous_camera) else None
+        if self.previous_resolution is not None:
+            render = scene.render
+            render.resolution_x, render.resolution_y, render.resolution_percentage = self.previous_resolution
+            self.previous_resolution = None
+        if self.previous_image_settings is not None:
+            image_settings = scene.render.image_settings
+            image_settings.file_format, image_settings.color_mode, image_settings.compression = self.previous_image_settings
+            self.previous_image_settings = None
+        CameraRig.release(bpy.context.view_layer)
+        self.camera_obj = None
+        self.empty_obj = None
 
     def place_camera(self, x_angle: float, z_angle: float):
         loc = self.calculate_camera_location(x_angle, z_angle)
@@ -52,10 +191,3 @@ class AutoCamera:
         rot_z = mathutils.Matrix.Rotation(math.radians(z_angle), 4, 'Z')
         offset = rot_z @ rot_x @ mathutils.Vector((0, -self.distance, 0))
         return self.center_point + offset
-
-    @staticmethod
-    def remove_camera_and_empty():
-        """カメラとエンプティをシーンから削除する"""
-        to_remove = [obj for obj in bpy.context.scene.objects if obj.get(AutoCamera.CUSTOM_KEY)]
-        for obj in to_remove:
-            bpy.data.objects.remove(obj, do_unlink=True)
@@ -1,177 +1,604 @@
 import bpy
 import mathutils
-import math
+import datetime
 import os
+import sqlite3
+import time
+import numpy as np
+from PIL import Image
+from dataclasses import asdict, dataclass, replace
+from typing import Optional
 from ..core.auto_camera import AutoCamera
+from ..core.frame_grabber import FrameGrabber
+from ..core.cycles_render import CyclesRenderer
+from ..core.shot_writer import Shot
+from ..core.image_store import ImageStore
+from ..core.contact_sheet import ContactSheet
+from ..core.turntable import Turntable
+from ..core.derivatives import derivative_names, reuse_derivatives
+from ..core.encoders import IMAGE_EXTENSIONS, EncodeStats
+from ..core.session_db import SessionIndex, ShotRecorder
+from ..core.similarity import SimilarityIndex
+from ..core.profiler import SessionProfiler
+from ..core.framing_cache import FramingCache, FramingResult, framing_key
+from ..core.incremental import ShotIndex, session_fingerprint, shot_fingerprint
+from ..core.view_planner import ViewPlan, plan_views
+from ..core.framing import as_point_array, aabb_center, view_directions, effective_sensor_size, solve_view_distances
 from ..object.corner_provider import get_corners
+from ..object.fingerprint import GEOMETRY_TYPES
 from ..utils.view_state_manager import ViewStateManager
 from ..properties.capture_settings import CaptureSettings
 
 import bpy
 
+@dataclass
+class CaptureTarget:
+    """1回の撮影でまとめて撮る対象の1つ分
+
+    Attributes:
+        name: 対象の名前(サブフォルダ名)｡選択全体を1つとして撮る場合は None
+        frame_objects: 画角の計算に使うオブジェクト
+        visible_objects: 撮影中に表示するジオメトリ｡None の場合は表示を切り替えない
+        settings: この対象の設定(視点計画をした場合は撮影角度リストが置き換わる)
+        center: 注視点
+        distance: カメラ距離
+        view_distances: 撮影角度ごとの必要距離
+        view_plan: 被覆率で撮影角度を決めた場合の結果
+        save_dir: 保存先フォルダ
+    """
+    name: Optional[str]
+    frame_objects: list
+    visible_objects: Optional[list]
+    settings: CaptureSettings
+    center: mathutils.Vector = None
+    distance: float = 0.0
+    view_distances: np.ndarray = None
+    view_plan: Optional[ViewPlan] = None
+    save_dir: str = None
+
+
 class OrbitSnapManager:
     def __init__(self, area, selected_objects, settings: CaptureSettings):
         self.area = area
         self.selected_objects   = selected_objects
         self.settings           = settings
         self.camera_controller  = None
-        self.save_dir           = None
+        self.session_dir        = None # capture_日時 フォルダ
+        self.save_dir           = None # 撮影中の対象の保存先
         self.blend_name         = None
         self.saved_views        = None # 撮影直前のビュー情報を保持
         self.visible_overlay    = None # 撮影直前のオーバーレイの表示状態を保持
-        self.shot_count = 0
-
-    def prepare(self):
+        self.shot_count = 0 # 全対象の撮影枚数
+        self.target_shot_count = 0 # 撮影中の対象の撮影枚数(ファイル名の番号)
+        self.view_distances = None # 撮影角度ごとの必要距離
+        self.framing_cache_hits = 0 # 画角の計算結果をキャッシュから使った対象の数
+        self.frame_grabber = None # 画素をメモリに読み込む場合に使用
+        # Cycles でレンダリングする場合に使用(レンダー設定の変更と復元､ショットごとの時間)
+        self.cycles = CyclesRenderer(settings) if settings.render_mode == 'cycles' else None
+        self.shot_index = None # 差分撮影時のショットの記録
+        self.session_fingerprint = None
+        self.previous_shots = {} # 過去のセッションの 指紋 -> 画像パス
+        self.reused_count = 0 # 前回の画像を再利用した枚数(全対象)
+        # 画像をハッシュで重複排除して保存する場合のストア
+        self.image_store = ImageStore(settings.directory) if settings.use_image_store else None
+        self.image_ext = IMAGE_EXTENSIONS[settings.image_format]
+        self.encode_stats = EncodeStats() # 保存形式ごとのバイト数とエンコード時間(書き込み側と共有する)
+        self.derivative_names = derivative_names(settings) # 縮小して一緒に書き出す画像のサブフォルダ
+        # 撮影したショットを保存フォルダの索引(SQLite)に記録する場合に使用
+        self.session_index = SessionIndex(settings.directory) if settings.session_index else None
+        self.session_id = None
+        self.shot_records = ShotRecorder() # 書き込み側と共有し､対象ごとに索引に書き込む
+        self.started = None # 撮影開始時刻(perf_counter)
+        # 区間ごとの時間とメモリの記録｡書き込み側と共有する(無効の場合は何もしない)
+        self.profiler = SessionProfiler(settings.profile, settings.profile_memory)
+        self.sinks = [] # 合成後の画像を受け取る追加の出力(一覧画像など)｡書き込み側と共有するので中身だけ入れ替える
+        self.targets = [] # 撮影対象
+        self.empty_regions = [] # 範囲内にオブジェクトがないので撮影しなかったエンプティの名前
+        self.target_index = None # 撮影中の対象の番号
+        self.hidden_objects = {} # 対象以外を隠したオブジェクト -> 元の表示状態
+
+    @property
+    def target(self) -> Optional[CaptureTarget]:
+        return None if self.target_index is None else self.targets[self.target_index]
+
+    @property
+    def view_plan(self) -> Optional[ViewPlan]:
+        """対象が1つの場合の視点計画の結果"""
+        return self.targets[0].view_plan if len(self.targets) == 1 else None
+
+    @property
+    def shot_plan(self) -> list[tuple[int, int, int]]:
+        """全対象の撮影順 [(対象の番号, 仰角, 水平角), ...]"""
+        return [(i, x_angle, z_angle)
+                for i, target in enumerate(self.targets)
+                for x_angle, z_angle in target.settings.shot_angle_list]
+
+    def prepare(self, framing: Optional[list[dict]] = None):
         """
         撮影準備
         ・撮影後､現在のビューに戻すために現在のビューを記録しておく
         ・スクリーンショット等に使用する日時､ファイル名の準備
-        ・カメラ位置の計算と設置
+        ・撮影対象ごとのカメラ位置の計算(すべて先に求める)
+        ・カメラの設置(全対象で1つのカメラを使い回す)
         ・オーバーレイを非表示にする
         ・カメラ視点にする
 
-        Returns:None
-
-        """
-        # 現在のビューの状態を記録｡処理終了後にこの視点に戻すため｡
-        self.saved_views = ViewStateManager.get_view_state(self.area)
-        self.visible_overlay = ViewStateManager.get_overlay_visibility(self.area)
-
-        # 撮影用にオーバーレイを非表示にする
-        ViewStateManager.set_overlay_visibility(self.area, False)
-
-        timestamp = self.settings.datetime.strftime("%Y%m%d_%H%M%S")
-        self.save_dir = os.path.join(self.settings.directory, f"capture_{timestamp}")
-        os.makedirs(self.save_dir, exist_ok=True)
+        オフスクリーン撮影の場合はビューの操作を行わず､開いている3Dビューの設定で直接描画する｡
+        area が None の場合(バックグラウンド起動など)もビューの操作を行わない｡
 
-        self.blend_name = bpy.path.basename(bpy.data.filepath).replace(".blend", "")
+        Args:
+            framing: 別のプロセスで計算した framing_plan() の結果｡指定した場合は画角を計算し直さない
+                (1つのセッションを複数の Blender で分担して撮影する場合)
 
-        center_point, distance = self.calc_capture_info(self.selected_objects)
+        Returns:None
 
-        self.camera_controller = AutoCamera(center_point, distance, self.settings)
-        self.camera_controller.create_camera_and_empty()
+        """
+        self.started = time.perf_counter()
+        self.profiler.start()
+
+        with self.profiler.span("prepare"):
+            # ビューを切り替えて撮影するか(Cycles の場合はビューを使わない)
+            use_view = self.area is not None and not self.settings.offscreen and self.cycles is None
+
+            if use_view:
+                # 現在のビューの状態を記録｡処理終了後にこの視点に戻すため｡
+                self.saved_views = ViewStateManager.get_view_state(self.area)
+                self.visible_overlay = ViewStateManager.get_overlay_visibility(self.area)
+
+                # 撮影用にオーバーレイを非表示にする
+                ViewStateManager.set_overlay_visibility(self.area, False)
+
+            timestamp = self.settings.datetime.strftime("%Y%m%d_%H%M%S")
+            self.session_dir = os.path.join(self.settings.directory, f"capture_{timestamp}")
+            self.save_dir = self.session_dir
+            os.makedirs(self.session_dir, exist_ok=True)
+
+            self.blend_name = bpy.path.basename(bpy.data.filepath).replace(".blend", "")
+
+            # 撮影対象ごとの撮影角度と画角を先にすべて計算する
+            if framing is None:
+                self.frame_targets()
+            else:
+                self.apply_framing(framing)
+
+            first = self.targets[0]
+            self.camera_controller = AutoCamera(first.center, first.distance, self.settings)
+            with self.profiler.span("create_camera"):
+                self.camera_controller.create_camera_and_empty()
+            if self.cycles is not None:
+                self.cycles.prepare(bpy.context.scene)
+
+            # 差分撮影: 前回から変わっていないショットは過去の画像を再利用する
+            if self.settings.incremental:
+                self.previous_shots = ShotIndex.load_previous(self.settings.directory, exclude=self.session_dir)
+
+            if use_view:
+                # スクリーンショット用に視点を変更
+                ViewStateManager.switch_to_camera_view(self.area)
+
+            # 画素をメモリに直接読み込む(GPUや3Dビューが使えない環境では従来通りファイルに書き出す)
+            use_grabber = self.cycles is None and FrameGrabber.is_available() and (use_view or self.settings.offscreen)
+            view = FrameGrabber.find_view3d(self.area) if use_grabber else None
+            if view is not None:
+                space, region = view
+                self.frame_grabber = FrameGrabber(
+                    space, region, self.settings.resolution_x, self.settings.resolution_y,
+                    hide_overlays=self.settings.offscreen)
+
+            self.begin_target(0)
+
+    def frame_targets(self):
+        """撮影対象のリストを作り､対象ごとの撮影角度とカメラ位置をすべて求める"""
+        self.targets = self.build_targets()
+        for target in self.targets:
+            with self.profiler.span("frame_target", target=target.name):
+                self.frame_target(target)
+
+    def framing_plan(self) -> list[dict]:
+        """frame_targets() の結果を JSON にできる形で返す(ほかのプロセスの apply_framing に渡す)"""
+        plan = []
+        for target in self.targets:
+            objects = dict.fromkeys(target.frame_objects + (target.visible_objects or []))
+            plan.append({
+                "name": target.name,
+                "center": [float(v) for v in target.center],
+                "distance": float(target.distance),
+                "shot_angle_list": [[int(x), int(z)] for x, z in target.settings.shot_angle_list],
+                "objects": [obj.name for obj in objects],
+            })
+        return plan
+
+    def apply_framing(self, framing: list[dict]):
+        """撮影対象のリストを作り､framing_plan() で求めた撮影角度とカメラ位置を使う"""
+        self.targets = self.build_targets()
+        if [target.name for target in self.targets] != [entry["name"] for entry in framing]:
+            raise ValueError("撮影対象が画角の計算時と一致しません")
+        for target, entry in zip(self.targets, framing):
+            target.center = mathutils.Vector(entry["center"])
+            target.distance = entry["distance"]
+            target.settings = replace(target.settings, shot_angle_list=[list(angles) for angles in entry["shot_angle_list"]])
+
+    def build_targets(self) -> list[CaptureTarget]:
+        """capture_targets の設定から撮影対象のリストを作る
+
+        ・'selection': 選択全体を1つの対象として撮る(従来通り)
+        ・'objects': 選択したオブジェクトを1つずつ､ほかのジオメトリを隠して撮る
+        ・'regions': 選択したエンプティ(Cube)ごとに､範囲内のジオメトリだけを表示して撮る
+        """
+        mode = self.settings.capture_targets
+        if mode == 'selection':
+            return [CaptureTarget(None, list(self.selected_objects), None, self.settings)]
+
+        targets = []
+        if mode == 'objects':
+            for obj in self.selected_objects:
+                if obj.type not in GEOMETRY_TYPES:
+                    continue
+                targets.append(CaptureTarget(obj.name, [obj], [obj], self.settings))
+            if not targets:
+                raise ValueError("オブジェクトごとに撮影するにはジオメトリを持つオブジェクトを選択してください")
+
+        elif mode == 'regions':
+            regions = [obj for obj in self.selected_objects if obj.type == 'EMPTY' and obj.empty_display_type == 'CUBE']
+            if not regions:
+                raise ValueError("範囲ごとに撮影するにはエンプティ(Cube)を選択してください")
+            geometry = [obj for obj in bpy.context.scene.objects if obj.type in GEOMETRY_TYPES and obj.visible_get()]
+            self.empty_regions = []
+            for region in regions:
+                contents = self.objects_in_region(region, geometry)
+                if not contents:
+                    self.empty_regions.append(region.name)
+                    continue
+                targets.append(CaptureTarget(region.name, [region], contents, self.settings))
+            if not targets:
+                raise ValueError("選択したエンプティ(Cube)の範囲内にオブジェクトがありません")
 
-        # スクリーンショット用に視点を変更
-        ViewStateManager.switch_to_camera_view(self.area)
+        else:
+            raise ValueError(f"不明な撮影対象の指定です: {mode}")
+
+        # 同じ名前のサブフォルダにならないようにする
+        names = set()
+        for target in targets:
+            name = bpy.path.clean_name(target.name)
+            while name in names:
+                name += "_"
+            names.add(name)
+            target.name = name
+        return targets
+
+    @staticmethod
+    def objects_in_region(region, objects) -> list:
+        """バウンディングボックスの中心がエンプティ(Cube)の範囲内にあるオブジェクト"""
+        corners = as_point_array(get_corners(region))
+        low, high = corners.min(axis=0), corners.max(axis=0)
+        contents = []
+        for obj in objects:
+            centre = as_point_array(get_corners(obj)).mean(axis=0)
+            if np.all(centre >= low) and np.all(centre <= high):
+                contents.append(obj)
+        return contents
+
+    def frame_target(self, target: CaptureTarget):
+        """対象の撮影角度(視点計画)とカメラ位置を求める"""
+        # 被覆率で撮影角度を決める場合は､グリッドの撮影角度リストを計画した角度に置き換える
+        if self.settings.view_planning == 'coverage':
+            plan_objects = target.visible_objects if target.visible_objects is not None else target.frame_objects
+            target.view_plan = self.plan_views(plan_objects, target.frame_objects)
+            target.settings = replace(target.settings, shot_angle_list=target.view_plan.shot_angle_list)
+
+        target.center, target.distance = self.calc_capture_info(target.frame_objects, target.settings)
+        target.view_distances = self.view_distances
+
+    def begin_target(self, index: int):
+        """撮影する対象を切り替える
+
+        前の対象の記録や一覧画像などを書き出して閉じ､カメラ・表示・保存先を次の対象に合わせる｡
+        書き込み中のショットがないこと(パイプラインを空にしたこと)が前提｡
+        """
+        self.finish_target()
+
+        self.target_index = index
+        target = self.targets[index]
+        settings = target.settings
+
+        target.save_dir = self.session_dir if target.name is None else os.path.join(self.session_dir, target.name)
+        os.makedirs(target.save_dir, exist_ok=True)
+        self.save_dir = target.save_dir
+        self.target_shot_count = 0
+        self.view_distances = target.view_distances
+
+        self.camera_controller.center_point = target.center
+        self.camera_controller.distance = target.distance
+        self.camera_controller.empty_obj.location = target.center
+
+        if target.visible_objects is not None:
+            self.isolate(target.visible_objects)
+
+        if self.settings.incremental:
+            self.shot_index = ShotIndex(target.save_dir)
+            objects = list(dict.fromkeys(target.frame_objects + (target.visible_objects or [])))
+            self.session_fingerprint = session_fingerprint(objects, settings, self.view_shading())
+
+        sinks = []
+        # 仰角 × 水平角 の一覧画像を撮影しながら書き出す
+        if settings.contact_sheet:
+            sinks.append(ContactSheet(target.save_dir, settings, settings.contact_sheet_cell_width))
+
+        # 仰角ごとの1周分をアニメーションとして撮影しながら書き出す
+        if settings.turntable_format != 'none':
+            sinks.append(Turntable(target.save_dir, self.blend_name, settings))
+        if settings.similarity_index:
+            sinks.append(SimilarityIndex(target.save_dir))
+        self.sinks[:] = sinks
+
+    def view_shading(self):
+        """撮影の描画に使う3Dビューのシェーディングの設定｡Cycles でレンダリングする場合は None"""
+        if self.cycles is not None:
+            return None
+        if self.frame_grabber is not None:
+            return self.frame_grabber.space.shading
+        if self.area is not None:
+            return self.area.spaces.active.shading
+        # バックグラウンドでは描画に使うシーンの設定(Workbench など)
+        return bpy.context.scene.display.shading
+
+    def finish_target(self):
+        """撮影中の対象の記録と追加の出力を書き出して閉じる"""
+        if self.target is None:
+            return
+
+        with self.profiler.span("finish_target"):
+            # 一覧画像などを閉じる(中止した場合は撮影済みの分だけ書き出す)
+            for sink in self.sinks:
+                try:
+                    sink.close()
+                except OSError as e:
+                    print(f"追加の出力を保存できませんでした: {e}")
+            self.sinks[:] = []
+
+            if self.shot_index is not None:
+                self.reused_count += self.shot_index.reused_count
+                try:
+                    self.shot_index.save()
+                except OSError as e:
+                    print(f"ショットの記録を保存できませんでした: {e}")
+                self.shot_index = None
+
+            if self.image_store is not None:
+                try:
+                    self.image_store.save_manifest(self.target.save_dir)
+                    # 派生画像はサブフォルダごとに記録する
+                    for name in self.derivative_names:
+                        self.image_store.save_manifest(os.path.join(self.target.save_dir, name))
+                except OSError as e:
+                    print(f"ストアのマニフェストを保存できませんでした: {e}")
+
+            if self.session_index is not None:
+                try:
+                    self.record_target()
+                except (sqlite3.Error, OSError, RuntimeError) as e:
+                    print(f"セッションの索引に記録できませんでした: {e}")
+
+        self.target_index = None
+
+    def write_profile(self):
+        """区間ごとの集計を表示し､Chrome trace をセッションフォルダに書き出す"""
+        self.profiler.stop()
+        print(f"計測: {self.profiler.summary()}")
+        if self.session_dir is None:
+            return
+        try:
+            path = self.profiler.write_trace(self.session_dir)
+            print(f"トレースを書き出しました: {path}")
+        except OSError as e:
+            print(f"トレースを書き出せませんでした: {e}")
+
+    def record_target(self):
+        """撮影中の対象のショットを保存フォルダの索引に書き込む"""
+        rows = self.shot_records.take()
+        if self.session_id is None:
+            self.session_id = self.session_index.begin_session(
+                self.session_dir, bpy.data.filepath, self.settings.datetime,
+                focal_length=self.settings.focal_length, image_format=self.settings.image_format,
+                settings=asdict(self.settings))
+        target = self.target
+        objects = dict.fromkeys(target.frame_objects + (target.visible_objects or []))
+        self.session_index.add_target(self.session_id, target.name, [obj.name for obj in objects], rows)
+
+    def isolate(self, visible_objects):
+        """対象以外のジオメトリを隠す(ライトやカメラはそのまま)｡元の表示状態は cleanup で戻す"""
+        visible = set(visible_objects)
+        for obj in bpy.context.view_layer.objects:
+            if obj.type not in GEOMETRY_TYPES:
+                continue
+            if obj not in self.hidden_objects:
+                self.hidden_objects[obj] = obj.hide_get()
+            obj.hide_set(obj not in visible)
+
+    def restore_visibility(self):
+        for obj, hidden in self.hidden_objects.items():
+            try:
+                obj.hide_set(hidden)
+            except (ReferenceError, RuntimeError):
+                pass
+        self.hidden_objects = {}
+
+    def capture(self, x_angle: float, z_angle: float, number: Optional[int] = None) -> Shot:
+        """指定された角度で1枚の画像を撮影
 
-    def capture(self, x_angle: float, z_angle: float):
-        """指定された角度で1枚の画像を撮影"""
-        self.camera_controller.place_camera(x_angle, z_angle)
+        Args:
+            number: ファイル名の番号｡省略時は対象内の撮影順(分担して撮影する場合はセッション全体での番号を渡す)
 
-        filename = f"{self.blend_name}_shot_{self.shot_count:03d}_x{x_angle:+03d}_z{z_angle:03d}.png"
+        Returns:
+            Shot: 撮影結果｡画素をメモリに読み込めた場合は pixels に入っている
+        """
+        if number is None:
+            number = self.target_shot_count
+        filename = f"{self.blend_name}_shot_{number:03d}_x{x_angle:+03d}_z{z_angle:03d}{self.image_ext}"
         filepath = os.path.join(self.save_dir, filename)
+        shot = Shot(index=number, x_angle=x_angle, z_angle=z_angle, filepath=filepath)
+
+        if self.shot_index is not None:
+            fingerprint = shot_fingerprint(
+                self.session_fingerprint, self.camera_controller.center_point,
+                self.camera_controller.distance, x_angle, z_angle)
+            source = self.previous_shots.get(fingerprint)
+            if source and os.path.isfile(source):
+                with self.profiler.span("reuse"):
+                    # 1枚ずつの画像を保存しない場合はリンクを作らずに元の画像を読む
+                    linked = self.settings.save_stills and ShotIndex.reuse(source, filepath)
+                    shot.reused = True
+                    shot.source = source
+                    if self.derivative_names:
+                        for name, path in reuse_derivatives(source, filepath, self.derivative_names):
+                            with Image.open(path) as img:
+                                self.shot_records.add(shot, path, img.size, variant=name)
+                if not linked:
+                    shot.filepath = source
+                self.shot_index.add(shot, fingerprint, "reused", source=source, linked=linked)
+                self.shot_count += 1
+                self.target_shot_count += 1
+                return shot
+            self.shot_index.add(shot, fingerprint, "rendered")
+
+        start = time.perf_counter()
+        with self.profiler.span("place_camera"):
+            self.camera_controller.place_camera(x_angle, z_angle)
+
+        if self.frame_grabber is not None:
+            with self.profiler.span("grab"):
+                shot.pixels = self.frame_grabber.grab(self.camera_controller.camera_obj)
+        else:
+            # 中間ファイルは非圧縮のPNGで書き出し､保存形式へのエンコードは書き込み側で1回だけ行う
+            shot.render_path = os.path.splitext(filepath)[0] + "_render.png"
+            if self.cycles is not None:
+                with self.profiler.span("render.cycles"):
+                    self.cycles.render(shot.render_path)
+            else:
+                bpy.context.scene.render.filepath = shot.render_path
+                with self.profiler.span("render.opengl"):
+                    bpy.ops.render.opengl(write_still=True) # 注:撮影はパネルを操作した画面で実行される
+        shot.render_seconds = time.perf_counter() - start
+        if self.cycles is not None:
+            self.cycles.budget.add(number, x_angle, z_angle, shot.render_seconds)
 
-        bpy.context.scene.render.filepath = filepath
-
-        bpy.ops.render.opengl(write_still=True) # 注:撮影はパネルを操作した画面で実行される
         self.shot_count += 1 # ショット数をインクリメント
-        return filepath # 撮影したファイルパスを返す
+        self.target_shot_count += 1
+        return shot
 
-    def get_scene_corners(self, objects):
+    def get_scene_corners(self, objects, geometry: Optional[dict] = None):
+        """画角の計算に使う頂点
+
+        Args:
+            geometry: framing_key で読み込んだ オブジェクト名 -> ジオメトリ｡読み込み済みのメッシュは読み直さない
+        """
         empties = [obj for obj in objects if obj.type == 'EMPTY' and obj.empty_display_type == 'CUBE']
         normals = [obj for obj in objects if not (obj.type == 'EMPTY' and obj.empty_display_type == 'CUBE')]
         if empties:
             # emptycubeの最初の一つを使う
-            return get_corners(empties[0])
+            return as_point_array(get_corners(empties[0]))
         else:
-            all_corners = []
-            for obj in normals:
-                all_corners.extend(get_corners(obj))
-            return all_corners
+            framing_mode = self.settings.framing_mode
+            return np.vstack([as_point_array(get_corners(obj, framing_mode, geometry.get(obj.name_full) if geometry else None))
+                              for obj in normals])
 
-    def aabb_center_and_size(self, points):
-        """指定されたポイントの中心を返す
+    def calc_capture_info(self, objects, settings: CaptureSettings = None):
+        """選択されたオブジェクトが画角に収まる距離を計算する
 
-        Args:
-            points (_type_): _description_
-
-        Returns:
-            _type_: _description_
+        全撮影角度の射影をまとめて行い､透視投影で全頂点が収まる距離を求める｡
+        視点ごとの距離は self.view_distances に保持する｡
+        形状・ワールド行列・画角に関係する設定が前回と同じ場合はキャッシュした結果を使う｡
         """
-        xs = [p.x for p in points]
-        ys = [p.y for p in points]
-        zs = [p.z for p in points]
-        minx, maxx = min(xs), max(xs)
-        miny, maxy = min(ys), max(ys)
-        minz, maxz = min(zs), max(zs)
-
-        # 各座標の最大値と最小値を使って中心を計算
-        center = mathutils.Vector((
-            (minx + maxx) * 0.5,
-            (miny + maxy) * 0.5,
-            (minz + maxz) * 0.5,
-        ))
-        return center
-
-    def calc_capture_info(self, objects):
-        """選択されたオブジェクトが画角に収まる距離を計算する"""
+        settings = settings or self.settings
 
         if not objects:
             raise ValueError("オブジェクトリストが空です")
 
-        sensor_width = self.settings.sensor_width
-        sensor_height = self.settings.sensor_height
-        focal_length = self.settings.focal_length
-        margin_scale = self.settings.margin_scale
-        corners = self.get_scene_corners(objects)
-
-        # バウンディングボックス8点
-        center = self.aabb_center_and_size(corners)
-
-        max_distance = 0
-        for angle in self.settings.shot_angle_list:
-            x_angle = math.radians(angle[0])  # 水平（azimuth, yaw）
-            z_angle = math.radians(angle[1])  # 仰角（elevation, pitch）
-
-            # カメラ向き
-            dir_x = math.cos(z_angle) * math.cos(x_angle)
-            dir_y = math.cos(z_angle) * math.sin(x_angle)
-            dir_z = math.sin(z_angle)
-            direction = mathutils.Vector((dir_x, dir_y, dir_z)).normalized()
-            up = mathutils.Vector((0, 0, 1))
-            cam_pos = center + direction * 10
-            width, height = self.get_bbox_size_in_camera_view(cam_pos, direction, up, corners)
-            distance = self.calculate_required_distance(width, height, sensor_width, sensor_height, focal_length, margin_scale)
-            max_distance = max(max_distance, distance)
-
-        return center, max_distance
-
-
-    def get_bbox_size_in_camera_view(self, cam_pos, cam_dir, cam_up, corners):
-        # カメラ平面ベクトル
-        forward = cam_dir.normalized()
-        right = cam_up.cross(forward).normalized()
-        up = forward.cross(right).normalized()
-
-        # 各頂点を「カメラのスクリーン平面（right, up）」で直交射影
-        screen_coords = []
-        for corner in corners:
-            v = corner - cam_pos
-            x = v.dot(right)
-            y = v.dot(up)
-            screen_coords.append([x, y])
-
-        xs = [pt[0] for pt in screen_coords]
-        ys = [pt[1] for pt in screen_coords]
-        width = max(xs) - min(xs)
-        height = max(ys) - min(ys)
-        return width, height
-
-    def calculate_required_distance(self, width, height, sensor_width, sensor_height, focal_length, margin_scale):
-        fov_x = 2 * math.atan(sensor_width / (2 * focal_length))
-        fov_y = 2 * math.atan(sensor_height / (2 * focal_length))
-        dist_x = (width / 2) / math.tan(fov_x / 2)
-        dist_y = (height / 2) / math.tan(fov_y / 2)
-        return max(dist_x, dist_y) * margin_scale
+        key = None
+        geometry = {} # framing_key で読み込んだ評価後のジオメトリ(get_corners で読み直さない)
+        if settings.framing_cache:
+            scene = bpy.context.scene if settings.persist_framing_cache else None
+            with self.profiler.span("framing_key", objects=len(objects)):
+                key = framing_key(objects, settings, geometry)
+            cached = FramingCache.get(key, scene)
+            if cached is not None:
+                self.framing_cache_hits += 1
+                self.view_distances = cached.view_distances
+                return mathutils.Vector(cached.center), cached.distance
+
+        with self.profiler.span("get_corners", objects=len(objects)):
+            corners = self.get_scene_corners(objects, geometry)
+        center = aabb_center(corners)
+
+        sensor_width, sensor_height = effective_sensor_size(
+            settings.sensor_width, settings.resolution_x, settings.resolution_y)
+        directions = view_directions(settings.shot_angle_list)
+
+        with self.profiler.span("solve_view_distances", angles=len(directions)):
+            self.view_distances, max_distance = solve_view_distances(
+                corners, center, directions,
+                sensor_width, sensor_height,
+                settings.focal_length, settings.margin_scale,
+            )
+
+        if key is not None:
+            FramingCache.put(key, FramingResult(tuple(map(float, center)), max_distance, self.view_distances), scene)
+        return mathutils.Vector(center), max_distance
+
+    def plan_views(self, objects, frame_objects=None):
+        """候補視点から被覆率が目標に達する撮影角度を選ぶ
 
-    def cleanup(self):
-        # オーバーレイを元に戻す
-        if self.visible_overlay:
-            ViewStateManager.set_overlay_visibility(self.area, self.visible_overlay)
+        Args:
+            objects: 見えるかどうかを調べるオブジェクト
+            frame_objects: 画角の計算に使うオブジェクト｡省略時は objects
+        """
+        frame_objects = frame_objects or objects
+        if not objects or not frame_objects:
+            raise ValueError("オブジェクトリストが空です")
 
-        # 撮影直前のビューに戻す
-        if self.saved_views:
-            ViewStateManager.set_view_state(self.area, self.saved_views)
+        corners = self.get_scene_corners(frame_objects)
+        plan = plan_views(objects, corners, aabb_center(corners), self.settings)
+        print(f"視点計画: {plan.summary()}")
+        return plan
 
-        # 撮影用の要素をすべて削除する
-        AutoCamera.remove_camera_and_empty()
+    def cleanup(self):
+        with self.profiler.span("cleanup"):
+            # 撮影中の対象の記録や一覧画像などを書き出す(中止した場合は撮影済みの分だけ)
+            self.finish_target()
+            self.sinks[:] = []
+
+            if self.session_index is not None:
+                try:
+                    if self.session_id is not None:
+                        self.session_index.finish_session(
+                            self.session_id, datetime.datetime.now(), self.shot_count, time.perf_counter() - self.started)
+                except sqlite3.Error as e:
+                    print(f"セッションの索引に記録できませんでした: {e}")
+                self.session_index.close()
+
+            # 対象ごとに隠したオブジェクトを元に戻す
+            self.restore_visibility()
+
+            if self.frame_grabber:
+                self.frame_grabber.free()
+                self.frame_grabber = None
+
+            # オーバーレイを元に戻す
+            if self.visible_overlay:
+                ViewStateManager.set_overlay_visibility(self.area, self.visible_overlay)
+
+            # 撮影直前のビューに戻す
+            if self.saved_views:
+                ViewStateManager.set_view_state(self.area, self.saved_views)
+
+            # Cycles のレンダー設定を元に戻す
+            if self.cycles is not None:
+                self.cycles.restore()
+
+            # 撮影用のカメラを隠す(次の撮影で使い回す)
+            if self.camera_controller:
+                self.camera_controller.release()
+                self.camera_controller = None
+
+        if self.profiler:
+            self.write_profile()
@@ -0,0 +1,92 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from ..core.shot_writer import Shot
+
+
+class CapturePipelineError(Exception):
+    """バックグラウンドでの保存処理で発生したエラーをまとめた例外"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"{len(errors)}枚の保存に失敗しました: {errors[0]}")
+
+
+class CapturePipeline:
+    """撮影(メインスレッド)と書き込み・保存(ワーカースレッド)を並行して行うクラス
+
+    キューに積めるショット数に上限を設け､保存が追いつかない場合は submit で待つ｡
+    drain で積んだ処理を待った後も続けて submit でき(撮影対象の切り替えなど)､最後に close でワーカーを終了する｡
+    Pillow はエンコード中に GIL を解放するので､スレッドでも並列に処理できる｡
+    """
+
+    def __init__(self, writer_factory, max_workers: int = None, max_pending: int = None):
+        """
+        Args:
+            writer_factory: ShotWriter を生成する関数｡フォントを共有しないようにワーカーごとに生成する
+            max_workers: ワーカースレッド数
+            max_pending: 処理待ちにできるショット数の上限
+        """
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_pending = max_pending or self.max_workers * 2
+
+        self._writer_factory = writer_factory
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="OrbitSnapWriter")
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._errors = []
+        self._pending = set() # 処理が終わっていない Future
+
+    def submit(self, shot: Shot):
+        """ショットの保存をキューに積む｡キューが一杯なら空くまで待つ"""
+        self.raise_if_failed()
+
+        # 撮影用のバッファは次の撮影で上書きされるのでコピーしてから渡す
+        if shot.pixels is not None:
+            shot.pixels = shot.pixels.copy()
+
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._write, shot)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._on_done)
+
+    def drain(self):
+        """キューに積んだ処理がすべて終わるまで待つ｡ワーカーは終了しないので､続けて submit できる"""
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending)
+
+    def close(self):
+        """キューに積んだ処理がすべて終わるまで待ち､ワーカーを終了する"""
+        self._executor.shutdown(wait=True)
+
+    def raise_if_failed(self):
+        """ワーカーでエラーが起きていれば CapturePipelineError を送出する"""
+        with self._lock:
+            errors = list(self._errors)
+        if errors:
+            raise CapturePipelineError(errors)
+
+    def _write(self, shot: Shot):
+        # エラーは Future が完了する前に記録する(完了時のコールバックは drain が戻った後に呼ばれることがある)
+        try:
+            writer = getattr(self._local, "writer", None)
+            if writer is None:
+                writer = self._local.writer = self._writer_factory()
+            return writer.write(shot)
+        except Exception as e:
+            with self._lock:
+                self._errors.append(e)
+            raise
+
+    def _on_done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+        self._slots.release()
@@ -0,0 +1,45 @@
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class CaptureProgress:
+    """実行中の撮影の進捗(パネル表示用)
+
+    Attributes:
+        running: 撮影中か
+        total: 撮影する枚数
+        done: 撮影済みの枚数
+        started_at: 撮影開始時刻(time.perf_counter)
+    """
+    running: bool = False
+    total: int = 0
+    done: int = 0
+    started_at: float = 0.0
+
+    def start(self, total: int):
+        self.running = True
+        self.total = total
+        self.done = 0
+        self.started_at = time.perf_counter()
+
+    def advance(self, count: int = 1):
+        self.done = min(self.total, self.done + count)
+
+    def finish(self):
+        self.running = False
+
+    @property
+    def factor(self) -> float:
+        return self.done / self.total if self.total else 0.0
+
+    def remaining_seconds(self):
+        """これまでの撮影ペースから残り時間(秒)を見積もる｡まだ見積もれない場合は None"""
+        if not self.done:
+            return None
+        elapsed = time.perf_counter() - self.started_at
+        return elapsed / self.done * (self.total - self.done)
+
+
+# モーダル撮影の進捗｡同時に実行できる撮影は1つだけ
+progress = CaptureProgress()
@@ -0,0 +1,171 @@
+import json
+import os
+import struct
+import threading
+import zlib
+
+import numpy as np
+from PIL import Image
+
+from ..core.shot_writer import Shot
+from ..properties.capture_settings import CaptureSettings
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def filter_scanlines(rows: np.ndarray) -> bytes:
+    """(行数, 幅, 4) の uint8 配列を PNG の走査線データにする
+
+    Sub フィルタ(左隣の画素との差分)をかけて圧縮率を上げる｡
+    """
+    flat = np.ascontiguousarray(rows, dtype=np.uint8).reshape(len(rows), -1)
+    filtered = np.empty((len(rows), flat.shape[1] + 1), dtype=np.uint8)
+    filtered[:, 0] = 1
+    filtered[:, 1:5] = flat[:, :4]
+    np.subtract(flat[:, 4:], flat[:, :-4], out=filtered[:, 5:])
+    return filtered.tobytes()
+
+
+def write_png_chunk(f, kind: bytes, data: bytes):
+    f.write(struct.pack(">I", len(data)))
+    f.write(kind)
+    f.write(data)
+    f.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind)) & 0xFFFFFFFF))
+
+
+class StreamingPNGWriter:
+    """行ごとに書き足していくPNGライター(RGBA 8bit)
+
+    Pillow は画像全体をメモリに持たないと保存できないため､IDAT を少しずつ圧縮して書き出す｡
+    """
+
+    def __init__(self, filepath: str, width: int, height: int, compress_level: int = 6):
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compress_level)
+        self._file = open(filepath, "wb")
+        self._file.write(PNG_SIGNATURE)
+        self._write_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+
+    def write_rows(self, rows: np.ndarray):
+        """(行数, 幅, 4) の uint8 配列を書き足す"""
+        rows = rows[:self.height - self.rows_written]
+        if len(rows) == 0:
+            return
+        data = self._compressor.compress(filter_scanlines(rows))
+        if data:
+            self._write_chunk(b"IDAT", data)
+        self.rows_written += len(rows)
+
+    def close(self):
+        """足りない行を透明で埋めて閉じる"""
+        if self._file is None:
+            return
+        blank = np.zeros((min(256, self.height), self.width, 4), dtype=np.uint8)
+        while self.rows_written < self.height:
+            self.write_rows(blank)
+        self._write_chunk(b"IDAT", self._compressor.flush())
+        self._write_chunk(b"IEND", b"")
+        self._file.close()
+        self._file = None
+
+    def _write_chunk(self, kind: bytes, data: bytes):
+        write_png_chunk(self._file, kind, data)
+
+
+class ContactSheet:
+    """仰角 × 水平角 の一覧画像を撮影しながら組み立てるクラス
+
+    仰角ごとに1行とし､1行分のショットがそろった時点でその行を書き出すので､
+    メモリに持つのは書き出し待ちの行だけになる｡
+    各ショットの位置は JSON の索引に書き出す｡
+    """
+
+    IMAGE_FILENAME = "contact_sheet.png"
+    INDEX_FILENAME = "contact_sheet.json"
+
+    def __init__(self, save_dir: str, settings: CaptureSettings, cell_width: int):
+        self.save_dir = save_dir
+        self.cell_width = cell_width
+        self.cell_height = max(1, round(cell_width * settings.resolution_y / settings.resolution_x))
+
+        # 仰角ごとの行と､行内の列を撮影角度リストの順に決める
+        self.rows = {}
+        self.cells = {}
+        for x_angle, z_angle in settings.shot_angle_list:
+            row = self.rows.setdefault(x_angle, len(self.rows))
+            column = sum(1 for key in self.cells if key[0] == x_angle)
+            self.cells[(x_angle, z_angle)] = (row, column)
+        self.row_sizes = [0] * len(self.rows)
+        for row, _ in self.cells.values():
+            self.row_sizes[row] += 1
+        self.columns = max(self.row_sizes, default=0)
+
+        self.width = self.columns * self.cell_width
+        self.height = len(self.rows) * self.cell_height
+
+        self._lock = threading.Lock()
+        self._pending = {} # 行番号 -> (行の画素, 埋まったセル数)
+        self._next_row = 0
+        self._entries = []
+        self._writer = StreamingPNGWriter(os.path.join(save_dir, self.IMAGE_FILENAME), self.width, self.height)
+
+    def add(self, shot: Shot, img: Image.Image):
+        cell = self.cells.get((shot.x_angle, shot.z_angle))
+        if cell is None:
+            return
+        row, column = cell
+        thumb = np.asarray(img.convert("RGBA").resize((self.cell_width, self.cell_height), Image.Resampling.BILINEAR, reducing_gap=2.0))
+
+        with self._lock:
+            if row < self._next_row:
+                return
+            pixels, filled = self._pending.get(row) or (np.zeros((self.cell_height, self.width, 4), dtype=np.uint8), 0)
+            left = column * self.cell_width
+            pixels[:, left:left + self.cell_width] = thumb
+            self._pending[row] = (pixels, filled + 1)
+            self._entries.append({
+                "elevation": shot.x_angle,
+                "orbit": shot.z_angle,
+                "file": os.path.basename(shot.filepath),
+                "rect": [left, row * self.cell_height, self.cell_width, self.cell_height],
+            })
+            self._flush_completed_rows()
+
+    def close(self):
+        """書き出していない行を書き出して閉じる(中止した場合は空のセルのまま)"""
+        with self._lock:
+            if self._writer is None:
+                return
+            while self._next_row < len(self.row_sizes):
+                pixels, _ = self._pending.pop(self._next_row, (None, 0))
+                if pixels is None:
+                    pixels = np.zeros((self.cell_height, self.width, 4), dtype=np.uint8)
+                self._writer.write_rows(pixels)
+                self._next_row += 1
+            self._writer.close()
+            self._writer = None
+            self._write_index()
+
+    def _flush_completed_rows(self):
+        # 行は上から順に書き出す必要があるので､次の行がそろうまで後続の行は待たせる
+        while self._next_row in self._pending:
+            pixels, filled = self._pending[self._next_row]
+            if filled < self.row_sizes[self._next_row]:
+                break
+            self._writer.write_rows(pixels)
+            del self._pending[self._next_row]
+            self._next_row += 1
+
+    def _write_index(self):
+        data = {
+            "image": self.IMAGE_FILENAME,
+            "width": self.width,
+            "height": self.height,
+            "cell_width": self.cell_width,
+            "cell_height": self.cell_height,
+            "cells": sorted(self._entries, key=lambda e: (e["rect"][1], e["rect"][0])),
+        }
+        with open(os.path.join(self.save_dir, self.INDEX_FILENAME), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
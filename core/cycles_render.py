@@ -0,0 +1,124 @@
+import threading
+
+import bpy
+
+from ..properties.capture_settings import CaptureSettings
+
+
+class RenderBudget:
+    """ショットごとのレンダリング時間と予算の比較
+
+    予算(秒)が 0 の場合はサンプル数だけで止めるので､超過は数えない｡
+    """
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self._lock = threading.Lock()
+        self.shots = [] # (ファイル名の番号, 仰角, 水平角, 秒)
+
+    def add(self, index: int, x_angle: int, z_angle: int, seconds: float):
+        with self._lock:
+            self.shots.append((index, x_angle, z_angle, seconds))
+
+    @property
+    def over_budget(self) -> list[tuple[int, int, int, float]]:
+        if not self.budget:
+            return []
+        return [shot for shot in self.shots if shot[3] > self.budget]
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            seconds = [shot[3] for shot in self.shots]
+        return {
+            "budget": self.budget,
+            "shots": len(seconds),
+            "seconds": sum(seconds),
+            "max_seconds": max(seconds, default=0.0),
+            "over_budget": len(self.over_budget),
+        }
+
+    def summary(self) -> str:
+        values = self.as_dict()
+        if not values["shots"]:
+            return ""
+        text = f"Cycles 平均{values['seconds'] / values['shots']:.1f}秒/枚 最大{values['max_seconds']:.1f}秒"
+        if self.budget:
+            text += f" (予算{self.budget:g}秒､超過{values['over_budget']}枚)"
+        return text
+
+    def lines(self) -> list[str]:
+        """ショットごとの時間(コンソールに表示する)"""
+        lines = []
+        for index, x_angle, z_angle, seconds in self.shots:
+            line = f"shot {index:03d} x{x_angle:+03d} z{z_angle:03d} {seconds:6.2f}秒"
+            if self.budget:
+                line += f" / {self.budget:g}秒"
+                if seconds > self.budget:
+                    line += " 超過"
+            lines.append(line)
+        return lines
+
+
+class CyclesRenderer:
+    """撮影用のカメラから Cycles でレンダリングするクラス
+
+    prepare でシーンのレンダー設定を撮影用(時間とサンプル数の上限･適応サンプリング･CPUのデノイザー)に変え､
+    restore で元に戻す｡カメラを動かすだけなので､永続データでショット間のシーンの同期を省く｡
+    解像度と出力形式は AutoCamera が設定して元に戻す｡
+    """
+
+    # 撮影中に変更する (データパス, 属性名)
+    SAVED_ATTRIBUTES = (
+        ("render", "engine"),
+        ("render", "use_persistent_data"),
+        ("cycles", "samples"),
+        ("cycles", "time_limit"),
+        ("cycles", "use_adaptive_sampling"),
+        ("cycles", "adaptive_threshold"),
+        ("cycles", "use_denoising"),
+        ("cycles", "denoiser"),
+        ("cycles", "denoising_use_gpu"), # Blender 4.1 以降
+    )
+
+    def __init__(self, settings: CaptureSettings):
+        self.settings = settings
+        self.budget = RenderBudget(settings.cycles_time_budget)
+        self.saved = None # 撮影前の (データ, 属性名, 値)
+
+    def prepare(self, scene):
+        """シーンのレンダー設定を撮影用に変更する(変更前の値を記録する)"""
+        self.saved = []
+        for path, name in self.SAVED_ATTRIBUTES:
+            data = getattr(scene, path)
+            if hasattr(data, name):
+                self.saved.append((data, name, getattr(data, name)))
+
+        settings = self.settings
+        scene.render.engine = 'CYCLES'
+        scene.render.use_persistent_data = True
+        cycles = scene.cycles
+        cycles.samples = settings.cycles_max_samples
+        cycles.time_limit = settings.cycles_time_budget
+        cycles.use_adaptive_sampling = True
+        cycles.adaptive_threshold = settings.cycles_adaptive_threshold
+        cycles.use_denoising = settings.cycles_denoise
+        if settings.cycles_denoise:
+            cycles.denoiser = 'OPENIMAGEDENOISE'
+            if hasattr(cycles, "denoising_use_gpu"):
+                cycles.denoising_use_gpu = False
+
+    def render(self, filepath: str):
+        """撮影用のカメラから1枚レンダリングして filepath に書き出す"""
+        bpy.context.scene.render.filepath = filepath
+        bpy.ops.render.render(write_still=True)
+
+    def restore(self):
+        """レンダー設定を撮影前に戻す"""
+        if self.saved is None:
+            return
+        for data, name, value in reversed(self.saved):
+            try:
+                setattr(data, name, value)
+            except (ReferenceError, AttributeError, TypeError):
+                pass
+        self.saved = None
@@ -0,0 +1,124 @@
+import os
+from dataclasses import dataclass, replace
+from typing import Optional
+
+from PIL import Image
+
+from ..core.watermark import Watermark
+from ..core.image_store import ImageStore
+from ..core.encoders import ImageEncoder
+from ..core.session_db import ShotRecorder
+from ..properties.capture_settings import CaptureSettings, QUALITY_RESOLUTIONS
+
+# サムネイルを保存するサブフォルダ
+THUMBNAIL_DIRNAME = "thumbnail"
+
+
+@dataclass
+class Derivative:
+    """1回の撮影から作る縮小画像の1段分
+
+    Attributes:
+        name: 画質名(サムネイルは 'thumbnail')｡保存先のサブフォルダ名にもなる
+        size: 縮小後の (幅, 高さ)
+        watermark: 縮小後に書き込む情報｡サムネイルには書き込まない
+    """
+    name: str
+    size: tuple[int, int]
+    watermark: Optional[Watermark] = None
+
+
+def derivative_names(settings: CaptureSettings) -> list[str]:
+    """派生画像のサブフォルダ名(大きい順)"""
+    names = list(settings.derived_qualities)
+    if settings.thumbnail_width:
+        names.append(THUMBNAIL_DIRNAME)
+    return names
+
+
+def derivative_path(filepath: str, name: str) -> str:
+    """撮影画像のパスから派生画像のパスを求める(同じフォルダの name サブフォルダ)"""
+    return os.path.join(os.path.dirname(filepath), name, os.path.basename(filepath))
+
+
+def reuse_derivatives(source: str, filepath: str, names: list[str]) -> list[tuple[str, str]]:
+    """前回の撮影画像と一緒に書き出した派生画像をハードリンクする｡リンクできない場合はコピーする
+
+    Returns:
+        再利用した派生画像の [(サブフォルダ名, パス), ...]
+    """
+    reused = []
+    for name in names:
+        src = derivative_path(source, name)
+        if not os.path.isfile(src):
+            continue
+        dst = derivative_path(filepath, name)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        try:
+            os.link(src, dst)
+        except OSError:
+            with Image.open(src) as img:
+                img.save(dst)
+        reused.append((name, dst))
+    return reused
+
+
+class DerivativeChain:
+    """最も高い画質で撮影した画像から､低い画質の画像とサムネイルを作るクラス
+
+    縮小は大きい順に前の段の画像から行い(毎回元の画像から縮小するより速い)､
+    情報はそれぞれの画質の QUALITY_PRESETS の大きさ(縮小後の解像度に合わせる)で縮小後に書き込む｡
+    Watermark を持つので､並列保存ではワーカーごとに生成する｡
+    """
+
+    def __init__(self, settings: CaptureSettings):
+        width, height = settings.resolution_x, settings.resolution_y
+        self.stages = []
+        for quality in settings.derived_qualities:
+            size = self._fit(QUALITY_RESOLUTIONS[quality][0], width, height)
+            # 情報の大きさは縮小後の解像度に合わせる(確認用に縮小した撮影では画質の解像度より小さい)
+            stage_settings = replace(settings, quality=quality, resolution_x=size[0], resolution_y=size[1])
+            self.stages.append(Derivative(quality, size, Watermark(stage_settings)))
+        if settings.thumbnail_width:
+            self.stages.append(Derivative(THUMBNAIL_DIRNAME, self._fit(settings.thumbnail_width, width, height)))
+        self.stages.sort(key=lambda stage: stage.size[0], reverse=True)
+        self._created_dirs = set()
+
+    def __bool__(self):
+        return bool(self.stages)
+
+    def write(self, shot, img: Image.Image, encoder: ImageEncoder, store: Optional[ImageStore] = None,
+              recorder: Optional[ShotRecorder] = None):
+        """情報を書き込む前の画像から派生画像を作って保存する
+
+        Args:
+            shot: 撮影したショット(保存先と角度)
+            img: 情報を書き込む前の撮影画像(RGBA)｡変更しない
+            encoder: 保存形式(撮影画像と同じ)
+            store: 重複排除して保存する場合のストア
+            recorder: セッションの索引に記録する場合に使用
+        """
+        source = img
+        for stage in self.stages:
+            if stage.size[0] < source.width:
+                source = source.resize(stage.size, Image.LANCZOS, reducing_gap=3.0)
+            out = source
+            if stage.watermark is not None:
+                out = stage.watermark.compose(source.copy(), orbit_angle=shot.z_angle, elevation_angle=shot.x_angle)
+
+            filepath = derivative_path(shot.filepath, stage.name)
+            self._makedirs(os.path.dirname(filepath))
+            result = encoder.save(out, filepath, store)
+            if recorder:
+                recorder.add(shot, filepath, out.size, result, variant=stage.name)
+
+    def _makedirs(self, directory: str):
+        if directory not in self._created_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._created_dirs.add(directory)
+
+    @staticmethod
+    def _fit(stage_width: int, width: int, height: int) -> tuple[int, int]:
+        """撮影画像の縦横比のまま幅を stage_width にした大きさ"""
+        stage_width = min(stage_width, width)
+        return stage_width, max(1, round(height * stage_width / width))
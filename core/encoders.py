@@ -0,0 +1,116 @@
+import hashlib
+import io
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from PIL import Image
+
+from ..core.image_store import ImageStore
+from ..core.session_db import file_digest
+from ..properties.capture_settings import CaptureSettings
+
+# 出力形式ごとの拡張子
+IMAGE_EXTENSIONS = {
+    'png': ".png",
+    'jpeg': ".jpg",
+    'webp': ".webp",
+}
+
+
+@dataclass
+class EncodeResult:
+    """1枚分のエンコードの結果
+
+    Attributes:
+        bytes: ファイルのバイト数
+        digest: ファイルの内容のハッシュ
+        seconds: エンコードと書き込みにかかった時間
+    """
+    bytes: int
+    digest: str
+    seconds: float
+
+
+class EncodeStats:
+    """出力形式ごとの枚数・バイト数・エンコード時間の集計
+
+    並列保存の各ワーカーから呼ばれるので､ロックして加算する｡
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.formats = {} # 形式の表示名 -> {"files": 枚数, "bytes": バイト数, "seconds": 時間}
+
+    def add(self, label: str, size: int, seconds: float):
+        with self._lock:
+            entry = self.formats.setdefault(label, {"files": 0, "bytes": 0, "seconds": 0.0})
+            entry["files"] += 1
+            entry["bytes"] += size
+            entry["seconds"] += seconds
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {label: dict(entry) for label, entry in self.formats.items()}
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{label} {entry['files']}枚 {entry['bytes'] / (1 << 20):.1f} MiB {entry['seconds']:.1f}秒"
+            for label, entry in self.as_dict().items()
+        )
+
+
+class ImageEncoder:
+    """設定された形式で画像を1回だけエンコードして保存するクラス
+
+    透過を使わない場合とJPEGの場合はRGBにしてから保存する｡
+    """
+
+    def __init__(self, settings: CaptureSettings, stats: Optional[EncodeStats] = None):
+        self.format = settings.image_format
+        self.ext = IMAGE_EXTENSIONS[self.format]
+        self.use_alpha = settings.use_alpha and self.format != 'jpeg'
+        self.stats = stats
+
+        if self.format == 'png':
+            self.options = {"compress_level": settings.png_compress_level}
+            self.label = f"PNG (level {settings.png_compress_level})"
+        elif self.format == 'jpeg':
+            self.options = {"quality": settings.image_quality}
+            self.label = f"JPEG (quality {settings.image_quality})"
+        elif settings.webp_lossless:
+            self.options = {"lossless": True, "quality": settings.image_quality, "method": 4}
+            self.label = "WebP (lossless)"
+        else:
+            self.options = {"quality": settings.image_quality, "method": 4}
+            self.label = f"WebP (quality {settings.image_quality})"
+
+    def save(self, img: Image.Image, filepath: str, store: Optional[ImageStore] = None) -> EncodeResult:
+        """画像を保存する(store がある場合は重複排除して保存する)"""
+        if not self.use_alpha and img.mode != "RGB":
+            img = img.convert("RGB")
+
+        start = time.perf_counter()
+        if store:
+            blob = store.put_image(img, filepath, **self.options)
+            # ストアのキーは画素のハッシュなので､索引用にはファイルの内容から求める
+            # (ハードリンクが使えない場合は filepath がないので､ストアの画像から求める)
+            size, digest = os.path.getsize(blob), file_digest(blob)
+        else:
+            buffer = io.BytesIO()
+            img.save(buffer, format=self._pillow_format(), **self.options)
+            data = buffer.getbuffer()
+            digest = hashlib.blake2b(data, digest_size=20).hexdigest()
+            with open(filepath, "wb") as f:
+                f.write(data)
+            size = len(data)
+        seconds = time.perf_counter() - start
+
+        if self.stats is not None:
+            self.stats.add(self.label, size, seconds)
+        return EncodeResult(size, digest, seconds)
+
+    def _pillow_format(self) -> str:
+        return {'png': "PNG", 'jpeg': "JPEG", 'webp': "WEBP"}[self.format]
@@ -0,0 +1,103 @@
+import bpy
+import gpu
+import numpy as np
+
+
+class FrameGrabber:
+    """カメラ視点をオフスクリーンに描画し､画素をメモリに読み込むクラス
+
+    bpy.ops.render.opengl の Render Result は Python から画素を読めないため､
+    GPUOffScreen に同じビューポート描画を行い､事前に確保したバッファへ直接読み込む｡
+    描画にはカメラの行列と撮影解像度を直接渡すので､3Dビューの視点やシーンの解像度は使わない｡
+    3Dビューからはシェーディングの設定だけを借りる｡
+    """
+
+    def __init__(self, space, region, width: int, height: int, hide_overlays: bool = True):
+        """
+        Args:
+            space: 描画に使う SpaceView3D (シェーディングの設定を使う)
+            region: space の WINDOW リージョン
+            width: 撮影する横解像度
+            height: 撮影する縦解像度
+            hide_overlays: 描画する間だけオーバーレイを非表示にするか
+        """
+        self.space = space
+        self.region = region
+        self.width = width
+        self.height = height
+        self.hide_overlays = hide_overlays
+
+        self.offscreen = gpu.types.GPUOffScreen(width, height)
+        # 読み込み先のバッファは撮影のたびに使い回す
+        self.buffer = gpu.types.Buffer('UBYTE', (height, width, 4))
+        self.pixels = np.asarray(self.buffer, dtype=np.uint8)
+
+    @staticmethod
+    def is_available() -> bool:
+        """GPUで描画できる環境か(バックグラウンド起動では使えない)"""
+        return not bpy.app.background
+
+    @staticmethod
+    def find_view3d(area=None):
+        """描画に使う3Dビューの (space, region) を探す
+
+        area が3Dビューならそれを使い､そうでなければ開いているウィンドウから探す｡
+        見つからない場合は None
+        """
+        areas = [area] if area is not None and area.type == 'VIEW_3D' else []
+        for window in bpy.context.window_manager.windows:
+            areas.extend(a for a in window.screen.areas if a.type == 'VIEW_3D')
+        for candidate in areas:
+            region = next((r for r in candidate.regions if r.type == 'WINDOW'), None)
+            if region is not None:
+                return candidate.spaces.active, region
+        return None
+
+    def grab(self, camera_obj) -> np.ndarray:
+        """カメラ視点を描画して (高さ, 幅, 4) のRGBA配列を返す
+
+        戻り値は内部バッファのビュー(上下反転済み)なので､次の grab までに使い終えること｡
+        """
+        context = bpy.context
+        # place_camera 直後の matrix_world を反映させる
+        context.view_layer.update()
+        depsgraph = context.evaluated_depsgraph_get()
+
+        view_matrix = camera_obj.matrix_world.inverted()
+        projection_matrix = camera_obj.calc_matrix_camera(depsgraph, x=self.width, y=self.height)
+
+        # オーバーレイは描画する間だけ消す(画面の再描画までに戻すので表示は変わらない)
+        overlay = self.space.overlay
+        show_overlays = overlay.show_overlays
+        if self.hide_overlays:
+            overlay.show_overlays = False
+        try:
+            self._draw(context, view_matrix, projection_matrix)
+        finally:
+            overlay.show_overlays = show_overlays
+
+        if not context.scene.render.film_transparent:
+            self.pixels[..., 3] = 255
+
+        # OpenGLは左下原点なので上下を反転する
+        return self.pixels[::-1]
+
+    def _draw(self, context, view_matrix, projection_matrix):
+        with self.offscreen.bind():
+            framebuffer = gpu.state.active_framebuffer_get()
+            framebuffer.clear(color=(0.0, 0.0, 0.0, 0.0))
+            self.offscreen.draw_view3d(
+                context.scene,
+                context.view_layer,
+                self.space,
+                self.region,
+                view_matrix,
+                projection_matrix,
+                do_color_management=True,
+            )
+            framebuffer.read_color(0, 0, self.width, self.height, 4, 0, 'UBYTE', data=self.buffer)
+
+    def free(self):
+        if self.offscreen is not None:
+            self.offscreen.free()
+            self.offscreen = None
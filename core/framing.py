@@ -0,0 +1,150 @@
+import numpy as np
+
+# 1回の射影で扱う (頂点数 x 視点数) の上限｡大量の頂点でもメモリを抑えるために分割する
+_CHUNK_ELEMENTS = 1 << 20
+
+
+def as_point_array(points) -> np.ndarray:
+    """Vectorのリストや配列を (N, 3) の float64 配列に変換する"""
+    if isinstance(points, np.ndarray):
+        return np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    return np.array([tuple(p) for p in points], dtype=np.float64).reshape(-1, 3)
+
+
+def aabb_center(points: np.ndarray) -> np.ndarray:
+    """AABBの中心を返す"""
+    return (points.min(axis=0) + points.max(axis=0)) * 0.5
+
+
+def view_directions(shot_angle_list) -> np.ndarray:
+    """撮影角度リストから 中心→カメラ 方向の単位ベクトル (M, 3) を求める
+
+    AutoCamera.calculate_camera_location と同じ回転
+    (Rz(水平角) @ Rx(-仰角) @ (0, -1, 0)) をまとめて計算する｡
+
+    Args:
+        shot_angle_list: [[仰角, 水平角], ...]
+    """
+    angles = np.radians(np.asarray(shot_angle_list, dtype=np.float64).reshape(-1, 2))
+    elevation = angles[:, 0]
+    orbit = angles[:, 1]
+    cos_e = np.cos(elevation)
+    return np.stack((
+        cos_e * np.sin(orbit),
+        -cos_e * np.cos(orbit),
+        np.sin(elevation),
+    ), axis=1)
+
+
+def fibonacci_directions(count: int) -> np.ndarray:
+    """球面上にほぼ均等に並ぶ単位ベクトル (count, 3)"""
+    i = np.arange(count, dtype=np.float64) + 0.5
+    z = 1.0 - 2.0 * i / count
+    radius = np.sqrt(np.maximum(0.0, 1.0 - z * z))
+    theta = np.pi * (3.0 - np.sqrt(5.0)) * i
+    return np.stack((radius * np.cos(theta), radius * np.sin(theta), z), axis=1)
+
+
+def direction_angles(directions: np.ndarray) -> list[list[int]]:
+    """中心→カメラ方向を撮影角度 [[仰角, 水平角], ...] (整数の度)に変換する
+
+    view_directions の逆変換｡水平角は 0 〜 359 にする｡
+    """
+    directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+    elevation = np.degrees(np.arcsin(np.clip(directions[:, 2], -1.0, 1.0)))
+    orbit = np.degrees(np.arctan2(directions[:, 0], -directions[:, 1]))
+    elevation = np.rint(elevation).astype(int)
+    orbit = np.rint(orbit).astype(int) % 360
+    return [[int(x), int(z)] for x, z in zip(elevation, orbit)]
+
+
+def camera_basis(directions: np.ndarray):
+    """中心→カメラ方向からスクリーン平面の (right, up) をまとめて求める
+
+    カメラは to_track_quat('-Z', 'Y') で向けるので､ロールはワールドZ軸基準になる｡
+    真上・真下を向く場合はX軸を right として扱う｡
+    """
+    world_up = np.array((0.0, 0.0, 1.0))
+    right = np.cross(world_up, directions)
+    norm = np.linalg.norm(right, axis=1)
+    degenerate = norm < 1e-9
+    right[degenerate] = (1.0, 0.0, 0.0)
+    norm[degenerate] = 1.0
+    right /= norm[:, None]
+    up = np.cross(directions, right)
+    return right, up
+
+
+def solve_view_distances(corners, center, directions, sensor_width, sensor_height,
+                         focal_length, margin_scale, perspective=True):
+    """全視点について､全頂点が画角に収まるカメラ距離を一括で求める
+
+    Args:
+        corners: 頂点群 (N, 3)
+        center: 注視点 (3,)
+        directions: 中心→カメラ方向の単位ベクトル (M, 3)
+        sensor_width: 横方向のセンササイズ(mm)
+        sensor_height: 縦方向のセンササイズ(mm)
+        focal_length: 焦点距離(mm)
+        margin_scale: 余白調整｡1.0でギリギリ画角に収まる
+        perspective: Trueなら透視投影で厳密に求める｡
+            Falseなら従来の直交射影による見積もり(投影幅からの逆算)
+
+    Returns:
+        (distances, max_distance): 視点ごとの距離 (M,) と最大値
+    """
+    corners = as_point_array(corners)
+    directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+    if len(corners) == 0 or len(directions) == 0:
+        return np.zeros(len(directions)), 0.0
+
+    relative = corners - np.asarray(center, dtype=np.float64).reshape(3)
+    right, up = camera_basis(directions)
+
+    # tan(画角/2)
+    tan_x = sensor_width / (2 * focal_length)
+    tan_y = sensor_height / (2 * focal_length)
+
+    if perspective:
+        distances = np.full(len(directions), -np.inf)
+    else:
+        min_x = np.full(len(directions), np.inf)
+        max_x = np.full(len(directions), -np.inf)
+        min_y = np.full(len(directions), np.inf)
+        max_y = np.full(len(directions), -np.inf)
+
+    chunk = max(1, _CHUNK_ELEMENTS // len(directions))
+    for start in range(0, len(relative), chunk):
+        block = relative[start:start + chunk]
+        xs = block @ right.T  # (n, M)
+        ys = block @ up.T
+
+        if perspective:
+            # 頂点の奥行きは (距離 - q・dir)｡|x| / 奥行き <= tan / margin を満たす最小の距離
+            depth_offset = block @ directions.T
+            need_x = np.abs(xs) * (margin_scale / tan_x) + depth_offset
+            need_y = np.abs(ys) * (margin_scale / tan_y) + depth_offset
+            distances = np.maximum(distances, np.maximum(need_x, need_y).max(axis=0))
+        else:
+            min_x = np.minimum(min_x, xs.min(axis=0))
+            max_x = np.maximum(max_x, xs.max(axis=0))
+            min_y = np.minimum(min_y, ys.min(axis=0))
+            max_y = np.maximum(max_y, ys.max(axis=0))
+
+    if not perspective:
+        dist_x = ((max_x - min_x) / 2) / tan_x
+        dist_y = ((max_y - min_y) / 2) / tan_y
+        distances = np.maximum(dist_x, dist_y) * margin_scale
+
+    distances = np.maximum(distances, 0.0)
+    return distances, float(distances.max())
+
+
+def effective_sensor_size(sensor_width, resolution_x, resolution_y):
+    """sensor_fit='AUTO' のカメラで実際に使われるセンササイズ(横, 縦)を返す
+
+    AUTOでは sensor_width が解像度の長辺に割り当てられ､短辺は縦横比から決まる｡
+    """
+    if resolution_x >= resolution_y:
+        return sensor_width, sensor_width * resolution_y / resolution_x
+    return sensor_width * resolution_x / resolution_y, sensor_width
@@ -0,0 +1,179 @@
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from ..object.corner_provider import MeshHullCornerProvider
+from ..object.fingerprint import GEOMETRY_TYPES, bound_box_digest, geometry_digest, read_evaluated_geometry, transform_digest
+from ..object.geometry_updates import GeometryUpdates
+from ..properties.capture_settings import CaptureSettings
+
+# 画角の計算方法を変えた場合に上げる(.blend に保存した古い結果を使わないため)
+FRAMING_VERSION = 1
+
+
+@dataclass
+class FramingResult:
+    """画角の計算結果
+
+    Attributes:
+        center: 注視点
+        distance: 全撮影角度で収まるカメラ距離(最大値)
+        view_distances: 撮影角度ごとの必要距離
+    """
+    center: tuple[float, float, float]
+    distance: float
+    view_distances: np.ndarray
+
+    def to_json(self) -> dict:
+        return {"center": list(self.center), "distance": self.distance,
+                "view_distances": self.view_distances.tolist()}
+
+    @classmethod
+    def from_json(cls, values: dict) -> "FramingResult":
+        return cls(tuple(values["center"]), float(values["distance"]),
+                   np.asarray(values["view_distances"], dtype=np.float64))
+
+
+class ShapeDigests:
+    """凸包に使う評価後のジオメトリのハッシュ
+
+    depsgraph の更新でジオメトリが変わっていなければ(MeshHullCornerProvider と同じキーと状態)､
+    メッシュを読み込まずに前回のハッシュを使う｡更新を追えない場合は毎回読み込む｡
+    """
+
+    MAX_ENTRIES = 256
+
+    _entries = OrderedDict() # キー -> (ジオメトリの状態, ハッシュ)
+
+    @classmethod
+    def get(cls, obj, geometry: Optional[dict] = None) -> str:
+        """obj の形状のハッシュ｡読み込んだ場合は geometry に オブジェクト名 -> ジオメトリ を入れる"""
+        key = MeshHullCornerProvider.cache_key(obj)
+        stamp = GeometryUpdates.stamp(key)
+        cached = cls._entries.get(key)
+        if cached is not None and stamp is not None and cached[0] == stamp:
+            cls._entries.move_to_end(key)
+            return cached[1]
+
+        data = read_evaluated_geometry(obj)
+        if geometry is not None:
+            geometry[obj.name_full] = data
+        if data is not None:
+            # 画角がキャッシュにあって凸包を求めない場合も､凸包のキャッシュを今の状態にしておく
+            MeshHullCornerProvider.revalidate(obj, data[0])
+        digest = geometry_digest(obj, data)
+        if stamp is not None:
+            cls._entries[key] = (stamp, digest)
+            cls._entries.move_to_end(key)
+            while len(cls._entries) > cls.MAX_ENTRIES:
+                cls._entries.popitem(last=False)
+        return digest
+
+    @classmethod
+    def clear(cls):
+        cls._entries.clear()
+
+
+def framing_key(objects, settings: CaptureSettings, geometry: Optional[dict] = None) -> str:
+    """画角の計算に使う入力すべてのハッシュ
+
+    オブジェクトごとに画角の計算で読む形状(凸包の場合は評価後のジオメトリ､それ以外は
+    バウンディングボックス､エンプティは表示サイズ)とワールド行列を順番どおりに使う｡
+    設定は焦点距離・センササイズ・解像度(縦横比)・余白・撮影角度・画角の計算方法を使う｡
+
+    凸包に使うメッシュは､ジオメトリが前回から変わっていなければ読み込まない(ShapeDigests)｡
+
+    Args:
+        geometry: 渡した場合は 凸包に使うオブジェクト名 -> 読み込んだジオメトリ を入れる
+            (キャッシュにない場合に get_corners へ渡し､同じメッシュを2回読み込まないため)
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for obj in objects:
+        if settings.framing_mode == 'hull' and obj.type in GEOMETRY_TYPES:
+            shape = ShapeDigests.get(obj, geometry)
+        elif obj.type == 'EMPTY':
+            shape = geometry_digest(obj)
+        else:
+            shape = bound_box_digest(obj)
+        h.update(f"{obj.type}:{shape}:{transform_digest(obj)};".encode())
+
+    values = (
+        FRAMING_VERSION,
+        settings.framing_mode,
+        settings.focal_length,
+        settings.sensor_width,
+        settings.resolution_x,
+        settings.resolution_y,
+        settings.margin_scale,
+        tuple(tuple(angles) for angles in settings.shot_angle_list),
+    )
+    h.update(repr(values).encode())
+    return h.hexdigest()
+
+
+class FramingCache:
+    """画角の計算結果を framing_key ごとに持つキャッシュ
+
+    メモリ上には最近使った MAX_ENTRIES 件を持つ(LRU)｡
+    persist の場合はシーンのカスタムプロパティにも保存し､.blend と一緒に保存された結果を
+    次に開いたときにも使う｡入力が変わればキーが変わるので､古い結果は使われずに追い出される｡
+    """
+
+    MAX_ENTRIES = 32
+    SCENE_KEY = "orbitsnap_framing_cache"
+
+    _entries = OrderedDict() # キー -> FramingResult
+
+    @classmethod
+    def get(cls, key: str, scene=None) -> Optional[FramingResult]:
+        """キャッシュした結果｡メモリにない場合は scene に保存した結果を探す"""
+        result = cls._entries.get(key)
+        if result is None and scene is not None:
+            stored = cls._load_scene(scene).get(key)
+            if stored is not None:
+                result = FramingResult.from_json(stored)
+                cls._entries[key] = result
+        if result is None:
+            return None
+        cls._entries.move_to_end(key)
+        cls._evict()
+        return result
+
+    @classmethod
+    def put(cls, key: str, result: FramingResult, scene=None):
+        """結果を追加する｡scene を渡した場合はシーンにも保存する"""
+        cls._entries[key] = result
+        cls._entries.move_to_end(key)
+        cls._evict()
+
+        if scene is not None:
+            stored = cls._load_scene(scene)
+            stored.pop(key, None)
+            stored[key] = result.to_json()
+            # 古いものから捨てる(辞書は追加順)
+            for old in list(stored)[:-cls.MAX_ENTRIES]:
+                del stored[old]
+            scene[cls.SCENE_KEY] = json.dumps(stored)
+
+    @classmethod
+    def clear(cls, scene=None):
+        cls._entries.clear()
+        if scene is not None and cls.SCENE_KEY in scene:
+            del scene[cls.SCENE_KEY]
+
+    @classmethod
+    def _evict(cls):
+        while len(cls._entries) > cls.MAX_ENTRIES:
+            cls._entries.popitem(last=False)
+
+    @classmethod
+    def _load_scene(cls, scene) -> dict:
+        try:
+            return json.loads(scene.get(cls.SCENE_KEY, "{}"))
+        except (TypeError, ValueError):
+            # 壊れている場合は保存し直す
+            return {}
@@ -0,0 +1,172 @@
+"""撮影画像の内容アドレス方式ストア
+
+画像はハッシュをキーにして保存フォルダ直下の .orbitsnap_store にまとめて保存し､
+各セッションフォルダにはハードリンクを置く｡同じ画像は何度撮影しても1つ分の容量しか使わない｡
+セッションごとにファイル名とハッシュの対応(orbitsnap_store.json)も書き出す｡
+
+参照されなくなった画像は gc で削除できる｡
+
+    python core/image_store.py gc <保存フォルダ>
+"""
+import glob
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+
+STORE_DIRNAME = ".orbitsnap_store"
+MANIFEST_FILENAME = "orbitsnap_store.json"
+MANIFEST_VERSION = 1
+
+
+class ImageStore:
+    def __init__(self, root_dir: str):
+        """
+        Args:
+            root_dir: 保存フォルダ(capture_* フォルダの親)
+        """
+        self.root_dir = root_dir
+        self.store_dir = os.path.join(root_dir, STORE_DIRNAME)
+        self.objects_dir = os.path.join(self.store_dir, "objects")
+        self._lock = threading.Lock()
+        self._records = {} # セッションフォルダ -> {ファイル名: ハッシュ}
+        self.written = 0 # 新たに書き込んだ画像の数
+        self.deduplicated = 0 # 既存の画像を使った数
+
+    def blob_path(self, digest: str, ext: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest + ext)
+
+    def put_image(self, img, filepath: str, **save_options) -> str:
+        """画像を保存し filepath にリンクする
+
+        キーは合成後の画素から求めるので､同じ画像が既にあればエンコードも書き込みも行わない｡
+        ハードリンクが使えない場合は filepath が作られないので､保存した画像のパス(blob)を返す｡
+        """
+        ext = os.path.splitext(filepath)[1].lower()
+        h = hashlib.blake2b(digest_size=20)
+        h.update(repr((img.mode, img.size, ext, sorted(save_options.items()))).encode())
+        h.update(img.tobytes())
+        digest = h.hexdigest()
+
+        blob = self.blob_path(digest, ext)
+        if os.path.exists(blob):
+            self._count(deduplicated=True)
+        else:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(blob), suffix=ext)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    img.save(f, format=_pillow_format(ext), **save_options)
+                os.replace(tmp_path, blob)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._count(deduplicated=False)
+
+        self._link(blob, filepath)
+        self._record(filepath, digest)
+        return blob
+
+    def ingest_file(self, filepath: str) -> str:
+        """書き出し済みのファイルをストアに移し､元の場所にリンクを置く"""
+        ext = os.path.splitext(filepath)[1].lower()
+        h = hashlib.blake2b(digest_size=20)
+        h.update(b"file:")
+        with open(filepath, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+
+        blob = self.blob_path(digest, ext)
+        if os.path.exists(blob):
+            os.remove(filepath)
+            self._count(deduplicated=True)
+        else:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.replace(filepath, blob)
+            self._count(deduplicated=False)
+
+        self._link(blob, filepath)
+        self._record(filepath, digest)
+        return digest
+
+    def save_manifest(self, session_dir: str):
+        """セッションフォルダにファイル名とハッシュの対応を書き出す"""
+        with self._lock:
+            files = dict(self._records.get(os.path.normpath(session_dir), {}))
+        if not files:
+            return
+        data = {
+            "version": MANIFEST_VERSION,
+            "store": os.path.relpath(self.store_dir, session_dir),
+            "files": files,
+        }
+        with open(os.path.join(session_dir, MANIFEST_FILENAME), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+
+    def _link(self, blob: str, filepath: str):
+        if os.path.lexists(filepath):
+            os.remove(filepath)
+        try:
+            os.link(blob, filepath)
+        except OSError:
+            # ハードリンクが使えないファイルシステムではマニフェストだけで参照する
+            pass
+
+    def _record(self, filepath: str, digest: str):
+        session_dir = os.path.normpath(os.path.dirname(filepath))
+        with self._lock:
+            self._records.setdefault(session_dir, {})[os.path.basename(filepath)] = digest
+
+    def _count(self, deduplicated: bool):
+        with self._lock:
+            if deduplicated:
+                self.deduplicated += 1
+            else:
+                self.written += 1
+
+
+def gc(root_dir: str, dry_run: bool = False):
+    """どのセッションからも参照されていない画像をストアから削除する
+
+    マニフェストに載っているか､ストア外にハードリンクがある画像は残す｡
+
+    Returns:
+        (削除した数, 解放したバイト数)
+    """
+    store_dir = os.path.join(root_dir, STORE_DIRNAME)
+    referenced = set()
+    for manifest in glob.glob(os.path.join(root_dir, "*", "**", MANIFEST_FILENAME), recursive=True):
+        try:
+            with open(manifest, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        referenced.update(data.get("files", {}).values())
+
+    removed = 0
+    freed = 0
+    for blob in glob.glob(os.path.join(store_dir, "objects", "*", "*")):
+        digest = os.path.splitext(os.path.basename(blob))[0]
+        stat = os.stat(blob)
+        if digest in referenced or stat.st_nlink > 1:
+            continue
+        if not dry_run:
+            os.remove(blob)
+        removed += 1
+        freed += stat.st_size
+    return removed, freed
+
+
+def _pillow_format(ext: str) -> str:
+    return {".jpg": "JPEG", ".jpeg": "JPEG", ".webp": "WEBP"}.get(ext, "PNG")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "gc":
+        raise SystemExit("usage: python core/image_store.py gc <保存フォルダ> [--dry-run]")
+    count, size = gc(sys.argv[2], dry_run="--dry-run" in sys.argv)
+    print(f"removed {count} blobs, {size / (1 << 20):.1f} MiB")
@@ -0,0 +1,150 @@
+import glob
+import hashlib
+import json
+import os
+
+import bpy
+
+from ..object.fingerprint import object_digest, scene_digest, shading_digest, world_digest
+from ..properties.capture_settings import CaptureSettings
+
+INDEX_FILENAME = "orbitsnap_index.json"
+INDEX_VERSION = 1
+
+
+def session_fingerprint(objects, settings: CaptureSettings, shading=None) -> str:
+    """セッション内で変わらない入力(対象オブジェクトと設定)のハッシュ
+
+    ジオメトリ・トランスフォーム・マテリアル､画質や焦点距離､
+    ウォーターマークに書き込む内容(日時を書き込む場合は日時も)を含める｡
+    対象以外に写るもの(表示中のほかのジオメトリとライト)とワールド､
+    3Dビューで描画する場合はそのシェーディングの設定も含める｡
+
+    Args:
+        objects: 撮影対象のオブジェクト
+        settings: 撮影の設定
+        shading: 描画に使う3Dビューの View3DShading｡Cycles でレンダリングする場合は None
+    """
+    scene = bpy.context.scene
+    h = hashlib.blake2b(digest_size=16)
+    for digest in sorted(object_digest(obj) for obj in objects):
+        h.update(digest.encode())
+    h.update(scene_digest(bpy.context.view_layer, exclude=objects).encode())
+    h.update(world_digest(scene.world).encode())
+    h.update((shading_digest(shading) if shading is not None else "<render>").encode())
+
+    watermark = (
+        settings.datetime.strftime("%Y-%m-%d %H:%M:%S") if settings.w_datetime else None,
+        bpy.path.basename(bpy.data.filepath) if settings.w_filename else None,
+        settings.w_focal_length,
+        settings.w_orbit_angle,
+        settings.w_elevation_angle,
+        settings.note if settings.w_note else None,
+    )
+    values = (
+        settings.quality,
+        settings.resolution_x,
+        settings.resolution_y,
+        settings.sensor_width,
+        settings.focal_length,
+        watermark,
+        tuple(settings.derived_qualities), # 前回の派生画像を一緒に再利用するため
+        settings.thumbnail_width,
+        settings.image_format,
+        settings.png_compress_level,
+        settings.image_quality,
+        settings.webp_lossless,
+        settings.use_alpha,
+        settings.render_mode,
+        (settings.cycles_time_budget, settings.cycles_max_samples, settings.cycles_adaptive_threshold,
+         settings.cycles_denoise) if settings.render_mode == 'cycles' else None,
+        scene.render.engine,
+        scene.render.film_transparent,
+        scene.view_settings.view_transform,
+        scene.view_settings.look,
+    )
+    h.update(repr(values).encode())
+    return h.hexdigest()
+
+
+def shot_fingerprint(session_fp: str, center, distance: float, x_angle: int, z_angle: int) -> str:
+    """1ショット分のハッシュ(セッションのハッシュ + カメラの位置)"""
+    values = (session_fp, tuple(round(v, 6) for v in center), round(distance, 6), x_angle, z_angle)
+    return hashlib.blake2b(repr(values).encode(), digest_size=16).hexdigest()
+
+
+class ShotIndex:
+    """セッションフォルダに書き出すショットの記録
+
+    ショットごとに指紋と､新たに撮影したか(rendered)前回の画像を再利用したか(reused)を記録する｡
+    """
+
+    def __init__(self, save_dir: str):
+        self.save_dir = save_dir
+        self.entries = []
+
+    def add(self, shot, fingerprint: str, status: str, source: str = None, linked: bool = True):
+        """
+        Args:
+            shot: 記録するショット
+            fingerprint: ショットの指紋
+            status: 'rendered' (新たに撮影) か 'reused' (再利用)
+            source: 再利用した画像のパス
+            linked: 再利用した画像をハードリンクできたか｡False の場合 source を参照する
+        """
+        entry = {
+            "index": shot.index,
+            "x_angle": shot.x_angle,
+            "z_angle": shot.z_angle,
+            "file": os.path.relpath(shot.filepath, self.save_dir),
+            "fingerprint": fingerprint,
+            "status": status,
+        }
+        if source:
+            entry["source"] = source
+            entry["linked"] = linked
+        self.entries.append(entry)
+
+    @property
+    def reused_count(self) -> int:
+        return sum(entry["status"] == "reused" for entry in self.entries)
+
+    def save(self):
+        data = {"version": INDEX_VERSION, "shots": self.entries}
+        with open(os.path.join(self.save_dir, INDEX_FILENAME), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+
+    @staticmethod
+    def load_previous(directory: str, exclude: str = None) -> dict:
+        """過去のセッションの 指紋 -> 画像パス を返す｡同じ指紋は新しいセッションを優先する"""
+        previous = {}
+        # 対象ごとに撮影したセッションはサブフォルダに記録がある
+        index_files = sorted(glob.glob(os.path.join(directory, "capture_*", "**", INDEX_FILENAME), recursive=True))
+        for index_file in index_files:
+            session_dir = os.path.dirname(index_file)
+            if exclude and os.path.commonpath([os.path.normpath(session_dir), os.path.normpath(exclude)]) == os.path.normpath(exclude):
+                continue
+            try:
+                with open(index_file, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if data.get("version") != INDEX_VERSION:
+                continue
+            for entry in data.get("shots", []):
+                if entry.get("linked", True):
+                    path = os.path.join(session_dir, entry["file"])
+                else:
+                    # 参照で再利用したショットは元の画像を指す
+                    path = entry["source"]
+                previous[entry["fingerprint"]] = path
+        return previous
+
+    @staticmethod
+    def reuse(source: str, filepath: str) -> bool:
+        """前回の画像をハードリンクする｡リンクできない場合は False (参照として記録する)"""
+        try:
+            os.link(source, filepath)
+            return True
+        except OSError:
+            return False
@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+# Chrome trace 形式の計測結果のファイル名(セッションフォルダに書き出す)
+TRACE_FILENAME = "orbitsnap_trace.json"
+
+
+class _NullSpan:
+    """計測しない場合の区間(何もしない)"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "args", "start", "depth")
+
+    def __init__(self, profiler, name: str, args: dict):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        local = self.profiler._local
+        self.depth = getattr(local, "depth", 0)
+        local.depth = self.depth + 1
+        if self.depth == 0 and self.profiler.memory and threading.current_thread() is threading.main_thread():
+            # メインスレッドの一番外側の区間ごとにピークを取り直す
+            # (内側の区間や保存スレッドの区間のピークは､この区間の開始からのプロセス全体の値)
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        self.profiler._local.depth = self.depth
+        self.profiler._record(self, end)
+        return False
+
+
+class SessionProfiler:
+    """撮影の区間ごとの時間とメモリを記録するクラス
+
+    span(name) で囲んだ区間を Chrome trace 形式のイベントとして記録し､区間名ごとに
+    回数・合計時間・最大時間・メモリのピーク(tracemalloc)を集計する｡
+    無効の場合の span は何もしない共有のオブジェクトを返すので､計測のコストはほぼない｡
+    並列保存のワーカースレッドからも呼ばれるので､記録はロックして追加する｡
+    """
+
+    def __init__(self, enabled: bool = False, memory: bool = False):
+        """
+        Args:
+            enabled: 区間の時間を記録するか
+            memory: tracemalloc でメモリのピークも記録するか(Python のメモリ確保が遅くなる)
+        """
+        self.enabled = enabled
+        self.memory = enabled and memory
+        self.origin = time.perf_counter_ns()
+        self.events = []
+        self.phases = {} # 区間名 -> {"count", "seconds", "max_seconds", "peak_bytes"}
+        self.thread_names = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._owns_tracemalloc = False
+
+    def __bool__(self):
+        return self.enabled
+
+    def span(self, name: str, **args):
+        """with で囲んだ区間を記録する｡args はトレースのイベントに付ける情報"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def start(self):
+        """計測を始める(メモリも記録する場合は tracemalloc を開始する)"""
+        self.origin = time.perf_counter_ns()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+
+    def stop(self):
+        """tracemalloc をこのクラスで開始した場合は停止する"""
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+    def _record(self, span: _Span, end: int):
+        seconds = (end - span.start) / 1e9
+        thread = threading.current_thread()
+        event = {
+            "name": span.name,
+            "cat": "orbitsnap",
+            "ph": "X",
+            "ts": (span.start - self.origin) / 1000,
+            "dur": (end - span.start) / 1000,
+            "pid": os.getpid(),
+            "tid": thread.ident,
+        }
+        peak = None
+        if self.memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            span.args["current_bytes"] = current
+            span.args["peak_bytes"] = peak
+        if span.args:
+            event["args"] = span.args
+
+        with self._lock:
+            self.events.append(event)
+            if peak is not None and span.depth == 0:
+                self.events.append({"name": "memory", "ph": "C", "ts": event["ts"] + event["dur"],
+                                    "pid": event["pid"], "args": {"MiB": round(current / (1 << 20), 2)}})
+            self.thread_names.setdefault(thread.ident, thread.name)
+            phase = self.phases.setdefault(span.name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0, "peak_bytes": 0})
+            phase["count"] += 1
+            phase["seconds"] += seconds
+            phase["max_seconds"] = max(phase["max_seconds"], seconds)
+            if peak is not None:
+                phase["peak_bytes"] = max(phase["peak_bytes"], peak)
+
+    def as_dict(self) -> dict:
+        """区間名ごとの集計(バッチ撮影の結果などに使う)"""
+        with self._lock:
+            return {name: dict(phase) for name, phase in self.phases.items()}
+
+    def summary(self, limit: int = 6) -> str:
+        """合計時間の長い区間の一覧"""
+        phases = sorted(self.as_dict().items(), key=lambda item: item[1]["seconds"], reverse=True)
+        parts = []
+        for name, phase in phases[:limit]:
+            text = f"{name} {phase['seconds']:.2f}秒/{phase['count']}回"
+            if phase["peak_bytes"]:
+                text += f" ピーク{phase['peak_bytes'] / (1 << 20):.1f} MiB"
+            parts.append(text)
+        return ", ".join(parts)
+
+    def write_trace(self, directory: str) -> str:
+        """Chrome trace 形式(chrome://tracing や Perfetto で開ける)で書き出す
+
+        Returns:
+            書き出したファイルのパス
+        """
+        with self._lock:
+            events = list(self.events)
+            thread_names = dict(self.thread_names)
+        pid = os.getpid()
+        metadata = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                    for tid, name in thread_names.items()]
+
+        path = os.path.join(directory, TRACE_FILENAME)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        return path
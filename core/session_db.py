@@ -0,0 +1,408 @@
+"""撮影セッションの索引(SQLite)
+
+保存フォルダ直下の orbitsnap_index.sqlite に､セッションとショットを1行ずつ記録する｡
+フォルダを走査してファイル名を解析しなくても､ファイル・オブジェクト・角度・期間でショットを探せる｡
+
+    python core/session_db.py <保存フォルダ> query --blend chair --object Chair --x 45 --z 0 --since 2026-07-01
+    python core/session_db.py <保存フォルダ> sessions
+    python core/session_db.py <保存フォルダ> rebuild
+
+rebuild は索引に載っていない過去のセッション(このアドオンの以前のバージョンで撮影したものなど)を
+ファイル名から取り込む｡
+"""
+import argparse
+import datetime
+import glob
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+from typing import Optional
+
+DB_FILENAME = "orbitsnap_index.sqlite"
+SCHEMA_VERSION = 1
+
+# ショットのファイル名 {blend}_shot_{NNN}_x{+EE}_z{AAA}.{ext}
+SHOT_FILENAME = re.compile(r"^(?P<blend>.+)_shot_(?P<index>\d{3,})_x(?P<x>[+-]\d+)_z(?P<z>\d+)\.(?P<ext>png|jpg|webp)$")
+# 派生画像のサブフォルダ名(過去のセッションの取り込みで対象のフォルダと区別する)
+VARIANT_DIRNAMES = ("high", "middle", "low", "thumbnail")
+# セッションフォルダ名 capture_{日時}
+SESSION_DIRNAME = re.compile(r"^capture_(?P<stamp>\d{8}_\d{6})$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    session_dir TEXT NOT NULL UNIQUE,
+    blend_file TEXT,
+    blend_name TEXT,
+    started_at TEXT,
+    finished_at TEXT,
+    shot_count INTEGER DEFAULT 0,
+    seconds REAL,
+    focal_length REAL,
+    image_format TEXT,
+    settings TEXT
+);
+CREATE TABLE IF NOT EXISTS target_objects (
+    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    target TEXT NOT NULL,
+    object_name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shots (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    target TEXT NOT NULL,
+    shot_index INTEGER,
+    variant TEXT NOT NULL,
+    x_angle INTEGER,
+    z_angle INTEGER,
+    resolution_x INTEGER,
+    resolution_y INTEGER,
+    file TEXT NOT NULL,
+    bytes INTEGER,
+    content_hash TEXT,
+    status TEXT,
+    render_seconds REAL,
+    encode_seconds REAL
+);
+CREATE INDEX IF NOT EXISTS sessions_blend ON sessions(blend_name, started_at);
+CREATE INDEX IF NOT EXISTS target_objects_name ON target_objects(object_name, session_id, target);
+CREATE INDEX IF NOT EXISTS shots_angle ON shots(x_angle, z_angle, session_id);
+CREATE INDEX IF NOT EXISTS shots_session ON shots(session_id, target);
+CREATE INDEX IF NOT EXISTS shots_hash ON shots(content_hash);
+"""
+
+
+def file_digest(filepath: str) -> str:
+    """ファイルの内容のハッシュ(保存時の content_hash と同じ計算)"""
+    h = hashlib.blake2b(digest_size=20)
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ShotRecorder:
+    """撮影中のショットの記録を集めておくクラス
+
+    並列保存の各ワーカーから呼ばれるのでロックして追加し､対象の撮影が終わったら索引にまとめて書き込む｡
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = []
+
+    def add(self, shot, filepath: str, size: tuple[int, int], result=None, variant: str = ""):
+        """
+        Args:
+            shot: 撮影したショット
+            filepath: 保存した画像のパス
+            size: 画像の (幅, 高さ)
+            result: エンコードの結果(バイト数・ハッシュ・時間)｡None の場合はファイルから求める(再利用したショット)
+            variant: 派生画像のサブフォルダ名｡撮影画像は空文字
+        """
+        if result is None:
+            file_bytes, digest, encode_seconds = os.path.getsize(filepath), file_digest(filepath), 0.0
+        else:
+            file_bytes, digest, encode_seconds = result.bytes, result.digest, result.seconds
+        row = {
+            "shot_index": shot.index,
+            "variant": variant,
+            "x_angle": shot.x_angle,
+            "z_angle": shot.z_angle,
+            "resolution_x": size[0],
+            "resolution_y": size[1],
+            "file": filepath,
+            "bytes": file_bytes,
+            "content_hash": digest,
+            "status": "reused" if shot.reused else "rendered",
+            "render_seconds": getattr(shot, "render_seconds", None),
+            "encode_seconds": encode_seconds,
+        }
+        with self._lock:
+            self._rows.append(row)
+
+    def take(self) -> list[dict]:
+        """集めた記録を取り出して空にする"""
+        with self._lock:
+            rows, self._rows = self._rows, []
+        return rows
+
+
+class SessionIndex:
+    """保存フォルダの撮影セッションの索引
+
+    ファイルのパスは保存フォルダからの相対パスで記録するので､保存フォルダごと移動しても使える｡
+    """
+
+    def __init__(self, root_dir: str):
+        self.root_dir = os.path.abspath(root_dir)
+        self.path = os.path.join(self.root_dir, DB_FILENAME)
+        self._conn = None
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.root_dir, exist_ok=True)
+            # 複数の Blender から同じ保存フォルダに書き込む場合があるので､待ってから書き込む
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version not in (0, SCHEMA_VERSION):
+                conn.close()
+                raise RuntimeError(f"索引のバージョンが違います({version}): {self.path}")
+            with conn:
+                conn.executescript(SCHEMA)
+                conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # --- 書き込み ---
+
+    def begin_session(self, session_dir: str, blend_file: str, started_at: datetime.datetime,
+                      focal_length: float = None, image_format: str = None, settings: dict = None) -> int:
+        """セッションの行を作り(既にあればそのまま) id を返す"""
+        conn = self.connect()
+        blend_name = os.path.splitext(os.path.basename(blend_file))[0] if blend_file else None
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO sessions (session_dir, blend_file, blend_name, started_at, focal_length, image_format, settings)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self._relpath(session_dir), blend_file, blend_name, _timestamp(started_at), focal_length, image_format,
+                 json.dumps(settings, ensure_ascii=False, default=str) if settings is not None else None))
+        return conn.execute("SELECT id FROM sessions WHERE session_dir = ?", (self._relpath(session_dir),)).fetchone()[0]
+
+    def add_target(self, session_id: int, target: Optional[str], object_names: list[str], rows: list[dict]):
+        """1つの対象のオブジェクト名とショットをまとめて書き込む"""
+        conn = self.connect()
+        target = target or ""
+        with conn:
+            conn.executemany(
+                "INSERT INTO target_objects (session_id, target, object_name) VALUES (?, ?, ?)",
+                [(session_id, target, name) for name in dict.fromkeys(object_names)])
+            conn.executemany(
+                "INSERT INTO shots (session_id, target, shot_index, variant, x_angle, z_angle, resolution_x, resolution_y,"
+                " file, bytes, content_hash, status, render_seconds, encode_seconds)"
+                " VALUES (:session_id, :target, :shot_index, :variant, :x_angle, :z_angle, :resolution_x, :resolution_y,"
+                " :file, :bytes, :content_hash, :status, :render_seconds, :encode_seconds)",
+                [dict(row, session_id=session_id, target=target, file=self._relpath(row["file"])) for row in rows])
+
+    def finish_session(self, session_id: int, finished_at: datetime.datetime, shot_count: int, seconds: float):
+        conn = self.connect()
+        with conn:
+            conn.execute("UPDATE sessions SET finished_at = ?, shot_count = ?, seconds = ? WHERE id = ?",
+                         (_timestamp(finished_at), shot_count, seconds, session_id))
+
+    # --- 検索 ---
+
+    def find_shots(self, blend: str = None, object_name: str = None, x_angle: int = None, z_angle: int = None,
+                   since: str = None, until: str = None, variant: Optional[str] = "", limit: int = None) -> list[dict]:
+        """条件に合うショットを新しいセッション順に返す
+
+        Args:
+            blend: .blend ファイル名(拡張子なし)｡* ? のワイルドカードが使える
+            object_name: 対象に含まれるオブジェクト名｡ワイルドカードが使える
+            x_angle: 仰角
+            z_angle: 水平角
+            since: この日時以降のセッション(ISO形式｡'2026-07-01' など)
+            until: この日時より前のセッション
+            variant: 派生画像のサブフォルダ名｡撮影画像は空文字､None の場合はすべて
+            limit: 最大件数
+
+        Returns:
+            ショットの辞書のリスト｡file は絶対パス
+        """
+        where, params = [], []
+        if blend is not None:
+            where.append("s.blend_name GLOB ?")
+            params.append(blend)
+        if object_name is not None:
+            where.append("EXISTS (SELECT 1 FROM target_objects o WHERE o.session_id = sh.session_id"
+                         " AND o.target = sh.target AND o.object_name GLOB ?)")
+            params.append(object_name)
+        if x_angle is not None:
+            where.append("sh.x_angle = ?")
+            params.append(x_angle)
+        if z_angle is not None:
+            where.append("sh.z_angle = ?")
+            params.append(z_angle)
+        if since is not None:
+            where.append("s.started_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("s.started_at < ?")
+            params.append(until)
+        if variant is not None:
+            where.append("sh.variant = ?")
+            params.append(variant)
+
+        sql = ("SELECT sh.*, s.session_dir, s.blend_file, s.blend_name, s.started_at, s.focal_length, s.image_format"
+               " FROM shots sh JOIN sessions s ON s.id = sh.session_id")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY s.started_at DESC, sh.target, sh.shot_index"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+
+        rows = []
+        for row in self.connect().execute(sql, params):
+            row = dict(row)
+            row["file"] = os.path.join(self.root_dir, row["file"])
+            row["session_dir"] = os.path.join(self.root_dir, row["session_dir"])
+            rows.append(row)
+        return rows
+
+    def list_sessions(self, blend: str = None, since: str = None, until: str = None) -> list[dict]:
+        """セッションを新しい順に返す"""
+        where, params = [], []
+        if blend is not None:
+            where.append("blend_name GLOB ?")
+            params.append(blend)
+        if since is not None:
+            where.append("started_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("started_at < ?")
+            params.append(until)
+        sql = "SELECT id, session_dir, blend_file, blend_name, started_at, finished_at, shot_count, seconds FROM sessions"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY started_at DESC"
+        rows = []
+        for row in self.connect().execute(sql, params):
+            row = dict(row)
+            row["session_dir"] = os.path.join(self.root_dir, row["session_dir"])
+            rows.append(row)
+        return rows
+
+    # --- 過去のセッションの取り込み ---
+
+    def rebuild(self) -> int:
+        """索引に載っていないセッションフォルダをファイル名から取り込む
+
+        オブジェクト名や時間はファイル名からわからないので記録しない｡
+
+        Returns:
+            取り込んだセッションの数
+        """
+        conn = self.connect()
+        known = {row[0] for row in conn.execute("SELECT session_dir FROM sessions")}
+        added = 0
+        for session_dir in sorted(glob.glob(os.path.join(self.root_dir, "capture_*"))):
+            match = SESSION_DIRNAME.match(os.path.basename(session_dir))
+            if not match or not os.path.isdir(session_dir) or self._relpath(session_dir) in known:
+                continue
+
+            shots = {}
+            for dirpath, _, filenames in os.walk(session_dir):
+                for filename in filenames:
+                    parsed = SHOT_FILENAME.match(filename)
+                    if parsed:
+                        shots.setdefault(os.path.relpath(dirpath, session_dir), []).append((parsed, os.path.join(dirpath, filename)))
+            if not shots:
+                continue
+
+            started_at = datetime.datetime.strptime(match.group("stamp"), "%Y%m%d_%H%M%S")
+            blend_name = next(iter(shots.values()))[0][0].group("blend")
+            session_id = self.begin_session(session_dir, blend_name + ".blend", started_at)
+            for folder, entries in shots.items():
+                # サブフォルダは対象ごとのフォルダか派生画像のフォルダ
+                target, variant = ("" if folder == "." else folder), ""
+                if os.path.basename(target) in VARIANT_DIRNAMES:
+                    target, variant = os.path.dirname(target), os.path.basename(target)
+                rows = []
+                for parsed, filepath in entries:
+                    rows.append({
+                        "shot_index": int(parsed.group("index")),
+                        "variant": variant,
+                        "x_angle": int(parsed.group("x")),
+                        "z_angle": int(parsed.group("z")),
+                        "resolution_x": None,
+                        "resolution_y": None,
+                        "file": filepath,
+                        "bytes": os.path.getsize(filepath),
+                        "content_hash": file_digest(filepath),
+                        "status": "rendered",
+                        "render_seconds": None,
+                        "encode_seconds": None,
+                    })
+                self.add_target(session_id, target, [], rows)
+            conn.execute("UPDATE sessions SET shot_count = (SELECT COUNT(*) FROM shots WHERE session_id = ? AND variant = '') WHERE id = ?",
+                         (session_id, session_id))
+            conn.commit()
+            added += 1
+        return added
+
+    def _relpath(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), self.root_dir)
+
+
+def _timestamp(value: Optional[datetime.datetime]) -> Optional[str]:
+    return value.isoformat(sep=" ", timespec="seconds") if value else None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", help="保存フォルダ(capture_* フォルダの親)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    query = commands.add_parser("query", help="ショットを探す")
+    query.add_argument("--blend", help=".blend ファイル名(拡張子なし､ワイルドカード可)")
+    query.add_argument("--object", dest="object_name", help="オブジェクト名(ワイルドカード可)")
+    query.add_argument("--x", dest="x_angle", type=int, help="仰角")
+    query.add_argument("--z", dest="z_angle", type=int, help="水平角")
+    query.add_argument("--since", help="この日時以降(例: 2026-07-01)")
+    query.add_argument("--until", help="この日時より前")
+    query.add_argument("--variant", default="", help="派生画像のフォルダ名(low､thumbnail など)｡'*' ですべて")
+    query.add_argument("--limit", type=int)
+    query.add_argument("--json", action="store_true", help="JSONで出力する")
+
+    sessions = commands.add_parser("sessions", help="セッションの一覧")
+    sessions.add_argument("--blend")
+    sessions.add_argument("--since")
+    sessions.add_argument("--until")
+
+    commands.add_parser("rebuild", help="索引のない過去のセッションをファイル名から取り込む")
+
+    args = parser.parse_args(argv)
+    if args.command != "rebuild" and not os.path.isfile(os.path.join(args.root, DB_FILENAME)):
+        print(f"索引がありません: {os.path.join(args.root, DB_FILENAME)}", file=sys.stderr)
+        return 1
+
+    with SessionIndex(args.root) as index:
+        if args.command == "query":
+            shots = index.find_shots(blend=args.blend, object_name=args.object_name, x_angle=args.x_angle,
+                                     z_angle=args.z_angle, since=args.since, until=args.until,
+                                     variant=None if args.variant == "*" else args.variant, limit=args.limit)
+            if args.json:
+                print(json.dumps(shots, ensure_ascii=False, indent=1))
+            else:
+                for shot in shots:
+                    print(f"{shot['started_at']}  x{shot['x_angle']:+03d} z{shot['z_angle']:03d}  {shot['file']}")
+                print(f"{len(shots)} shots", file=sys.stderr)
+        elif args.command == "sessions":
+            for session in index.list_sessions(blend=args.blend, since=args.since, until=args.until):
+                print(f"{session['started_at']}  {session['shot_count']:>5} shots  {session['blend_name']}  {session['session_dir']}")
+        else:
+            print(f"imported {index.rebuild()} sessions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import os
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+from PIL import Image
+
+from ..core.watermark import Watermark
+from ..core.image_store import ImageStore
+from ..core.derivatives import DerivativeChain
+from ..core.encoders import ImageEncoder
+from ..core.session_db import ShotRecorder
+from ..core.profiler import SessionProfiler
+
+
+@dataclass
+class Shot:
+    """撮影した1枚分の情報
+
+    Attributes:
+        index: ショット番号
+        x_angle: 仰角
+        z_angle: 水平角
+        filepath: 保存先のパス
+        pixels: メモリ上の画素 (高さ, 幅, 4)｡Noneの場合は render_path に書き出し済み
+        reused: 過去のセッションの画像を再利用したか(書き込み・保存は不要)
+        render_path: 画素を読み込めない場合にレンダリングで書き出した中間ファイル(保存後に削除する)
+        render_seconds: 撮影(描画と読み込み)にかかった時間
+        source: 再利用した過去のセッションの画像
+    """
+    index: int
+    x_angle: int
+    z_angle: int
+    filepath: str
+    pixels: Optional[np.ndarray] = None
+    reused: bool = False
+    render_path: Optional[str] = None
+    render_seconds: float = 0.0
+    source: Optional[str] = None
+
+
+class ShotWriter:
+    """撮影画像に情報を書き込み､ファイルに保存するクラス
+
+    画素がメモリ上にある場合は合成もメモリ上で行い､エンコードは保存時の1回だけにする｡
+    一覧画像などの追加の出力(sinks)には合成後の画像を add(shot, img) で渡す｡
+    before_watermark が True の出力には情報を書き込む前の画像を渡す｡
+    低い画質の画像(derivatives)は合成前の画像から作り､それぞれの大きさで情報を書き込む｡
+    """
+
+    def __init__(self, watermark: Watermark, store: Optional[ImageStore] = None, sinks: Sequence = (), save_stills: bool = True,
+                 derivatives: Optional[DerivativeChain] = None, encoder: Optional[ImageEncoder] = None,
+                 recorder: Optional[ShotRecorder] = None, profiler: Optional[SessionProfiler] = None):
+        """
+        Args:
+            watermark: 情報の書き込みに使う Watermark
+            store: 画像をハッシュで重複排除して保存する場合のストア
+            sinks: 合成後の画像を受け取る追加の出力
+            save_stills: 1枚ずつの画像を保存するか｡False の場合は追加の出力にだけ渡す
+            derivatives: 情報を書き込む前の画像から低い画質の画像とサムネイルを作る場合に使用
+            encoder: 保存形式｡省略時は watermark の設定から作る
+            recorder: 保存した画像をセッションの索引に記録する場合に使用
+            profiler: 書き込み・保存の区間の時間を記録する場合に使用
+        """
+        self.watermark = watermark
+        self.store = store
+        self.sinks = sinks
+        self.save_stills = save_stills
+        self.derivatives = derivatives
+        self.encoder = encoder or ImageEncoder(watermark.settings)
+        self.recorder = recorder
+        self.profiler = profiler or SessionProfiler()
+
+    def write(self, shot: Shot) -> str:
+        with self.profiler.span("write", index=shot.index):
+            return self._write(shot)
+
+    def _write(self, shot: Shot) -> str:
+        profiler = self.profiler
+        if shot.reused:
+            size = self._emit_file(shot)
+            if self.recorder and self.save_stills:
+                self.recorder.add(shot, shot.filepath, size)
+            return shot.filepath
+
+        if shot.pixels is None:
+            # レンダリング時に書き出した中間ファイルを読み込み､以降はメモリ上で合成する
+            with profiler.span("load_render"):
+                with Image.open(shot.render_path) as img:
+                    img = img.convert("RGBA")
+                os.remove(shot.render_path)
+        else:
+            img = Image.fromarray(shot.pixels)
+
+        # 派生画像などは情報を書き込む前の画像から作る(compose は img に直接書き込む)
+        if self.derivatives:
+            with profiler.span("derivatives"):
+                self.derivatives.write(shot, img, self.encoder, self.store, self.recorder)
+        for sink in self.sinks:
+            if getattr(sink, "before_watermark", False):
+                with profiler.span(type(sink).__name__):
+                    sink.add(shot, img)
+
+        # エンコードは最後の保存の1回だけ
+        with profiler.span("watermark"):
+            img = self.watermark.compose(img, orbit_angle=shot.z_angle, elevation_angle=shot.x_angle)
+        if self.save_stills:
+            with profiler.span("encode", format=self.encoder.label):
+                result = self.encoder.save(img, shot.filepath, self.store)
+            if self.recorder:
+                self.recorder.add(shot, shot.filepath, img.size, result)
+        for sink in self.sinks:
+            if not getattr(sink, "before_watermark", False):
+                with profiler.span(type(sink).__name__):
+                    sink.add(shot, img)
+        return shot.filepath
+
+    def _emit_file(self, shot: Shot) -> tuple[int, int]:
+        """保存済みの画像を読み込んで追加の出力に渡す
+
+        Returns:
+            画像の (幅, 高さ)
+        """
+        with Image.open(shot.filepath) as img:
+            if not self.sinks:
+                return img.size
+            img.load()
+            for sink in self.sinks:
+                sink.add(shot, img)
+            return img.size
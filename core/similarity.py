@@ -0,0 +1,275 @@
+"""ショットの知覚ハッシュと縮小画像による､セッション間の変化の比較
+
+撮影時に各ショットの知覚ハッシュ(DCTハッシュ 64bit)と縮小画像を求め､
+保存先フォルダの orbitsnap_similarity.npz にまとめて書き出す｡
+比較ではフル解像度の画像は読まずに､この縮小画像だけで差分を求める｡
+
+    python core/similarity.py compare <前のセッション> <後のセッション> --out diff --threshold 0.01
+
+同じ対象・同じ角度のショットを対応させて変化の大きい順に並べ､しきい値を超えたショットだけ
+差分のヒートマップ(前 | 後 | 差分)を書き出す｡
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+from PIL import Image
+
+SIMILARITY_FILENAME = "orbitsnap_similarity.npz"
+
+# 比較用の縮小画像の幅
+PREVIEW_WIDTH = 256
+# 知覚ハッシュを求める縮小画像の大きさと､使う低周波成分の大きさ
+HASH_IMAGE_SIZE = 32
+HASH_SIZE = 8
+# 変化したとみなす画素の差(0-255)｡縮小やエンコードによる小さな揺れは無視する
+PIXEL_TOLERANCE = 24
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT = _dct_matrix(HASH_IMAGE_SIZE)
+
+
+def perceptual_hash(img: Image.Image) -> int:
+    """DCTの低周波成分が中央値より大きいかどうかの 64bit ハッシュ"""
+    gray = np.asarray(img.convert("L").resize((HASH_IMAGE_SIZE, HASH_IMAGE_SIZE), Image.Resampling.BOX), dtype=np.float64)
+    low = (_DCT @ gray @ _DCT.T)[:HASH_SIZE, :HASH_SIZE].ravel()
+    # 直流成分(明るさの平均)は中央値の計算に含めない
+    bits = low > np.median(low[1:])
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming_distance(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """64bit ハッシュの配列どうしの異なるビット数"""
+    x = np.bitwise_xor(a.astype(np.uint64), b.astype(np.uint64))
+    return np.unpackbits(x.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def make_preview(img: Image.Image, width: int = PREVIEW_WIDTH) -> np.ndarray:
+    """比較用の縮小画像 (高さ, 幅, 3)｡透明な部分は黒にする"""
+    height = max(1, round(img.height * width / img.width))
+    small = img.convert("RGBA").resize((width, height), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    pixels = np.asarray(small, dtype=np.uint16)
+    rgb = pixels[..., :3] * pixels[..., 3:] // 255
+    return rgb.astype(np.uint8)
+
+
+class SimilarityIndex:
+    """撮影したショットの知覚ハッシュと縮小画像を集め､保存先フォルダに書き出すクラス
+
+    一覧画像などと同じ追加の出力(sink)として使う｡before_watermark が True なので､
+    情報を書き込む前の画像を受け取る(撮影日時などの文字で差分が出ないようにする)｡
+    前回の画像を再利用したショットは､前回のセッションに書き出した値を使う｡
+    """
+
+    before_watermark = True
+
+    def __init__(self, save_dir: str):
+        self.save_dir = save_dir
+        self._lock = threading.Lock()
+        self._entries = {} # ショット番号 -> (ファイル名, 仰角, 水平角, ハッシュ, 縮小画像)
+        self._previous = {} # 前回のセッションのフォルダ -> {ファイル名: (ハッシュ, 縮小画像)}
+
+    def add(self, shot, img: Image.Image):
+        entry = self._reused_entry(shot) if shot.reused else None
+        if entry is None:
+            entry = (perceptual_hash(img), make_preview(img))
+        with self._lock:
+            self._entries[shot.index] = (os.path.basename(shot.filepath), shot.x_angle, shot.z_angle) + entry
+
+    def close(self):
+        with self._lock:
+            entries = [self._entries[i] for i in sorted(self._entries)]
+            self._entries = {}
+        if not entries:
+            return
+        previews = [entry[4] for entry in entries]
+        if len({p.shape for p in previews}) > 1:
+            # 解像度が混ざることはないが､念のため最初の大きさにそろえる
+            h, w = previews[0].shape[:2]
+            previews = [p if p.shape == previews[0].shape else np.asarray(Image.fromarray(p).resize((w, h))) for p in previews]
+        np.savez_compressed(
+            os.path.join(self.save_dir, SIMILARITY_FILENAME),
+            files=np.array([entry[0] for entry in entries]),
+            x_angles=np.array([entry[1] for entry in entries], dtype=np.int32),
+            z_angles=np.array([entry[2] for entry in entries], dtype=np.int32),
+            hashes=np.array([entry[3] for entry in entries], dtype=np.uint64),
+            previews=np.stack(previews),
+        )
+
+    def _reused_entry(self, shot):
+        source = getattr(shot, "source", None)
+        if not source:
+            return None
+        folder = os.path.dirname(source)
+        with self._lock:
+            previous = self._previous.get(folder)
+        if previous is None:
+            data = load_similarity(folder)
+            previous = {} if data is None else {
+                name: (int(h), preview) for name, h, preview in zip(data["files"], data["hashes"], data["previews"])}
+            with self._lock:
+                self._previous[folder] = previous
+        return previous.get(os.path.basename(source))
+
+
+def load_similarity(folder: str) -> dict:
+    """フォルダの orbitsnap_similarity.npz を読み込む｡ない場合は None"""
+    path = os.path.join(folder, SIMILARITY_FILENAME)
+    if not os.path.isfile(path):
+        return None
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+
+def load_session(session_dir: str) -> dict:
+    """セッションフォルダ(対象ごとのサブフォルダを含む)の 対象 -> データ"""
+    session = {}
+    for dirpath, _, filenames in os.walk(session_dir):
+        if SIMILARITY_FILENAME in filenames:
+            target = os.path.relpath(dirpath, session_dir)
+            session["" if target == "." else target] = load_similarity(dirpath)
+    return session
+
+
+def compare_sessions(before_dir: str, after_dir: str) -> dict:
+    """2つのセッションの同じ対象・同じ角度のショットを対応させ､変化の大きい順に並べる
+
+    変化量は縮小画像で変化した画素の割合(0-1)｡全ショットを1回の配列演算で求める｡
+
+    Returns:
+        {"changes": [...], "added": [...], "removed": [...], "pairs": (前の縮小画像, 後の縮小画像)}
+    """
+    before = load_session(before_dir)
+    after = load_session(after_dir)
+
+    keys_a, keys_b, previews_a, previews_b, hashes_a, hashes_b = [], [], [], [], [], []
+    added, removed = [], []
+    for target in sorted(set(before) | set(after)):
+        a = before.get(target)
+        b = after.get(target)
+        index_a = {} if a is None else {(int(x), int(z)): i for i, (x, z) in enumerate(zip(a["x_angles"], a["z_angles"]))}
+        index_b = {} if b is None else {(int(x), int(z)): i for i, (x, z) in enumerate(zip(b["x_angles"], b["z_angles"]))}
+        for angle in sorted(set(index_a) | set(index_b)):
+            if angle not in index_a:
+                added.append({"target": target, "x_angle": angle[0], "z_angle": angle[1], "file": str(b["files"][index_b[angle]])})
+                continue
+            if angle not in index_b:
+                removed.append({"target": target, "x_angle": angle[0], "z_angle": angle[1], "file": str(a["files"][index_a[angle]])})
+                continue
+            i, j = index_a[angle], index_b[angle]
+            keys_a.append((target, angle, str(a["files"][i])))
+            keys_b.append(str(b["files"][j]))
+            previews_a.append(a["previews"][i])
+            previews_b.append(b["previews"][j])
+            hashes_a.append(a["hashes"][i])
+            hashes_b.append(b["hashes"][j])
+
+    changes = []
+    pair_a = pair_b = None
+    if keys_a:
+        distances = hamming_distance(np.array(hashes_a), np.array(hashes_b))
+        shape = previews_a[0].shape
+        if all(p.shape == shape for p in previews_a + previews_b):
+            pair_a = np.stack(previews_a)
+            pair_b = np.stack(previews_b)
+            diff = np.abs(pair_a.astype(np.int16) - pair_b.astype(np.int16)).max(axis=3)
+            scores = (diff > PIXEL_TOLERANCE).mean(axis=(1, 2))
+            mean_diffs = diff.mean(axis=(1, 2)) / 255.0
+        else:
+            # 解像度の違うセッションどうしはハッシュだけで比べる
+            scores = mean_diffs = distances / 64.0
+        for n, ((target, (x_angle, z_angle), file_a), file_b) in enumerate(zip(keys_a, keys_b)):
+            changes.append({
+                "target": target,
+                "x_angle": x_angle,
+                "z_angle": z_angle,
+                "before": file_a,
+                "after": file_b,
+                "change": float(scores[n]),
+                "mean_diff": float(mean_diffs[n]),
+                "hash_distance": int(distances[n]),
+                "pair": n,
+            })
+        changes.sort(key=lambda c: c["change"], reverse=True)
+
+    return {"changes": changes, "added": added, "removed": removed, "pairs": (pair_a, pair_b)}
+
+
+def heatmap(before: np.ndarray, after: np.ndarray) -> np.ndarray:
+    """前 | 後 | 差分 を横に並べた画像 (高さ, 幅*3, 3)｡差分は変化の大きいところほど赤く明るい"""
+    diff = np.abs(before.astype(np.int16) - after.astype(np.int16)).max(axis=2).astype(np.float32) / 255.0
+    gray = after.mean(axis=2, dtype=np.float32) * 0.35
+    heat = np.empty(after.shape, dtype=np.float32)
+    heat[..., 0] = gray + diff * 255.0
+    heat[..., 1] = gray * (1.0 - diff) + np.clip(diff * 2.0 - 1.0, 0.0, 1.0) * 255.0
+    heat[..., 2] = gray * (1.0 - diff)
+    return np.concatenate([before, after, np.clip(heat, 0, 255).astype(np.uint8)], axis=1)
+
+
+def write_heatmaps(result: dict, out_dir: str, threshold: float) -> list[str]:
+    """しきい値を超えたショットだけ差分のヒートマップを書き出す"""
+    pair_a, pair_b = result["pairs"]
+    if pair_a is None:
+        return []
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for change in result["changes"]:
+        if change["change"] < threshold:
+            break
+        prefix = change["target"].replace(os.sep, "_") + "_" if change["target"] else ""
+        filename = f"{prefix}diff_x{change['x_angle']:+03d}_z{change['z_angle']:03d}.png"
+        n = change["pair"]
+        Image.fromarray(heatmap(pair_a[n], pair_b[n])).save(os.path.join(out_dir, filename), compress_level=1)
+        change["heatmap"] = filename
+        written.append(filename)
+    return written
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    compare = commands.add_parser("compare", help="2つのセッションを比較する")
+    compare.add_argument("before", help="前のセッションフォルダ")
+    compare.add_argument("after", help="後のセッションフォルダ")
+    compare.add_argument("--out", help="ヒートマップと結果(compare.json)の書き出し先")
+    compare.add_argument("--threshold", type=float, default=0.01, help="ヒートマップを書き出す変化量(変化した画素の割合 0-1)")
+    compare.add_argument("--top", type=int, default=20, help="表示する件数")
+    args = parser.parse_args(argv)
+
+    result = compare_sessions(args.before, args.after)
+    if not result["changes"] and not result["added"] and not result["removed"]:
+        print(f"{SIMILARITY_FILENAME} がありません", file=sys.stderr)
+        return 1
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        written = write_heatmaps(result, args.out, args.threshold)
+        report = {key: result[key] for key in ("added", "removed")}
+        report["changes"] = [{k: v for k, v in c.items() if k != "pair"} for c in result["changes"]]
+        report["threshold"] = args.threshold
+        with open(os.path.join(args.out, "compare.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"{len(written)} heatmaps -> {args.out}")
+
+    print(f"{'change':>7} {'hash':>4}  view")
+    for change in result["changes"][:args.top]:
+        target = f"{change['target']}/" if change["target"] else ""
+        print(f"{change['change']:>7.3f} {change['hash_distance']:>4}  {target}x{change['x_angle']:+03d} z{change['z_angle']:03d}")
+    above = sum(c["change"] >= args.threshold for c in result["changes"])
+    print(f"{len(result['changes'])} matched, {above} changed (>= {args.threshold}), "
+          f"{len(result['added'])} added, {len(result['removed'])} removed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
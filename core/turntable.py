@@ -0,0 +1,283 @@
+import os
+import queue
+import struct
+import threading
+import zlib
+
+import numpy as np
+import PIL
+from PIL import Image
+
+from ..core.contact_sheet import PNG_SIGNATURE, filter_scanlines, write_png_chunk
+from ..core.shot_writer import Shot
+from ..properties.capture_settings import CaptureSettings
+
+# アニメーションの拡張子
+TURNTABLE_EXTENSIONS = {
+    'webp': ".webp",
+    'apng': ".png",
+}
+
+
+class StreamingAPNGWriter:
+    """1フレームずつ書き足していくAPNGライター(RGBA 8bit)
+
+    フレーム数は最初に決めておく必要がある(acTL)｡
+    """
+
+    def __init__(self, filepath: str, width: int, height: int, num_frames: int, fps: int, compress_level: int = 6):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.compress_level = compress_level
+        self.frames_written = 0
+        self._sequence = 0
+        self._file = open(filepath, "wb")
+        self._file.write(PNG_SIGNATURE)
+        write_png_chunk(self._file, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+        write_png_chunk(self._file, b"acTL", struct.pack(">II", num_frames, 0)) # 0: 無限ループ
+
+    def add_frame(self, pixels: np.ndarray):
+        """(高さ, 幅, 4) の uint8 配列を1フレームとして書き足す"""
+        # 前のフレームは残さず(dispose none)そのまま上書き(blend source)する
+        write_png_chunk(self._file, b"fcTL", struct.pack(
+            ">IIIIIHHBB", self._next_sequence(), self.width, self.height, 0, 0, 1, self.fps, 0, 0))
+        data = zlib.compress(filter_scanlines(pixels), self.compress_level)
+        if self.frames_written == 0:
+            write_png_chunk(self._file, b"IDAT", data)
+        else:
+            write_png_chunk(self._file, b"fdAT", struct.pack(">I", self._next_sequence()) + data)
+        self.frames_written += 1
+
+    def close(self):
+        if self._file is None:
+            return
+        write_png_chunk(self._file, b"IEND", b"")
+        self._file.close()
+        self._file = None
+
+    def _next_sequence(self) -> int:
+        sequence = self._sequence
+        self._sequence += 1
+        return sequence
+
+
+# _FrameFeed で1フレームずつ書き出すことを確認した Pillow のバージョン [以上, 未満)
+# 同梱の wheel(11.2.1)を含む｡範囲外では全フレームをそろえてから append_images で書き出す
+FRAME_FEED_PILLOW_VERSIONS = ((10, 1), (13, 0))
+
+
+def supports_frame_feed() -> bool:
+    """_FrameFeed が使う Pillow の内部属性(im･_mode･_size)がある確認済みのバージョンか"""
+    try:
+        version = tuple(int(part) for part in PIL.__version__.split(".")[:2])
+    except ValueError:
+        return False
+    low, high = FRAME_FEED_PILLOW_VERSIONS
+    return low <= version < high
+
+
+class _FrameFeed(Image.Image):
+    """Pillow の保存処理に1フレームずつ渡すための複数フレーム画像
+
+    アニメーションWebPの保存処理は全フレームを受け取ってから始まるが､
+    フレームを seek したときに読むので､seek で次のフレームが届くまで待たせる｡
+    Pillow の内部属性を書き換えるので､supports_frame_feed() の場合だけ使う｡
+    """
+
+    def __init__(self, first: Image.Image, num_frames: int, frames: queue.Queue):
+        super().__init__()
+        self.n_frames = num_frames
+        self._frames = frames
+        self._frame = 0
+        self._set_frame(first)
+
+    def _set_frame(self, img: Image.Image):
+        self.im = img.im
+        self._mode = img.mode
+        self._size = img.size
+
+    def tell(self) -> int:
+        return self._frame
+
+    def seek(self, frame: int):
+        # 保存の最後に最初のフレームに戻そうとするが､フレームは戻せないので無視する
+        if frame <= self._frame:
+            return
+        img = self._frames.get()
+        if img is None:
+            raise EOFError("アニメーションの書き出しを中止しました")
+        self._set_frame(img)
+        self._frame = frame
+
+
+class APNGRingEncoder:
+    def __init__(self, filepath: str, num_frames: int, fps: int):
+        self.filepath = filepath
+        self.num_frames = num_frames
+        self.fps = fps
+        self._writer = None
+
+    def add_frame(self, img: Image.Image):
+        if self._writer is None:
+            self._writer = StreamingAPNGWriter(self.filepath, img.width, img.height, self.num_frames, self.fps)
+        self._writer.add_frame(np.asarray(img))
+
+    def close(self):
+        if self._writer:
+            self._writer.close()
+
+    def abort(self):
+        if self._writer:
+            self._writer.close()
+            os.remove(self.filepath)
+
+
+class WebPRingEncoder:
+    """アニメーションWebPをワーカースレッドで1フレームずつエンコードする"""
+
+    def __init__(self, filepath: str, num_frames: int, fps: int, quality: int = 90):
+        self.filepath = filepath
+        self.num_frames = num_frames
+        self.duration = 1000 / fps
+        self.quality = quality
+        self._frames = queue.Queue(maxsize=1)
+        self._thread = None
+        self._error = None
+
+    def add_frame(self, img: Image.Image):
+        if self._thread is None:
+            feed = _FrameFeed(img, self.num_frames, self._frames)
+            self._thread = threading.Thread(target=self._encode, args=(feed,), daemon=True)
+            self._thread.start()
+            return
+
+        while True:
+            try:
+                self._frames.put(img, timeout=0.1)
+                return
+            except queue.Full:
+                # エンコードが失敗していたらフレームを受け取る側がいない
+                if not self._thread.is_alive():
+                    raise RuntimeError(f"アニメーションを書き出せませんでした: {self._error}")
+
+    def close(self):
+        if self._thread:
+            self._thread.join()
+            if self._error:
+                raise RuntimeError(f"アニメーションを書き出せませんでした: {self._error}")
+
+    def abort(self):
+        if self._thread is None:
+            return
+        if self._thread.is_alive():
+            self._frames.put(None)
+            self._thread.join()
+        if os.path.exists(self.filepath):
+            os.remove(self.filepath)
+
+    def _encode(self, feed: _FrameFeed):
+        try:
+            feed.save(self.filepath, format="WEBP", save_all=True,
+                      duration=self.duration, loop=0, quality=self.quality, method=4)
+        except Exception as e:
+            self._error = e
+
+
+class BufferedWebPRingEncoder:
+    """1周分のフレームをそろえてから append_images でアニメーションWebPを書き出す
+
+    Pillow の公開 API だけを使うが､1周分のフレームをメモリに持つ｡
+    _FrameFeed を確認していないバージョンの Pillow で使う｡
+    """
+
+    def __init__(self, filepath: str, num_frames: int, fps: int, quality: int = 90):
+        self.filepath = filepath
+        self.num_frames = num_frames
+        self.duration = 1000 / fps
+        self.quality = quality
+        self._frames = []
+
+    def add_frame(self, img: Image.Image):
+        self._frames.append(img)
+
+    def close(self):
+        if not self._frames:
+            return
+        first, *rest = self._frames
+        self._frames = []
+        try:
+            first.save(self.filepath, format="WEBP", save_all=True, append_images=rest,
+                       duration=self.duration, loop=0, quality=self.quality, method=4)
+        except Exception as e:
+            raise RuntimeError(f"アニメーションを書き出せませんでした: {e}") from e
+
+    def abort(self):
+        self._frames = []
+
+
+class Turntable:
+    """仰角ごとに1周分のショットをアニメーション(WebP / APNG)に書き出すクラス
+
+    フレームは撮影されたそばからエンコーダーに渡すので､全フレームをメモリに持たない｡
+    並列保存で順番が前後したショットだけ､前のショットが届くまで待たせる｡
+    撮影を中止して1周そろわなかった仰角のアニメーションは書き出さない｡
+    """
+
+    def __init__(self, save_dir: str, blend_name: str, settings: CaptureSettings):
+        self.format = settings.turntable_format
+        self.fps = settings.turntable_fps
+
+        # 仰角ごとの水平角の順番
+        self.rings = {}
+        for x_angle, z_angle in settings.shot_angle_list:
+            self.rings.setdefault(x_angle, []).append(z_angle)
+
+        ext = TURNTABLE_EXTENSIONS[self.format]
+        self.filepaths = {
+            x_angle: os.path.join(save_dir, f"{blend_name}_turntable_x{x_angle:+03d}{ext}")
+            for x_angle in self.rings
+        }
+
+        self._lock = threading.Lock()
+        self._encoders = {}
+        self._pending = {x_angle: {} for x_angle in self.rings} # 仰角 -> {フレーム番号: 画像}
+        self._next_frame = dict.fromkeys(self.rings, 0)
+
+    def add(self, shot: Shot, img: Image.Image):
+        ring = self.rings.get(shot.x_angle)
+        if ring is None or shot.z_angle not in ring:
+            return
+        frame = img.convert("RGBA") if img.mode != "RGBA" else img.copy()
+
+        with self._lock:
+            x_angle = shot.x_angle
+            self._pending[x_angle][ring.index(shot.z_angle)] = frame
+            encoder = self._encoders.get(x_angle)
+            if encoder is None:
+                encoder = self._encoders[x_angle] = self._create_encoder(x_angle)
+
+            pending = self._pending[x_angle]
+            while self._next_frame[x_angle] in pending:
+                encoder.add_frame(pending.pop(self._next_frame[x_angle]))
+                self._next_frame[x_angle] += 1
+
+            if self._next_frame[x_angle] == len(ring):
+                encoder.close()
+
+    def close(self):
+        with self._lock:
+            for x_angle, encoder in self._encoders.items():
+                if self._next_frame[x_angle] < len(self.rings[x_angle]):
+                    encoder.abort()
+            self._encoders = {}
+            self._pending = {x_angle: {} for x_angle in self.rings}
+
+    def _create_encoder(self, x_angle: int):
+        filepath = self.filepaths[x_angle]
+        num_frames = len(self.rings[x_angle])
+        if self.format == 'webp':
+            if supports_frame_feed():
+                return WebPRingEncoder(filepath, num_frames, self.fps)
+            return BufferedWebPRingEncoder(filepath, num_frames, self.fps)
+        return APNGRingEncoder(filepath, num_frames, self.fps)
@@ -0,0 +1,215 @@
+"""被覆率から撮影角度を決める視点計画
+
+1. 注視点を囲む球面上に候補視点を均等に並べる(フィボナッチ球)
+2. 評価後のメッシュ表面からサンプル点を取り､各候補から見えるかを BVHTree のレイキャストで調べる
+3. まだ見えていない面積を最も多く増やす候補を順に選び､目標の被覆率に達したら止める
+"""
+from dataclasses import dataclass, field
+
+import bpy
+import numpy as np
+from mathutils.bvhtree import BVHTree
+
+from ..core.framing import (
+    view_directions, camera_basis, fibonacci_directions, direction_angles,
+    effective_sensor_size, solve_view_distances,
+)
+from ..object.fingerprint import GEOMETRY_TYPES
+from ..properties.capture_settings import CaptureSettings
+
+# 可視判定に使う表面のサンプル数の上限
+MAX_SURFACE_SAMPLES = 2000
+# 面を斜めから見た場合の下限(法線と視線のなす角のcos)｡これより浅い角度では見えたとみなさない
+MIN_VIEW_COSINE = 0.2
+
+
+@dataclass
+class ViewPlan:
+    """視点計画の結果
+
+    Attributes:
+        shot_angle_list: 選んだ撮影角度リスト
+        coverage: 選んだ視点から見える表面積の割合
+        reachable: 全候補から見える表面積の割合(これ以上は被覆できない)
+        candidate_count: 候補視点の数
+        grid_coverage: 通常の撮影角度リスト(グリッド)での被覆率
+        grid_count: 通常の撮影角度リストの枚数
+    """
+    shot_angle_list: list[list[int]] = field(default_factory=list)
+    coverage: float = 0.0
+    reachable: float = 0.0
+    candidate_count: int = 0
+    grid_coverage: float = 0.0
+    grid_count: int = 0
+
+    def summary(self) -> str:
+        return (f"被覆率 {self.coverage:.1%} ({len(self.shot_angle_list)}枚) / "
+                f"グリッド {self.grid_coverage:.1%} ({self.grid_count}枚)")
+
+
+def candidate_angles(count: int) -> list[list[int]]:
+    """フィボナッチ球の候補視点を撮影角度にする(整数に丸めて重なったものは除く)"""
+    angles = direction_angles(fibonacci_directions(count))
+    return [list(a) for a in dict.fromkeys(tuple(a) for a in angles)]
+
+
+def sample_surface(objects, max_samples: int = MAX_SURFACE_SAMPLES, seed: int = 0):
+    """評価後のメッシュからワールド座標の三角形を集め､可視判定用のサンプル点を取る
+
+    三角形が多い場合は面積に比例した確率で max_samples 個を選ぶ｡
+
+    Returns:
+        (points, normals, weights, bvh): サンプル点 (N, 3)､法線 (N, 3)､面積の重み (N,)､全三角形の BVHTree
+        ジオメトリがない場合は None
+    """
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    vertex_blocks = []
+    triangle_blocks = []
+    offset = 0
+    for obj in objects:
+        if obj.type not in GEOMETRY_TYPES:
+            continue
+        obj_eval = obj.evaluated_get(depsgraph)
+        mesh = obj_eval.to_mesh()
+        try:
+            if mesh is None or len(mesh.polygons) == 0:
+                continue
+            mesh.calc_loop_triangles()
+            coords = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+            mesh.vertices.foreach_get("co", coords)
+            triangles = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+            mesh.loop_triangles.foreach_get("vertices", triangles)
+        finally:
+            obj_eval.to_mesh_clear()
+
+        matrix = np.array(obj_eval.matrix_world, dtype=np.float64)
+        world = coords.reshape(-1, 3).astype(np.float64) @ matrix[:3, :3].T + matrix[:3, 3]
+        vertex_blocks.append(world)
+        triangle_blocks.append(triangles.reshape(-1, 3) + offset)
+        offset += len(world)
+
+    if not vertex_blocks:
+        return None
+
+    vertices = np.vstack(vertex_blocks)
+    triangles = np.vstack(triangle_blocks)
+    a, b, c = (vertices[triangles[:, i]] for i in range(3))
+    cross = np.cross(b - a, c - a)
+    areas = np.linalg.norm(cross, axis=1) * 0.5
+    valid = areas > 0
+    if not valid.any():
+        return None
+
+    index = np.flatnonzero(valid)
+    if len(index) > max_samples:
+        rng = np.random.default_rng(seed)
+        index = rng.choice(index, size=max_samples, replace=False, p=areas[index] / areas[index].sum())
+        weights = np.ones(len(index))
+    else:
+        weights = areas[index]
+
+    points = (a[index] + b[index] + c[index]) / 3.0
+    normals = cross[index] / (areas[index, None] * 2.0)
+    bvh = BVHTree.FromPolygons(vertices.tolist(), triangles.tolist(), all_triangles=True)
+    return points, normals, weights, bvh
+
+
+def visibility_matrix(points, normals, bvh, center, directions, distance, tan_x, tan_y) -> np.ndarray:
+    """各視点からどのサンプル点が見えるか (視点数, サンプル数)
+
+    画角の外と裏向き(または浅い角度)の点は numpy でまとめて除き､残った点だけをレイキャストで遮蔽判定する｡
+    """
+    directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+    cameras = np.asarray(center, dtype=np.float64) + directions * distance
+    right, up = camera_basis(directions)
+
+    extent = points.max(axis=0) - points.min(axis=0)
+    eps = max(float(np.linalg.norm(extent)), 1e-6) * 1e-5
+
+    visible = np.zeros((len(directions), len(points)), dtype=bool)
+    for m, camera in enumerate(cameras):
+        to_camera = camera - points
+        lengths = np.linalg.norm(to_camera, axis=1)
+        depth = to_camera @ directions[m]
+        x = np.abs(to_camera @ right[m])
+        y = np.abs(to_camera @ up[m])
+        candidates = np.flatnonzero(
+            (np.einsum("ij,ij->i", normals, to_camera) > lengths * MIN_VIEW_COSINE)
+            & (depth > 0) & (x <= depth * tan_x) & (y <= depth * tan_y)
+        )
+        rays = to_camera[candidates] / lengths[candidates, None]
+        origins = points[candidates] + rays * eps
+        for i, origin, ray, length in zip(candidates.tolist(), origins.tolist(), rays.tolist(), lengths[candidates].tolist()):
+            if bvh.ray_cast(origin, ray, length - eps)[0] is None:
+                visible[m, i] = True
+    return visible
+
+
+def greedy_cover(visible: np.ndarray, weights: np.ndarray, target: float):
+    """見える面積が最も増える視点を順に選ぶ
+
+    目標の被覆率は全候補から見える面積に対する割合とする｡
+
+    Returns:
+        (選んだ視点の番号のリスト, 被覆した重みの合計)
+    """
+    reachable = weights[visible.any(axis=0)].sum()
+    covered = np.zeros(visible.shape[1], dtype=bool)
+    covered_weight = 0.0
+    chosen = []
+    while covered_weight < target * reachable - 1e-12:
+        remaining = ~covered
+        gains = visible[:, remaining].astype(np.float64) @ weights[remaining]
+        best = int(np.argmax(gains))
+        if gains[best] <= 0:
+            break
+        chosen.append(best)
+        covered |= visible[best]
+        covered_weight = weights[covered].sum()
+    return chosen, covered_weight
+
+
+def plan_views(objects, corners: np.ndarray, center: np.ndarray, settings: CaptureSettings) -> ViewPlan:
+    """被覆率が目標に達する最小限の撮影角度を選ぶ
+
+    Args:
+        objects: 可視判定に使うオブジェクト
+        corners: 画角の計算に使う頂点群 (N, 3)
+        center: 注視点
+        settings: 設定｡shot_angle_list は比較用のグリッドとして使う
+    """
+    samples = sample_surface(objects)
+    if samples is None:
+        raise ValueError("視点計画にはメッシュを持つオブジェクトが必要です")
+    points, normals, weights, bvh = samples
+
+    candidates = candidate_angles(settings.plan_candidates)
+    grid = [list(a) for a in settings.shot_angle_list]
+    directions = view_directions(candidates + grid)
+
+    sensor_width, sensor_height = effective_sensor_size(
+        settings.sensor_width, settings.resolution_x, settings.resolution_y)
+    _, distance = solve_view_distances(
+        corners, center, directions, sensor_width, sensor_height,
+        settings.focal_length, settings.margin_scale)
+    tan_x = sensor_width / (2 * settings.focal_length)
+    tan_y = sensor_height / (2 * settings.focal_length)
+
+    visible = visibility_matrix(points, normals, bvh, center, directions, distance, tan_x, tan_y)
+    candidate_visible = visible[:len(candidates)]
+    grid_visible = visible[len(candidates):]
+
+    total = weights.sum()
+    chosen, covered = greedy_cover(candidate_visible, weights, settings.target_coverage)
+    if not chosen:
+        chosen = [0]
+        covered = weights[candidate_visible[0]].sum()
+
+    return ViewPlan(
+        shot_angle_list=sorted(candidates[i] for i in chosen),
+        coverage=float(covered / total),
+        reachable=float(weights[candidate_visible.any(axis=0)].sum() / total),
+        candidate_count=len(candidates),
+        grid_coverage=float(weights[grid_visible.any(axis=0)].sum() / total) if grid else 0.0,
+        grid_count=len(grid),
+    )
@@ -1,11 +1,30 @@
-﻿import bpy
-from ..properties.capture_settings import CaptureSettings
+﻿import math
+import threading
+import bpy
+from ..properties.capture_settings import CaptureSettings, QUALITY_RESOLUTIONS
 from ..utils.utils import get_font_path
 
 
 from PIL import Image, ImageDraw, ImageFont
 
 
+# (フォントパス, サイズ) -> ImageFont｡撮影のたびにフォントを読み込まないようにスレッドごとにキャッシュする
+# (FreeTypeFont は FreeType の FT_Face を1つ持ち､FreeType の face は複数スレッドから同時に使えないため､
+#  並列保存のワーカーどうしでは共有しない)
+_font_cache = threading.local()
+
+
+def get_font(font_path: str, font_size: int) -> ImageFont.FreeTypeFont:
+    cache = getattr(_font_cache, "fonts", None)
+    if cache is None:
+        cache = _font_cache.fonts = {}
+    key = (font_path, font_size)
+    font = cache.get(key)
+    if font is None:
+        font = cache[key] = ImageFont.truetype(font_path, font_size)
+    return font
+
+
 class Watermark:
     settings: CaptureSettings
     font: ImageFont
@@ -15,6 +34,7 @@ class Watermark:
     outline_color = (0, 0, 0, 200)
     fill_color = (255, 255, 255, 200)
     font_size = 32
+    line_gap = 4 # 行間(multiline_text の spacing と同じ)
 
     QUALITY_PRESETS = {
         "high": {"font_size": 32, "x": 24, "y": 12, "stroke_width": 2},
@@ -26,14 +46,34 @@ class Watermark:
         self.settings = settings
 
         preset = self.QUALITY_PRESETS.get(settings.quality, self.QUALITY_PRESETS["middle"])
-        self.font_size = preset["font_size"]
-        self.x = preset["x"]
-        self.y = preset["y"]
+        # 確認用に縮小した解像度(Cycles のプレビュー･派生画像)では､画質の解像度に対する割合で小さくする
+        scale = self.preset_scale(settings)
+        self.font_size = max(1, round(preset["font_size"] * scale))
+        self.x = round(preset["x"] * scale)
+        self.y = round(preset["y"] * scale)
         self.stroke_width = preset["stroke_width"]
+        if scale < 1.0:
+            # 縮小した縁取りと行間は整数にする(行の位置が小数になってずれないように)
+            self.stroke_width = max(1, round(self.stroke_width * scale))
+            self.line_gap = max(1, round(self.line_gap * scale))
 
         # フォントパス
         font_path = get_font_path()
-        self.font = ImageFont.truetype(font_path, self.font_size)
+        self.font = get_font(font_path, self.font_size)
+
+        # 1行の高さ(multiline_text と同じ計算)
+        self.line_height = self.font.getbbox("A", stroke_width=self.stroke_width)[3] + self.stroke_width + self.line_gap
+
+        # 撮影ごとに変わらない行はセッション中に1度だけ描画する
+        self._static_block = None
+
+    @staticmethod
+    def preset_scale(settings: CaptureSettings) -> float:
+        """画質の解像度に対する実際の横解像度の割合(1 を超えない)"""
+        quality_width = QUALITY_RESOLUTIONS.get(settings.quality, QUALITY_RESOLUTIONS['middle'])[0]
+        if not settings.resolution_x:
+            return 1.0
+        return min(1.0, settings.resolution_x / quality_width)
 
     def draw(self, filepath:str, orbit_angle:int, elevation_angle:int):
         """_summary_
@@ -46,47 +86,130 @@ class Watermark:
             水平角と仰角以外はどのショットでも固定なので設定から取得｡
             水平角と仰角は引数で渡す｡
         """
-        # 書き込みテキストの作成
-        text = self.generate_text(orbit_angle, elevation_angle)
-
-        if not text:
+        if not self.generate_lines(orbit_angle, elevation_angle):
             return
 
-        # --- Pillowでテキスト描き込み ---
         # 画像を開く
         try:
             img = Image.open(filepath).convert("RGBA")
         except FileNotFoundError as e:
             raise e
 
-        # 透明レイヤーを作成
-        txt_layer = Image.new("RGBA", img.size, (255,255,255,0))
-        draw = ImageDraw.Draw(txt_layer)
+        # 保存
+        self.compose(img, orbit_angle, elevation_angle).save(filepath)
 
-        # --- 縁取りを描く ---
-        draw.multiline_text((self.x, self.y), text, font=self.font, fill=self.fill_color, stroke_width=self.stroke_width, stroke_fill=self.outline_color)
+    def compose(self, img: Image.Image, orbit_angle: int, elevation_angle: int) -> Image.Image:
+        """メモリ上の画像(RGBA)に情報を書き込んだ画像を返す
 
-        # レイヤー合成
-        combined = Image.alpha_composite(img, txt_layer)
+        全面の透明レイヤーは作らず､テキストの範囲だけを描画して合成する｡
 
-        # 保存
-        combined.save(filepath)
+        Args:
+            img (Image.Image): 書き込み先の画像
+            orbit_angle (int):水平角
+            elevation_angle (int): 仰角
+        """
+        lines = self.generate_lines(orbit_angle, elevation_angle)
 
+        if not lines:
+            return img
 
-    def generate_text(self, orbit_angle: int, elevation_angle: int) -> str:
+        block, (left, top) = self.render_block(lines)
+
+        # 画像からはみ出す部分は合成しない
+        src_left = max(0, -left)
+        src_top = max(0, -top)
+        src_right = min(block.width, img.width - left)
+        src_bottom = min(block.height, img.height - top)
+        if src_right <= src_left or src_bottom <= src_top:
+            return img
+
+        # レイヤー合成(テキストの範囲のみ)
+        img.alpha_composite(block, dest=(left + src_left, top + src_top), source=(src_left, src_top, src_right, src_bottom))
+        return img
+
+    def render_block(self, lines):
+        """テキストの範囲だけの透明レイヤーに全行を描画する
+
+        Returns:
+            (Image.Image, (int, int)): レイヤーと画像上での左上座標
+        """
+        static_layer, static_box = self._get_static_block(lines)
+
+        dynamic = [(i, text) for i, (text, is_dynamic) in enumerate(lines) if is_dynamic]
+        boxes = [static_box] if static_layer else []
+        boxes.extend(self._line_box(i, text) for i, text in dynamic)
+        left = min(b[0] for b in boxes)
+        top = min(b[1] for b in boxes)
+        right = max(b[2] for b in boxes)
+        bottom = max(b[3] for b in boxes)
+
+        block = Image.new("RGBA", (right - left, bottom - top), (255,255,255,0))
+        if static_layer:
+            block.paste(static_layer, (static_box[0] - left, static_box[1] - top))
+
+        # --- 縁取りを描く ---
+        draw = ImageDraw.Draw(block)
+        for i, text in dynamic:
+            self._draw_line(draw, i, text, left, top)
+
+        return block, (left, top)
+
+    def _get_static_block(self, lines):
+        if self._static_block is None:
+            static = [(i, text) for i, (text, is_dynamic) in enumerate(lines) if not is_dynamic]
+            if not static:
+                self._static_block = (None, None)
+            else:
+                boxes = [self._line_box(i, text) for i, text in static]
+                box = (
+                    min(b[0] for b in boxes), min(b[1] for b in boxes),
+                    max(b[2] for b in boxes), max(b[3] for b in boxes),
+                )
+                layer = Image.new("RGBA", (box[2] - box[0], box[3] - box[1]), (255,255,255,0))
+                draw = ImageDraw.Draw(layer)
+                for i, text in static:
+                    self._draw_line(draw, i, text, box[0], box[1])
+                self._static_block = (layer, box)
+        return self._static_block
+
+    def _line_origin(self, index: int):
+        return self.x, self.y + index * self.line_height
+
+    def _line_box(self, index: int, text: str):
+        """行の描画範囲(画像上の整数座標)"""
+        x, y = self._line_origin(index)
+        l, t, r, b = self.font.getbbox(text, stroke_width=self.stroke_width)
+        return (
+            math.floor(x + l), math.floor(y + t),
+            math.ceil(x + r) + 1, math.ceil(y + b) + 1,
+        )
+
+    def _draw_line(self, draw: ImageDraw.ImageDraw, index: int, text: str, offset_x: int, offset_y: int):
+        x, y = self._line_origin(index)
+        draw.text((x - offset_x, y - offset_y), text, font=self.font, fill=self.fill_color, stroke_width=self.stroke_width, stroke_fill=self.outline_color)
+
+    def generate_lines(self, orbit_angle: int, elevation_angle: int) -> list[tuple[str, bool]]:
+        """書き込む行のリスト
+
+        Returns:
+            list[tuple[str, bool]]: (テキスト, 撮影ごとに変わる行か)
+        """
         lines = []
         if self.settings.w_datetime:
-            lines.append(self.settings.datetime.strftime("%Y-%m-%d %H:%M:%S"))
+            lines.append((self.settings.datetime.strftime("%Y-%m-%d %H:%M:%S"), False))
         if self.settings.w_filename:
-            lines.append(bpy.path.basename(bpy.data.filepath))
+            lines.append((bpy.path.basename(bpy.data.filepath), False))
         if self.settings.w_focal_length:
-            lines.append(f"{self.settings.focal_length:.1f}mm")
+            lines.append((f"{self.settings.focal_length:.1f}mm", False))
         if self.settings.w_orbit_angle:
-            lines.append(f"Orbit Angle: {orbit_angle}°")
+            lines.append((f"Orbit Angle: {orbit_angle}°", True))
         if self.settings.w_elevation_angle:
-            lines.append(f"Elevation Angle: {elevation_angle}°")
+            lines.append((f"Elevation Angle: {elevation_angle}°", True))
         if self.settings.w_note:
-            lines.append(self.settings.note)
-        return "\n".join(lines)
+            lines.append((self.settings.note, False))
+        return lines
+
+    def generate_text(self, orbit_angle: int, elevation_angle: int) -> str:
+        return "\n".join(text for text, _ in self.generate_lines(orbit_angle, elevation_angle))
 
 
@@ -1,5 +1,14 @@
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+import hashlib
+import bpy
+import bmesh
 import mathutils
+import numpy as np
+
+from ..core.framing import fibonacci_directions
+from .fingerprint import GEOMETRY_TYPES, read_evaluated_geometry
+from .geometry_updates import GeometryUpdates
 
 # 共通インターフェース
 class CornerProvider(ABC):
@@ -45,10 +54,193 @@ class EmptyCubeCornerProvider(CornerProvider):
 
         return corners
 
+# 評価後メッシュの凸包を使う(回転したオブジェクトや複雑な形状でもぴったり収める)
+class MeshHullCornerProvider(CornerProvider):
+    # 事前に凸包を求める方向の数｡各方向の最遠点は必ず凸包の頂点になる
+    SEED_DIRECTIONS = 64
+    # これ以下の頂点数ならふるい落としをせずに直接凸包を求める
+    DIRECT_HULL_LIMIT = 2048
+    # 一度に内外判定する頂点数
+    CHUNK_SIZE = 65536
+    # キャッシュする凸包の数(最近使ったものを残す)
+    MAX_CACHE_ENTRIES = 64
+
+    # キー -> (ジオメトリの状態, 頂点座標のダイジェスト, ローカル座標の凸包頂点)
+    _hull_cache = OrderedDict()
+
+    def __init__(self, geometry=None):
+        """
+        Args:
+            geometry: read_evaluated_geometry で読み込み済みのジオメトリ(画角のキャッシュのキーを求めた場合)
+        """
+        self.geometry = geometry
+
+    def get_corners(self, obj):
+        if obj.type not in GEOMETRY_TYPES:
+            return ObjectCornerProvider().get_corners(obj)
+
+        points = self.geometry[0] if self.geometry is not None else None
+        hull = self.get_hull(obj, points)
+        if hull is None:
+            return ObjectCornerProvider().get_corners(obj)
+
+        # ワールド座標に変換
+        matrix = np.array(obj.matrix_world, dtype=np.float64)
+        return hull @ matrix[:3, :3].T + matrix[:3, 3]
+
+    @staticmethod
+    def cache_key(obj):
+        """モディファイアがあれば評価結果がオブジェクトごとに違うのでオブジェクト単位で持つ"""
+        if obj.type == 'MESH' and not obj.modifiers:
+            return ("MESH", obj.data.name_full)
+        return ("OBJECT", obj.name_full)
+
+    @staticmethod
+    def read_evaluated_vertices(obj) -> np.ndarray:
+        """評価後メッシュの頂点座標(ローカル)"""
+        geometry = read_evaluated_geometry(obj)
+        if geometry is None:
+            return np.empty((0, 3), dtype=np.float32)
+        return geometry[0]
+
+    @classmethod
+    def get_hull(cls, obj, points: np.ndarray = None):
+        """凸包の頂点(ローカル座標)｡頂点がない場合は None
+
+        depsgraph の更新でジオメトリが変わっていなければ､メッシュを読み込まずにキャッシュを使う｡
+        更新を追えない場合は頂点座標を読み込み､前回と同じならキャッシュを使う｡
+
+        Args:
+            points: 読み込み済みの頂点座標(ローカル)｡None の場合は評価後のメッシュから読み込む
+        """
+        key = cls.cache_key(obj)
+        stamp = GeometryUpdates.stamp(key)
+        cached = cls._hull_cache.get(key)
+        if cached is not None and stamp is not None and cached[0] == stamp:
+            cls._hull_cache.move_to_end(key)
+            return cached[2]
+
+        if points is None:
+            points = cls.read_evaluated_vertices(obj)
+        if len(points) == 0:
+            return None
+        digest = cls._points_digest(points)
+        if cached is not None and cached[1] == digest:
+            hull = cached[2]
+        else:
+            hull = cls.convex_hull(points.astype(np.float64))
+        cls._hull_cache[key] = (stamp, digest, hull)
+        cls._hull_cache.move_to_end(key)
+        while len(cls._hull_cache) > cls.MAX_CACHE_ENTRIES:
+            cls._hull_cache.popitem(last=False)
+        return hull
+
+    @classmethod
+    def revalidate(cls, obj, points: np.ndarray):
+        """読み込んだ頂点座標がキャッシュした凸包と同じなら､今のジオメトリの状態で使えるようにする
+
+        画角のキャッシュのキーを求めるために読み込んだ場合に使う(凸包は求めない)｡
+        """
+        key = cls.cache_key(obj)
+        stamp = GeometryUpdates.stamp(key)
+        cached = cls._hull_cache.get(key)
+        if stamp is None or cached is None or cached[0] == stamp:
+            return
+        if cached[1] == cls._points_digest(points):
+            cls._hull_cache[key] = (stamp, cached[1], cached[2])
+
+    @staticmethod
+    def _points_digest(points: np.ndarray) -> bytes:
+        return hashlib.blake2b(points.tobytes(), digest_size=16).digest()
+
+    @classmethod
+    def clear_cache(cls):
+        cls._hull_cache.clear()
+
+    @classmethod
+    def convex_hull(cls, points: np.ndarray) -> np.ndarray:
+        """凸包の頂点 (H, 3) を求める
+
+        1. 複数方向の最遠点(必ず凸包の頂点)で小さな凸包を作る
+        2. その内側にある頂点を numpy でまとめて捨てる
+        3. 残った頂点だけで bmesh の凸包を求める
+        平面や直線など凸包が作れない形状はバウンディングボックスで代用する
+        """
+        if len(points) > cls.DIRECT_HULL_LIMIT:
+            directions = fibonacci_directions(cls.SEED_DIRECTIONS)
+            seeds = points[np.unique(np.argmax(points @ directions.T, axis=0))]
+            seed_hull = _bmesh_hull(seeds)
+            if seed_hull is None:
+                return _aabb_corners(points)
+
+            _, normals, offsets = seed_hull
+            eps = 1e-6 * max(float(np.ptp(points, axis=0).max()), 1e-9)
+            outside = np.zeros(len(points), dtype=bool)
+            for start in range(0, len(points), cls.CHUNK_SIZE):
+                block = points[start:start + cls.CHUNK_SIZE]
+                outside[start:start + cls.CHUNK_SIZE] = ((block @ normals.T) - offsets > eps).any(axis=1)
+            points = np.vstack((seeds, points[outside]))
+
+        hull = _bmesh_hull(np.unique(points, axis=0))
+        if hull is None:
+            return _aabb_corners(points)
+        return hull[0]
+
+
+def _aabb_corners(points: np.ndarray) -> np.ndarray:
+    lo = points.min(axis=0)
+    hi = points.max(axis=0)
+    return np.array([(x, y, z) for x in (lo[0], hi[0]) for y in (lo[1], hi[1]) for z in (lo[2], hi[2])])
+
+
+def _bmesh_hull(points: np.ndarray):
+    """bmesh で凸包を作る
+
+    Returns:
+        (頂点 (H, 3), 外向きの面法線 (F, 3), 面のオフセット (F,))｡凸包が作れない場合は None
+    """
+    if len(points) < 4:
+        return None
+
+    bm = bmesh.new()
+    try:
+        for co in points:
+            bm.verts.new(co)
+        result = bmesh.ops.convex_hull(bm, input=bm.verts[:], use_existing_faces=False)
+        faces = [elem for elem in result["geom"] if isinstance(elem, bmesh.types.BMFace)]
+        if not faces:
+            return None
+
+        verts = {v for f in faces for v in f.verts}
+        vertices = np.array([tuple(v.co) for v in verts], dtype=np.float64)
+
+        center = vertices.mean(axis=0)
+        normals = np.empty((len(faces), 3))
+        offsets = np.empty(len(faces))
+        for i, f in enumerate(faces):
+            f.normal_update()
+            normal = np.array(f.normal, dtype=np.float64)
+            origin = np.array(f.verts[0].co, dtype=np.float64)
+            # 外向きにそろえる
+            if np.dot(origin - center, normal) < 0:
+                normal = -normal
+            normals[i] = normal
+            offsets[i] = np.dot(normal, origin)
+        return vertices, normals, offsets
+    finally:
+        bm.free()
+
 # 判別＆委譲関数
-def get_corners(obj):
+def get_corners(obj, framing_mode: str = 'bbox', geometry=None):
+    """オブジェクトの種類と画角の計算方法に合った頂点
+
+    Args:
+        geometry: read_evaluated_geometry で読み込み済みのジオメトリ('hull' の場合に使う)
+    """
     if obj.type == 'EMPTY' and obj.empty_display_type == 'CUBE':
         provider = EmptyCubeCornerProvider()
+    elif framing_mode == 'hull':
+        provider = MeshHullCornerProvider(geometry)
     else:
         provider = ObjectCornerProvider()
     return provider.get_corners(obj)
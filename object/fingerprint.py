@@ -0,0 +1,196 @@
+import hashlib
+import bpy
+import numpy as np
+
+GEOMETRY_TYPES = {'MESH', 'CURVE', 'SURFACE', 'FONT', 'META'}
+
+
+def _hasher():
+    return hashlib.blake2b(digest_size=16)
+
+
+def read_evaluated_geometry(obj):
+    """評価後(モディファイア適用後)のジオメトリを foreach_get でまとめて読み込む
+
+    Returns:
+        (頂点座標 (N, 3) float32, 面の頂点番号 (L,) int32)｡メッシュにできない場合は None
+    """
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    obj_eval = obj.evaluated_get(depsgraph)
+    mesh = obj_eval.to_mesh()
+    try:
+        if mesh is None:
+            return None
+        coords = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", coords)
+        loops = np.empty(len(mesh.loops), dtype=np.int32)
+        mesh.loops.foreach_get("vertex_index", loops)
+    finally:
+        obj_eval.to_mesh_clear()
+    return coords.reshape(-1, 3), loops
+
+
+def geometry_digest(obj, geometry=None) -> str:
+    """評価後(モディファイア適用後)のジオメトリのハッシュ
+
+    頂点座標と面の頂点番号をハッシュ化する｡
+    ジオメトリを持たないオブジェクトは種類とデータ名だけを使う｡
+
+    Args:
+        geometry: read_evaluated_geometry で読み込み済みの場合はその結果(同じメッシュを2回読まないため)
+    """
+    h = _hasher()
+    h.update(obj.type.encode())
+    if obj.type not in GEOMETRY_TYPES:
+        if obj.data is not None:
+            h.update(obj.data.name_full.encode())
+        if obj.type == 'EMPTY':
+            h.update(f"{obj.empty_display_type}:{obj.empty_display_size!r}".encode())
+        return h.hexdigest()
+
+    if geometry is None:
+        geometry = read_evaluated_geometry(obj)
+    if geometry is not None:
+        coords, loops = geometry
+        h.update(coords.tobytes())
+        h.update(loops.tobytes())
+    return h.hexdigest()
+
+
+def bound_box_digest(obj) -> str:
+    """バウンディングボックス(ローカル座標の8頂点)のハッシュ｡評価後のジオメトリを読み込まないので速い"""
+    corners = np.array([tuple(v) for v in obj.bound_box], dtype=np.float64)
+    return hashlib.blake2b(corners.tobytes(), digest_size=16).hexdigest()
+
+
+def transform_digest(obj) -> str:
+    """ワールド行列のハッシュ"""
+    matrix = np.array(obj.matrix_world, dtype=np.float64)
+    return hashlib.blake2b(matrix.tobytes(), digest_size=16).hexdigest()
+
+
+def material_digest(obj) -> str:
+    """マテリアルのハッシュ
+
+    スロットのマテリアル名と基本色などの値に加え､ノードの種類と
+    リンクされていない入力の既定値を使う｡
+    """
+    h = _hasher()
+    for slot in getattr(obj, "material_slots", []):
+        mat = slot.material
+        if mat is None:
+            h.update(b"<none>")
+            continue
+        h.update(mat.name_full.encode())
+        h.update(repr((tuple(mat.diffuse_color), mat.metallic, mat.roughness)).encode())
+        if mat.use_nodes and mat.node_tree:
+            _update_node_tree(h, mat.node_tree)
+    return h.hexdigest()
+
+
+def _update_node_tree(h, node_tree):
+    """ノードの種類・画像・リンクされていない入力の既定値・リンクをハッシュに加える"""
+    for node in node_tree.nodes:
+        h.update(f"{node.bl_idname}:{node.name}".encode())
+        image = getattr(node, "image", None)
+        if image is not None:
+            h.update(image.filepath.encode())
+        for socket in node.inputs:
+            if socket.is_linked or not hasattr(socket, "default_value"):
+                continue
+            value = socket.default_value
+            try:
+                value = tuple(value)
+            except TypeError:
+                pass
+            h.update(repr(value).encode())
+    for link in node_tree.links:
+        h.update(f"{link.from_node.name}.{link.from_socket.identifier}>{link.to_node.name}.{link.to_socket.identifier}".encode())
+
+
+def _values(data, names) -> tuple:
+    """data の属性の値(ない属性は None､ベクトルはタプル)"""
+    values = []
+    for name in names:
+        value = getattr(data, name, None)
+        try:
+            value = tuple(value) if not isinstance(value, str) else value
+        except TypeError:
+            pass
+        values.append(value)
+    return tuple(values)
+
+
+# 描画結果に影響する3Dビューのシェーディングの設定
+SHADING_ATTRIBUTES = (
+    "type", "light", "color_type", "single_color", "studio_light", "studiolight_rotate_z",
+    "studiolight_intensity", "studiolight_background_alpha", "studiolight_background_blur",
+    "background_type", "background_color", "use_scene_lights", "use_scene_world",
+    "use_scene_lights_render", "use_scene_world_render", "show_shadows", "shadow_intensity",
+    "show_cavity", "cavity_type", "show_object_outline", "show_specular_highlight",
+    "show_xray", "xray_alpha", "use_dof", "show_backface_culling", "render_pass",
+)
+
+# ライトの値
+LIGHT_ATTRIBUTES = ("type", "color", "energy", "shadow_soft_size", "use_shadow", "spot_size", "spot_blend",
+                    "size", "size_y", "shape", "angle")
+
+
+def shading_digest(shading) -> str:
+    """3Dビューのシェーディング(種類・ライティング・色・スタジオライト・背景など)のハッシュ"""
+    return hashlib.blake2b(repr(_values(shading, SHADING_ATTRIBUTES)).encode(), digest_size=16).hexdigest()
+
+
+def world_digest(world) -> str:
+    """ワールドのハッシュ(色とノード)"""
+    h = _hasher()
+    if world is None:
+        h.update(b"<none>")
+        return h.hexdigest()
+    h.update(world.name_full.encode())
+    h.update(repr(tuple(world.color)).encode())
+    if world.use_nodes and world.node_tree:
+        _update_node_tree(h, world.node_tree)
+    return h.hexdigest()
+
+
+def light_digest(obj) -> str:
+    """ライトのハッシュ(ライトの値・ノード・ワールド行列)"""
+    h = _hasher()
+    h.update(obj.name_full.encode())
+    light = obj.data
+    h.update(repr(_values(light, LIGHT_ATTRIBUTES)).encode())
+    if getattr(light, "use_nodes", False) and light.node_tree:
+        _update_node_tree(h, light.node_tree)
+    h.update(transform_digest(obj).encode())
+    return h.hexdigest()
+
+
+def scene_digest(view_layer, exclude=()) -> str:
+    """対象以外に写るもの(表示中のほかのジオメトリとライト)のハッシュ
+
+    撮影用のカメラとエンプティは撮影ごとに動くので含めない｡
+    """
+    exclude = set(exclude)
+    digests = []
+    for obj in view_layer.objects:
+        if obj in exclude or not obj.visible_get():
+            continue
+        if obj.type == 'LIGHT':
+            digests.append(light_digest(obj))
+        elif obj.type in GEOMETRY_TYPES:
+            digests.append(object_digest(obj))
+    h = _hasher()
+    for digest in sorted(digests):
+        h.update(digest.encode())
+    return h.hexdigest()
+
+
+def object_digest(obj) -> str:
+    """ジオメトリ・トランスフォーム・マテリアルをまとめたハッシュ"""
+    h = _hasher()
+    h.update(obj.name_full.encode())
+    h.update(geometry_digest(obj).encode())
+    h.update(transform_digest(obj).encode())
+    h.update(material_digest(obj).encode())
+    return h.hexdigest()
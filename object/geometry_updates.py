@@ -0,0 +1,80 @@
+import bpy
+from bpy.app.handlers import persistent
+from typing import Optional
+
+
+class GeometryUpdates:
+    """depsgraph の更新から､評価後のジオメトリが変わったデータを記録するクラス
+
+    凸包のキャッシュは stamp が前回と同じならメッシュを読み込まずに結果を使う｡
+    アドオンを登録していない場合(バッチ撮影のワーカーなど)は更新を追えないので stamp は None になる｡
+    フレームの変更・ファイルの読み込み・元に戻すでは､すべてのデータが変わったものとして扱う｡
+    """
+
+    tracking = False
+    _tick = 0
+    _reset = 0 # すべて変わったものとして扱った時点
+    _updated = {} # (種類, データ名) -> 最後にジオメトリが変わった時点
+
+    @classmethod
+    def stamp(cls, key) -> Optional[int]:
+        """key のジオメトリの状態｡前回と同じ値なら変わっていない"""
+        if not cls.tracking:
+            return None
+        return max(cls._updated.get(key, 0), cls._reset)
+
+    @classmethod
+    def mark(cls, key):
+        cls._tick += 1
+        cls._updated[key] = cls._tick
+
+    @classmethod
+    def reset(cls):
+        cls._tick += 1
+        cls._reset = cls._tick
+        cls._updated.clear()
+
+
+@persistent
+def on_depsgraph_update(_scene, depsgraph):
+    for update in depsgraph.updates:
+        if not update.is_updated_geometry:
+            continue
+        data = update.id.original
+        if isinstance(data, bpy.types.Object):
+            GeometryUpdates.mark(("OBJECT", data.name_full))
+            if data.data is not None:
+                GeometryUpdates.mark(("MESH", data.data.name_full))
+        elif isinstance(data, bpy.types.Mesh):
+            GeometryUpdates.mark(("MESH", data.name_full))
+
+
+@persistent
+def on_reset(*_args):
+    GeometryUpdates.reset()
+
+
+HANDLERS = (
+    ("depsgraph_update_post", on_depsgraph_update),
+    ("frame_change_post", on_reset),
+    ("load_post", on_reset),
+    ("undo_post", on_reset),
+    ("redo_post", on_reset),
+)
+
+
+def register():
+    for name, handler in HANDLERS:
+        handlers = getattr(bpy.app.handlers, name)
+        if handler not in handlers:
+            handlers.append(handler)
+    GeometryUpdates.reset()
+    GeometryUpdates.tracking = True
+
+
+def unregister():
+    GeometryUpdates.tracking = False
+    for name, handler in HANDLERS:
+        handlers = getattr(bpy.app.handlers, name)
+        if handler in handlers:
+            handlers.remove(handler)
@@ -1,9 +1,14 @@
 import bpy
 import os
-from ..core.capture_manager import OrbitSnapManager
-from ..core.watermark import Watermark
+from typing import TYPE_CHECKING
 from ..properties.capture_settings import CaptureSettings
 from ..core.props_access import copy_ui_to_scene, get_scene_props
+from ..core.capture_progress import progress
+
+if TYPE_CHECKING:
+    from ..core.capture_manager import OrbitSnapManager
+    from ..core.shot_writer import ShotWriter
+    from ..core.capture_pipeline import CapturePipeline
 
 class ORBITSNAP_OT_RunCapture(bpy.types.Operator):
     bl_idname = "orbitsnap.run_capture"
@@ -12,83 +17,181 @@ class ORBITSNAP_OT_RunCapture(bpy.types.Operator):
 
     # --- モーダル制御用変数 ---
     settings: CaptureSettings = None # executeで設定
-    _manager: OrbitSnapManager = None
-    writer: Watermark = None
+    _manager: "OrbitSnapManager" = None
+    writer: "ShotWriter" = None
+    _pipeline: "CapturePipeline" = None
 
     def execute(self, context):
+        if not self._begin(context):
+            return {'CANCELLED'}
+
+        # --- 撮影開始
+        try:
+
+            for target_index, x_angle, z_angle in self._manager.shot_plan:
+                self._capture(target_index, x_angle, z_angle)
+
+            self._finish()
+            return {'FINISHED'}
+
+        except Exception as e:
+            self.report({'ERROR'}, f"撮影中にエラーが発生しました: {e}")
+            self._cleanup() # エラー時もクリーンアップして終了
+            return {'CANCELLED'}
+
+    def _begin(self, context) -> bool:
+        """入力チェックと撮影準備｡失敗した場合はレポートして False を返す"""
         # Read from WM for snappy UI. Copy to Scene for persistence.
         if not copy_ui_to_scene(context):
             self.report({'ERROR'}, "OrbitSnap properties not found")
-            return {'CANCELLED'}
+            return False
 
         props = get_scene_props(context)
 
-        # Eeveeだけ(Cyclesでの描画が遅いのでスクショしても何も映らない)
+        # 3Dビューの描画で撮影する場合はEeveeだけ(Cyclesでの描画が遅いのでスクショしても何も映らない)
+        # Cycles で撮影する場合は撮影方法を Cycles にする(レンダー設定を撮影中だけ変更してレンダリングする)
         engine = context.scene.render.engine
-        if engine == 'CYCLES':
-            self.report({'ERROR'}, "現在のレンダエンジンはCyclesです。Eeveeに変更してください。")
-            return {'CANCELLED'}
+        if engine == 'CYCLES' and props.render_mode != 'cycles':
+            self.report({'ERROR'}, "現在のレンダエンジンはCyclesです。Eeveeに変更するか､撮影方法(Render)をCyclesにしてください。")
+            return False
 
-        # 3DVIEWがアクティブでない場合
+        # 3DVIEWがアクティブでない場合(オフスクリーン撮影では開いている3Dビューを使う)
         area = bpy.context.area
-        if area.type != 'VIEW_3D':
-            self.report({'WARNING'}, "3Dビューが選択されていません！")
-            return {'CANCELLED'}
+        if area is None or area.type != 'VIEW_3D':
+            if not props.offscreen:
+                self.report({'WARNING'}, "3Dビューが選択されていません！")
+                return False
+            area = None
 
         # オブジェクトが選択されていない場合
         selected_objects = context.selected_objects
         if not selected_objects:
             self.report({'WARNING'}, "オブジェクトが選択されていません！")
-            return {'CANCELLED'}
+            return False
 
         # 保存チェック
         if not bpy.data.filepath:
             self.report({'ERROR'}, "保存されていないファイルでは撮影できません！")
-            return {'CANCELLED'}
+            return False
 
         # --- 設定とマネージャーの準備 ---
         try:
+            # 撮影処理(Pillow や numpy を使う)はアドオンの登録時ではなく最初の撮影時に読み込む
+            from ..core.capture_manager import OrbitSnapManager
+            from ..core.watermark import Watermark
+            from ..core.shot_writer import ShotWriter
+            from ..core.derivatives import DerivativeChain
+            from ..core.encoders import ImageEncoder
+            from ..core.capture_pipeline import CapturePipeline
+
             self.settings = CaptureSettings.from_props(props=props)
             # 保存先存在チェック
             if not os.path.isdir(self.settings.directory):
                 self.report({'WARNING'}, "指定されたフォルダが存在しません: ")
-                return {'CANCELLED'}
+                return False
+
+            # 静止画を保存せず､ほかの出力もない場合は何も書き出されない
+            if not self.settings.save_stills and not (self.settings.contact_sheet or self.settings.turntable_format != 'none'
+                                                      or self.settings.derived_qualities or self.settings.thumbnail_width):
+                self.report({'WARNING'}, "Save Stillsをオフにする場合はほかの画質､サムネイル､一覧画像かアニメーションを出力してください")
+                return False
 
-            self.writer = Watermark(settings=self.settings)
+            settings = self.settings
             self._manager = OrbitSnapManager(area, selected_objects, self.settings)
             self._manager.prepare() # ここでカメラ作成、視点変更などを行う
 
+            store = self._manager.image_store
+            sinks = self._manager.sinks
+            stats = self._manager.encode_stats
+            records = self._manager.shot_records
+            profiler = self._manager.profiler
+
+            def make_writer():
+                return ShotWriter(Watermark(settings=settings), store, sinks, settings.save_stills,
+                                  DerivativeChain(settings), ImageEncoder(settings, stats), records, profiler)
+
+            self.writer = make_writer()
+            if settings.use_pipeline:
+                # 書き込みと保存はワーカースレッドで行う
+                self._pipeline = CapturePipeline(make_writer)
 
         except Exception as e:
             self.report({'ERROR'}, f"準備中にエラーが発生しました: {e}")
             self._cleanup() # エラー時もクリーンアップ
-            return {'CANCELLED'}
+            return False
 
-        # --- 撮影開始
-        try:
+        return True
 
-            for x_angle, z_angle in self.settings.shot_angle_list:
+    def _capture(self, target_index: int, x_angle: int, z_angle: int):
+        profiler = self._manager.profiler
+        if target_index != self._manager.target_index:
+            # 次の対象に移る前に､前の対象のショットをすべて書き出す
+            if self._pipeline:
+                with profiler.span("drain"):
+                    self._pipeline.drain()
+                self._pipeline.raise_if_failed()
+            with profiler.span("begin_target", target=target_index):
+                self._manager.begin_target(target_index)
 
-                # capture の引数を修正
-                filepath = self._manager.capture(x_angle, z_angle)
-                self.writer.draw(filepath=filepath, orbit_angle=z_angle, elevation_angle=x_angle)
+        with profiler.span("shot", x=x_angle, z=z_angle):
+            shot = self._manager.capture(x_angle, z_angle)
+            if self._pipeline:
+                # 保存が追いつかない場合はここで待つ
+                with profiler.span("submit"):
+                    self._pipeline.submit(shot)
+            else:
+                self.writer.write(shot)
 
-            # フォルダを開く
-            if self.settings.open_folder_after_capture:
-                os.startfile(self._manager.save_dir)
+    def _finish(self):
+        # 保存待ちのショットをすべて書き出す
+        if self._pipeline:
+            with self._manager.profiler.span("drain"):
+                self._pipeline.drain()
+            self._pipeline.raise_if_failed()
+        self._manager.finish_target()
 
-            # 後片付け
-            self.report({'INFO'}, "全キャプチャ完了！")
-            self._cleanup()
-            return {'FINISHED'}
+        # フォルダを開く
+        if self.settings.open_folder_after_capture:
+            os.startfile(self._manager.session_dir)
 
-        except Exception as e:
-            self.report({'ERROR'}, f"撮影中にエラーが発生しました: {e}")
-            self._cleanup() # エラー時もクリーンアップして終了
-            return {'CANCELLED'}
+        # 後片付け
+        notes = []
+        if len(self._manager.targets) > 1:
+            notes.append(f"{len(self._manager.targets)}個の対象をそれぞれのフォルダに保存")
+        if self._manager.empty_regions:
+            notes.append(f"範囲内にオブジェクトがない {'･'.join(self._manager.empty_regions)} は撮影せず")
+        plan = self._manager.view_plan
+        if plan is not None:
+            notes.append(plan.summary())
+        if self._manager.framing_cache_hits:
+            notes.append(f"{self._manager.framing_cache_hits}個の対象は画角の計算結果を再利用")
+        if self._manager.reused_count:
+            notes.append(f"変更のない{self._manager.reused_count}枚は前回の画像を再利用")
+        cycles = self._manager.cycles
+        if cycles is not None and cycles.budget.shots:
+            # ショットごとの時間はコンソールに表示する
+            print("\n".join(cycles.budget.lines()))
+            notes.append(cycles.budget.summary())
+        encode_summary = self._manager.encode_stats.summary()
+        if encode_summary:
+            print(f"保存形式: {encode_summary}")
+            notes.append(encode_summary)
+        if self._manager.profiler:
+            from ..core.profiler import TRACE_FILENAME
+            # すべての区間の集計は後片付けの後にコンソールに表示する
+            notes.append(f"計測: {self._manager.profiler.summary(limit=3)}, 詳細は {TRACE_FILENAME}")
+        if notes:
+            self.report({'INFO'}, f"全キャプチャ完了！ ({', '.join(notes)})")
+        else:
+            self.report({'INFO'}, "全キャプチャ完了！")
+        self._cleanup()
 
     def _cleanup(self):
 
+        # 保存待ちのショットを書き出し､ワーカーを終了してから後処理する
+        if self._pipeline:
+            self._pipeline.close()
+
         # マネージャーの後処理
         if self._manager:
             try:
@@ -99,10 +202,100 @@ class ORBITSNAP_OT_RunCapture(bpy.types.Operator):
         # 変数リセット (念のため)
         self.settings = None
         self._manager = None
+        self._pipeline = None
+
+
+class ORBITSNAP_OT_RunCaptureModal(ORBITSNAP_OT_RunCapture):
+    """タイマーで数枚ずつ撮影し､撮影中もUIを操作できるようにする"""
+    bl_idname = "orbitsnap.run_capture_modal"
+    bl_label = "Shot Orbit Snap"
+    bl_description = "選択オブジェクトを自動撮影します(Escで中止)"
+
+    TIMER_INTERVAL = 0.01
+
+    _timer = None
+    _next_index: int = 0
+    _shot_plan: list = None
+
+    @classmethod
+    def poll(cls, context):
+        # 撮影は同時に1つだけ
+        return not progress.running
+
+    def invoke(self, context, event):
+        if not self._begin(context):
+            return {'CANCELLED'}
+
+        self._next_index = 0
+        self._shot_plan = self._manager.shot_plan
+        progress.start(len(self._shot_plan))
+
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(self.TIMER_INTERVAL, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def execute(self, context):
+        return self.invoke(context, None)
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self.report({'WARNING'}, f"撮影を中止しました ({progress.done}/{progress.total})")
+            self._cleanup()
+            return {'CANCELLED'}
+
+        if event.type != 'TIMER' or event.timer != self._timer:
+            # タイマー以外のイベントはUIに渡す
+            return {'PASS_THROUGH'}
+
+        try:
+            plan = self._shot_plan
+            end = min(len(plan), self._next_index + self.settings.shots_per_tick)
+            for target_index, x_angle, z_angle in plan[self._next_index:end]:
+                self._capture(target_index, x_angle, z_angle)
+            progress.advance(end - self._next_index)
+            self._next_index = end
+            _redraw_panels(context)
+
+            if self._next_index >= len(plan):
+                self._finish()
+                return {'FINISHED'}
+
+        except Exception as e:
+            self.report({'ERROR'}, f"撮影中にエラーが発生しました: {e}")
+            self._cleanup()
+            return {'CANCELLED'}
+
+        return {'RUNNING_MODAL'}
+
+    def _cleanup(self):
+        if self._timer:
+            bpy.context.window_manager.event_timer_remove(self._timer)
+            self._timer = None
+        progress.finish()
+        _redraw_panels(bpy.context)
+        super()._cleanup()
+
+
+def _redraw_panels(context):
+    """進捗表示を更新するため3Dビューを再描画する"""
+    screen = context.screen
+    if screen is None:
+        return
+    for area in screen.areas:
+        if area.type == 'VIEW_3D':
+            area.tag_redraw()
+
 
+classes = (
+    ORBITSNAP_OT_RunCapture,
+    ORBITSNAP_OT_RunCaptureModal,
+)
 
 def register():
-    bpy.utils.register_class(ORBITSNAP_OT_RunCapture)
+    for cls in classes:
+        bpy.utils.register_class(cls)
 
 def unregister():
-    bpy.utils.unregister_class(ORBITSNAP_OT_RunCapture)
+    for cls in reversed(classes):
+        bpy.utils.unregister_class(cls)
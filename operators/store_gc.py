@@ -0,0 +1,33 @@
+import bpy
+import os
+from ..core.props_access import get_ui_props
+
+
+class ORBITSNAP_OT_StoreGC(bpy.types.Operator):
+    bl_idname = "orbitsnap.store_gc"
+    bl_label = "Clean Image Store"
+    bl_description = "どのセッションからも使われていない画像をストアから削除します"
+
+    def execute(self, context):
+        props, _ = get_ui_props(context)
+        if props is None:
+            self.report({'ERROR'}, "OrbitSnap properties not found")
+            return {'CANCELLED'}
+
+        directory = bpy.path.abspath(props.directory or "//")
+        if not os.path.isdir(directory):
+            self.report({'WARNING'}, "指定されたフォルダが存在しません: ")
+            return {'CANCELLED'}
+
+        # ストアの処理は使うときに読み込む(アドオンの登録を軽くするため)
+        from ..core.image_store import gc
+        removed, freed = gc(directory)
+        self.report({'INFO'}, f"{removed}個の画像を削除しました ({freed / (1 << 20):.1f} MiB)")
+        return {'FINISHED'}
+
+
+def register():
+    bpy.utils.register_class(ORBITSNAP_OT_StoreGC)
+
+def unregister():
+    bpy.utils.unregister_class(ORBITSNAP_OT_StoreGC)
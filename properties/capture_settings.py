@@ -1,20 +1,35 @@
 import datetime
 import bpy
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from .property_group import ORBITSNAP_PR_MainSettings
 
+# 画質ごとの解像度
+QUALITY_RESOLUTIONS = {
+    'high': (1920, 1080),
+    'middle': (1280, 720),
+    'low': (854, 480),
+}
+
 @dataclass
 class CaptureSettings:
     """スクリーンショット用の各種設定値
 
     Attributes:
         datetime: 撮影日時
+        quality: 撮影する画質(派生画像を作る場合は最も高い画質)
         resolution_x: 横解像度
         resolution_y: 縦解像度
         sensor_width: センササイズ(mm)
         focal_length: 焦点距離(mm)
         margin_scale: 余白調整
+        framing_mode: 画角計算に使う頂点 ('bbox': バウンディングボックス, 'hull': 評価後メッシュの凸包)
+        framing_cache: 形状・ワールド行列・画角に関係する設定が同じなら前回の画角の計算結果を使うか
+        persist_framing_cache: 画角の計算結果をシーンに保存し､.blend を開き直しても使うか
+        capture_targets: 撮影対象のまとめ方 ('selection': 選択全体, 'objects': オブジェクトごと, 'regions': エンプティ(Cube)ごと)
         shot_angle_list: 撮影角度リスト
+        view_planning: 撮影角度の決め方 ('grid': 仰角と水平回転の分割角度, 'coverage': 被覆率から選ぶ)
+        target_coverage: 被覆率から選ぶ場合の目標(全候補から見える面積に対する割合)
+        plan_candidates: 被覆率から選ぶ場合の候補視点の数
         w_datetime: スクリーンショットに日時を表示するか
         w_filename: スクリーンショットにファイル名を表示するか
         w_focal_length: スクリーンショットに焦点距離を表示するか
@@ -22,6 +37,33 @@ class CaptureSettings:
         w_elevation_angle: スクリーンショットに仰角を表示するか
         w_note: スクリーンショットに備考を表示するか
         note: スクリーンショットに表示する備考のテキスト
+        use_pipeline: 撮影と保存を並行して行うか
+        offscreen: 3Dビューを切り替えずにオフスクリーンで撮影するか
+        use_image_store: 画像をハッシュで重複排除してストアに保存し､セッションフォルダにはリンクを置くか
+        incremental: 前回から変わっていないショットは撮影せずに前回の画像を再利用するか
+        shots_per_tick: 撮影中もUIを操作できるモードで1回のタイマー処理で撮影する枚数
+        contact_sheet: 仰角 × 水平角 の一覧画像(contact_sheet.png と位置の索引)を書き出すか
+        contact_sheet_cell_width: 一覧画像の1コマの幅(px)
+        turntable_format: 仰角ごとの1周分を書き出すアニメーションの形式 ('none' / 'webp' / 'apng')
+        turntable_fps: アニメーションのフレームレート
+        save_stills: 1枚ずつの画像を保存するか
+        derived_qualities: 撮影画像を縮小して一緒に書き出す低い画質(大きい順)
+        thumbnail_width: 一緒に書き出すサムネイルの幅(px)｡0 の場合は書き出さない
+        image_format: 画像の保存形式 ('png' / 'jpeg' / 'webp')
+        png_compress_level: PNGの圧縮レベル(0-9｡大きいほど小さく遅い)
+        image_quality: JPEG と非可逆WebPの品質(1-100)
+        webp_lossless: WebPを可逆圧縮で保存するか
+        use_alpha: 透過(アルファチャンネル)を保存するか｡JPEGでは保存しない
+        session_index: 撮影したショットを保存フォルダの索引(orbitsnap_index.sqlite)に記録するか
+        similarity_index: セッション間の比較用に知覚ハッシュと縮小画像(orbitsnap_similarity.npz)を書き出すか
+        profile: 撮影の区間ごとの時間を記録し､Chrome trace(orbitsnap_trace.json)を書き出すか
+        profile_memory: 区間ごとのメモリのピーク(tracemalloc)も記録するか
+        render_mode: 撮影方法 ('viewport': 3Dビューの描画, 'cycles': 撮影用のカメラから Cycles でレンダリング)
+        cycles_time_budget: Cycles の1枚あたりのレンダリング時間の上限(秒)｡0 の場合はサンプル数だけで止める
+        cycles_max_samples: Cycles のサンプル数の上限
+        cycles_adaptive_threshold: Cycles の適応サンプリングのノイズのしきい値(0 の場合は自動)
+        cycles_denoise: Cycles の画像をCPUのデノイザー(OpenImageDenoise)でノイズ除去するか
+        cycles_preview_scale: Cycles の場合に画質の解像度を縮小する割合(%)｡確認用に短時間で撮影する場合に使う
     """
 
     datetime: datetime
@@ -33,7 +75,14 @@ class CaptureSettings:
     sensor_height: float = 24.0
     focal_length: float = 50
     margin_scale: float = 1.2
+    framing_mode: str = 'bbox'
+    framing_cache: bool = True
+    persist_framing_cache: bool = False
+    capture_targets: str = 'selection'
     shot_angle_list: list[list[int]] = field(default_factory=list)
+    view_planning: str = 'grid'
+    target_coverage: float = 0.95
+    plan_candidates: int = 96
     w_datetime: bool = False
     w_filename: bool = False
     w_focal_length: bool = False
@@ -41,6 +90,33 @@ class CaptureSettings:
     w_elevation_angle: bool = False
     w_note: bool = False
     open_folder_after_capture:bool = False
+    use_pipeline: bool = False
+    offscreen: bool = False
+    incremental: bool = False
+    use_image_store: bool = False
+    shots_per_tick: int = 1
+    contact_sheet: bool = False
+    contact_sheet_cell_width: int = 256
+    turntable_format: str = 'none'
+    turntable_fps: int = 12
+    save_stills: bool = True
+    derived_qualities: list[str] = field(default_factory=list)
+    thumbnail_width: int = 0
+    image_format: str = 'png'
+    png_compress_level: int = 6
+    image_quality: int = 90
+    webp_lossless: bool = False
+    use_alpha: bool = True
+    session_index: bool = False
+    similarity_index: bool = False
+    profile: bool = False
+    profile_memory: bool = False
+    render_mode: str = 'viewport'
+    cycles_time_budget: float = 10.0
+    cycles_max_samples: int = 128
+    cycles_adaptive_threshold: float = 0.01
+    cycles_denoise: bool = True
+    cycles_preview_scale: int = 100
     note: str = ""
 
     @classmethod
@@ -57,17 +133,11 @@ class CaptureSettings:
         save_dir = props.directory or "//"
         abs_save_dir = bpy.path.abspath(save_dir)
 
-        # 画質の設定
-        quality = props.quality
-        if props.quality == 'high':
-            resolution_x = 1920
-            resolution_y = 1080
-        elif props.quality == 'middle':
-            resolution_x = 1280
-            resolution_y = 720
-        elif props.quality == 'low':
-            resolution_x = 854
-            resolution_y = 480
+        # 画質の設定(最も高い画質で撮影し､残りは縮小して作る)
+        quality, derived_qualities = cls.split_qualities({props.quality} | set(props.derived_qualities))
+        resolution_x, resolution_y = QUALITY_RESOLUTIONS[quality]
+        preview_scale = int(props.cycles_preview_scale) if props.render_mode == 'cycles' else 100
+        resolution_x, resolution_y = cls.scale_resolution(resolution_x, resolution_y, preview_scale)
 
         # 仰角リストを初期化
 
@@ -80,17 +150,8 @@ class CaptureSettings:
         if props.use_angle_m45: elevation_angles.append(-45)
         if props.use_angle_m60: elevation_angles.append(-60)
 
-        elevation_angles = elevation_angles or [0]
-
         # 撮影角度リストを初期化
-        orbit_step = int(props.orbit_step)
-        shot_angle_list = []
-
-        for x_angle in elevation_angles:
-            z_angles = [i * orbit_step for i in range(360 // orbit_step)]
-
-            for z_angle in z_angles:
-                shot_angle_list.append([x_angle, z_angle])
+        shot_angle_list = cls.build_shot_angle_list(elevation_angles, int(props.orbit_step))
 
         return cls(
             datetime=datetime.datetime.now(),
@@ -100,7 +161,14 @@ class CaptureSettings:
             resolution_y=resolution_y,
             focal_length=props.focal_length,
             margin_scale=props.margin_scale,
+            framing_mode=props.framing_mode,
+            framing_cache=props.framing_cache,
+            persist_framing_cache=props.persist_framing_cache,
+            capture_targets=props.capture_targets,
             shot_angle_list=shot_angle_list,
+            view_planning=props.view_planning,
+            target_coverage=props.target_coverage,
+            plan_candidates=props.plan_candidates,
             w_datetime=props.w_datetime,
             w_filename=props.w_filename,
             w_focal_length=props.w_focal_length,
@@ -109,4 +177,100 @@ class CaptureSettings:
             w_note=props.w_note,
             note=props.note,
             open_folder_after_capture=props.open_folder_after_capture,
+            use_pipeline=props.use_pipeline,
+            offscreen=props.offscreen,
+            incremental=props.incremental,
+            use_image_store=props.use_image_store,
+            shots_per_tick=props.shots_per_tick,
+            contact_sheet=props.contact_sheet,
+            contact_sheet_cell_width=props.contact_sheet_cell_width,
+            turntable_format=props.turntable_format,
+            turntable_fps=props.turntable_fps,
+            save_stills=props.save_stills,
+            derived_qualities=derived_qualities,
+            thumbnail_width=props.thumbnail_width if props.thumbnail else 0,
+            image_format=props.image_format,
+            png_compress_level=props.png_compress_level,
+            image_quality=props.image_quality,
+            webp_lossless=props.webp_lossless,
+            use_alpha=props.use_alpha,
+            session_index=props.session_index,
+            similarity_index=props.similarity_index,
+            profile=props.profile,
+            profile_memory=props.profile_memory,
+            render_mode=props.render_mode,
+            cycles_time_budget=props.cycles_time_budget,
+            cycles_max_samples=props.cycles_max_samples,
+            cycles_adaptive_threshold=props.cycles_adaptive_threshold,
+            cycles_denoise=props.cycles_denoise,
+            cycles_preview_scale=preview_scale,
         )
+
+    @staticmethod
+    def split_qualities(qualities) -> tuple[str, list[str]]:
+        """書き出す画質を､撮影する最も高い画質と縮小して作る画質(大きい順)に分ける"""
+        ordered = sorted(set(qualities), key=lambda q: QUALITY_RESOLUTIONS[q][0], reverse=True)
+        return ordered[0], ordered[1:]
+
+    @staticmethod
+    def scale_resolution(resolution_x: int, resolution_y: int, scale: int) -> tuple[int, int]:
+        """解像度を scale(%) に縮小する(確認用の Cycles の撮影)"""
+        if scale >= 100:
+            return resolution_x, resolution_y
+        return max(1, round(resolution_x * scale / 100)), max(1, round(resolution_y * scale / 100))
+
+    @staticmethod
+    def build_shot_angle_list(elevation_angles: list[int], orbit_step: int) -> list[list[int]]:
+        """仰角リストと水平回転の分割角度から撮影角度リスト [[仰角, 水平角], ...] を作る"""
+        elevation_angles = elevation_angles or [0]
+        shot_angle_list = []
+
+        for x_angle in elevation_angles:
+            z_angles = [i * orbit_step for i in range(360 // orbit_step)]
+
+            for z_angle in z_angles:
+                shot_angle_list.append([x_angle, z_angle])
+        return shot_angle_list
+
+    @classmethod
+    def from_dict(cls, values: dict):
+        """辞書(バッチ撮影のジョブ定義など)から設定クラスを生成するファクトリメソッド
+
+        フィールド名に加えて以下のキーを受け付ける｡
+        ・orbit_step: 水平回転の分割角度(shot_angle_list を指定しない場合)
+        ・elevation_angles: 仰角リスト(shot_angle_list を指定しない場合)
+        quality と derived_qualities は最も高い画質で撮影するように並べ替える｡
+
+        Args:
+            values (dict): 設定値｡directory は必須
+
+        Returns:
+            CaptureSettings: 設定クラスのインスタンス
+        """
+        names = {f.name for f in fields(cls)}
+        unknown = set(values) - names - {"orbit_step", "elevation_angles"}
+        if unknown:
+            raise ValueError(f"不明な設定項目です: {', '.join(sorted(unknown))}")
+
+        kwargs = {k: v for k, v in values.items() if k in names}
+        kwargs.setdefault("datetime", datetime.datetime.now())
+        if isinstance(kwargs["datetime"], str):
+            # 分担して撮影する場合は同じセッションフォルダになるように ISO 形式の日時を渡す
+            kwargs["datetime"] = datetime.datetime.fromisoformat(kwargs["datetime"])
+
+        quality, derived_qualities = cls.split_qualities(
+            [kwargs.get("quality", 'middle'), *kwargs.get("derived_qualities", [])])
+        kwargs["quality"] = quality
+        kwargs["derived_qualities"] = derived_qualities
+        resolution_x, resolution_y = QUALITY_RESOLUTIONS[quality]
+        if kwargs.get("render_mode") == 'cycles':
+            resolution_x, resolution_y = cls.scale_resolution(
+                resolution_x, resolution_y, kwargs.get("cycles_preview_scale", 100))
+        kwargs.setdefault("resolution_x", resolution_x)
+        kwargs.setdefault("resolution_y", resolution_y)
+
+        if "shot_angle_list" not in kwargs:
+            kwargs["shot_angle_list"] = cls.build_shot_angle_list(
+                values.get("elevation_angles", [0]), int(values.get("orbit_step", 90)))
+
+        return cls(**kwargs)
@@ -23,9 +23,85 @@ class ORBITSNAP_PR_MainSettings(bpy.types.PropertyGroup):
         default='middle'
     )
 
+    derived_qualities: EnumProperty(
+        name="Also Export",
+        description="最も高い画質で1回だけ撮影し､ほかの画質は縮小して一緒に書き出します",
+        items=[
+            ('high', "high", "1920x1080"),
+            ('middle', "middle", "1280x720"),
+            ('low', "low", "854x480"),
+        ],
+        options={'ENUM_FLAG'},
+        default=set(),
+    )
+    thumbnail: BoolProperty(name="Thumbnail", description="縮小したサムネイルを thumbnail フォルダに一緒に書き出します", default=False)
+    thumbnail_width: IntProperty(name="Width", description="サムネイルの幅(px)", default=256, min=32, max=854)
+
+    image_format: EnumProperty(
+        name="Format",
+        description="画像の保存形式",
+        items=[
+            ('png', "PNG", "可逆圧縮"),
+            ('jpeg', "JPEG", "非可逆圧縮(透過なし)｡小さく速い"),
+            ('webp', "WebP", "可逆/非可逆圧縮"),
+        ],
+        default='png'
+    )
+    png_compress_level: IntProperty(name="Compression", description="PNGの圧縮レベル｡大きいほどファイルは小さく､保存は遅くなります", default=6, min=0, max=9)
+    image_quality: IntProperty(name="Quality", description="JPEG･WebPの品質", default=90, min=1, max=100)
+    webp_lossless: BoolProperty(name="Lossless", description="WebPを可逆圧縮で保存します", default=False)
+    use_alpha: BoolProperty(name="Alpha", description="透過(アルファチャンネル)を保存します｡JPEGでは保存されません", default=True)
+
+    render_mode: EnumProperty(
+        name="Render",
+        description="撮影方法",
+        items=[
+            ('viewport', "Viewport", "3Dビューの描画で撮影します(Eevee / Workbench)"),
+            ('cycles', "Cycles", "撮影用のカメラから Cycles でレンダリングします｡撮影後にレンダー設定を元に戻します"),
+        ],
+        default='viewport'
+    )
+    cycles_time_budget: FloatProperty(name="Time Budget (s)", description="1枚あたりのレンダリング時間の上限(秒)｡0 の場合はサンプル数だけで止めます", default=10.0, min=0.0, max=3600.0)
+    cycles_max_samples: IntProperty(name="Max Samples", description="サンプル数の上限", default=128, min=1, max=16384)
+    cycles_adaptive_threshold: FloatProperty(name="Noise Threshold", description="適応サンプリングのノイズのしきい値｡0 の場合は自動で決めます", default=0.01, min=0.0, max=1.0, precision=3)
+    cycles_denoise: BoolProperty(name="Denoise", description="CPUのデノイザー(OpenImageDenoise)でノイズを除去します", default=True)
+    cycles_preview_scale: EnumProperty(
+        name="Preview",
+        description="確認用に解像度を縮小して短時間で撮影します",
+        items=[
+            ('100', "Full", "画質の解像度で撮影"),
+            ('50', "50%", "解像度を半分にして撮影"),
+            ('25', "25%", "解像度を1/4にして撮影"),
+        ],
+        default='100'
+    )
+
     focal_length: IntProperty(name="Focal Length (mm)", default=50, min=28, max=150)
     margin_scale: FloatProperty(name="Margin Scale", default=1.3, min=0.5, max=2.0)
 
+    framing_mode: EnumProperty(
+        name="Framing",
+        description="画角の計算方法",
+        items=[
+            ('bbox', "bbox", "バウンディングボックスで計算(高速)"),
+            ('hull', "mesh", "評価後のメッシュ頂点の凸包で計算(正確)"),
+        ],
+        default='bbox'
+    )
+    framing_cache: BoolProperty(name="Cache", description="形状・位置・画角に関係する設定が前回と同じなら画角を計算し直しません", default=True)
+    persist_framing_cache: BoolProperty(name="Save in .blend", description="画角の計算結果をシーンに保存し､ファイルを開き直しても使います", default=False)
+
+    capture_targets: EnumProperty(
+        name="Targets",
+        description="撮影対象のまとめ方",
+        items=[
+            ('selection', "Selection", "選択全体を1つの対象として撮影"),
+            ('objects', "Each Object", "選択したオブジェクトを1つずつ､ほかを隠して撮影"),
+            ('regions', "Each Region", "選択したエンプティ(Cube)ごとに､範囲内のオブジェクトだけを撮影"),
+        ],
+        default='selection'
+    )
+
     orbit_step: EnumProperty(
         name="Orbit Step",
         description="水平回転の分割角度",
@@ -37,6 +113,18 @@ class ORBITSNAP_PR_MainSettings(bpy.types.PropertyGroup):
         default='90'
     )
 
+    view_planning: EnumProperty(
+        name="View Planning",
+        description="撮影角度の決め方",
+        items=[
+            ('grid', "Grid", "Orbit StepとElevation Angleの組み合わせで撮影"),
+            ('coverage', "Coverage", "表面が目標の割合まで見えるように最小限の角度を選んで撮影"),
+        ],
+        default='grid'
+    )
+    target_coverage: FloatProperty(name="Target Coverage", description="見える表面の目標の割合", default=0.95, min=0.5, max=1.0, subtype='FACTOR')
+    plan_candidates: IntProperty(name="Candidates", description="候補にする視点の数", default=96, min=16, max=512)
+
     use_angle_0: BoolProperty(name="horizontal", default=True)
     use_angle_30: BoolProperty(name="  30°", default=False)
     use_angle_45: BoolProperty(name="  45°", default=False)
@@ -60,6 +148,30 @@ class ORBITSNAP_PR_MainSettings(bpy.types.PropertyGroup):
     note: StringProperty(name="Note Text", default="")
 
     open_folder_after_capture: BoolProperty(name="Open Folder After Capture", default=False)
+    use_pipeline: BoolProperty(name="Pipelined Capture", description="撮影中に並行して画像を保存します", default=False)
+    incremental: BoolProperty(name="Skip Unchanged Shots", description="前回の撮影から変わっていないショットは撮影せずに前回の画像を再利用します", default=False)
+    use_image_store: BoolProperty(name="Deduplicate Images", description="同じ画像は1つだけ保存し､セッションフォルダにはハードリンクを置きます", default=False)
+    offscreen: BoolProperty(name="Offscreen Capture", description="3Dビューの視点を切り替えずに､撮影解像度のオフスクリーンに描画して撮影します", default=False)
+    use_modal: BoolProperty(name="Non-blocking Capture", description="撮影中もUIを操作できるようにします(Escで中止)", default=False)
+    shots_per_tick: IntProperty(name="Shots Per Tick", description="UIを更新するまでに撮影する枚数", default=1, min=1, max=20)
+    session_index: BoolProperty(name="Session Index", description="撮影したショットを保存フォルダの索引(orbitsnap_index.sqlite)に記録し､ファイルや角度で検索できるようにします", default=False)
+    similarity_index: BoolProperty(name="Change Tracking", description="ショットごとの知覚ハッシュと縮小画像を書き出し､前のセッションとの変化を比較できるようにします", default=False)
+    profile: BoolProperty(name="Profile", description="準備・撮影・書き込み・保存などの区間ごとの時間を記録し､Chrome trace(orbitsnap_trace.json)を書き出します", default=False)
+    profile_memory: BoolProperty(name="Memory", description="区間ごとのメモリのピーク(tracemalloc)も記録します｡計測中は処理が遅くなります", default=False)
+    contact_sheet: BoolProperty(name="Contact Sheet", description="仰角×水平角の一覧画像と､各ショットの位置の索引(JSON)を書き出します", default=False)
+    contact_sheet_cell_width: IntProperty(name="Cell Width", description="一覧画像の1コマの幅(px)", default=256, min=32, max=1920)
+    turntable_format: EnumProperty(
+        name="Turntable",
+        description="仰角ごとの1周分をアニメーションとして書き出します",
+        items=[
+            ('none', "None", "書き出さない"),
+            ('webp', "WebP", "アニメーションWebP"),
+            ('apng', "APNG", "アニメーションPNG"),
+        ],
+        default='none'
+    )
+    turntable_fps: IntProperty(name="FPS", description="アニメーションのフレームレート", default=12, min=1, max=60)
+    save_stills: BoolProperty(name="Save Stills", description="1枚ずつの画像を保存します", default=True)
 
 def register():
     bpy.utils.register_class(ORBITSNAP_PR_MainSettings)
@@ -1,5 +1,7 @@
 import os
-from ..__init__ import addon_dir
+
+# パッケージの __init__ から読み込むと循環インポートになる(__init__ が2回実行される)ので､このファイルの位置から求める
+addon_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 def get_root_path() -> str:
     return addon_dir